@@ -0,0 +1,269 @@
+"""Running sentiment counts per park, per feature and per (park, feature) cell.
+
+Every appended review bumps three counters, and the sum of per-park sentiment
+percentages is patched for the one park that changed, so the "All Parks"
+averages, a park's percentages and the chart inputs are read straight from
+maintained state instead of being recomputed on each rerun.
+"""
+import uuid
+
+import numpy as np
+
+from lazy_imports import lazy_module
+from review_store import SENTIMENTS, SENTIMENT_CODES
+
+pd = lazy_module("pandas")
+
+_N_SENTIMENTS = len(SENTIMENTS)
+# The running percentage sum is recomputed from the counts after this many patches, so float
+# rounding from millions of small updates never builds up
+PCT_SUM_RESYNC = 4096
+
+
+def format_pct(value):
+    """Render a percentage the way the dashboard always has ('78%'), keeping one decimal if needed"""
+    value = round(float(value), 1)
+    return f"{value:.0f}%" if value.is_integer() else f"{value:.1f}%"
+
+
+def wilson_interval(successes, totals, z=1.96):
+    """Wilson score interval (low, high) in percent for arrays of successes out of totals; NaN where total is 0"""
+    successes = np.asarray(successes, dtype=np.float64)
+    totals = np.asarray(totals, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = successes / totals
+        z2 = z * z
+        denom = 1 + z2 / totals
+        center = (p + z2 / (2 * totals)) / denom
+        half = z * np.sqrt(p * (1 - p) / totals + z2 / (4 * totals * totals)) / denom
+    return (center - half) * 100.0, (center + half) * 100.0
+
+
+class SentimentAggregates:
+    """Positive/negative/neutral counters maintained incrementally as reviews arrive"""
+
+    def __init__(self, parks, features):
+        self.parks = list(parks)
+        self.features = list(features)
+        self._park_codes = {p: i for i, p in enumerate(self.parks)}
+        self._feature_codes = {f: i for i, f in enumerate(self.features)}
+        self.park_counts = np.zeros((len(self.parks), _N_SENTIMENTS), dtype=np.int64)
+        self.feature_counts = np.zeros((len(self.features), _N_SENTIMENTS), dtype=np.int64)
+        self.cell_counts = np.zeros((len(self.parks), len(self.features), _N_SENTIMENTS), dtype=np.int64)
+        # Sum over parks of each park's sentiment percentages, for the "All Parks" average
+        self._park_pct_sum = np.zeros(_N_SENTIMENTS, dtype=np.float64)
+        self._pct_sum_patches = 0
+        self.version = 0
+        self._uid = uuid.uuid4().hex[:12]
+        self._ranks = (None, None)  # (version, 1-based rank per park code)
+        # Parks and features whose counts include seeded baselines (published percentages) rather
+        # than only reviews; their shares are real but their counts are not review counts
+        self.seeded_parks = set()
+        self.seeded_features = set()
+
+    @classmethod
+    def from_counts(cls, parks, features, park_counts, feature_counts, cell_counts, park_pct_sum=None,
+                    seeded_parks=(), seeded_features=()):
+        """Aggregates restored from saved count arrays (copied, since updates add to them in place)"""
+        aggregates = cls(parks, features)
+        aggregates.seeded_parks, aggregates.seeded_features = set(seeded_parks), set(seeded_features)
+        aggregates.park_counts = np.array(park_counts, dtype=np.int64)
+        aggregates.feature_counts = np.array(feature_counts, dtype=np.int64)
+        aggregates.cell_counts = np.array(cell_counts, dtype=np.int64)
+        # The running sum is restored as saved so averages match the original to the last bit
+        aggregates._park_pct_sum = (aggregates._pct(aggregates.park_counts).sum(axis=0) if park_pct_sum is None
+                                    else np.array(park_pct_sum, dtype=np.float64))
+        return aggregates
+
+    @property
+    def park_pct_sum(self):
+        """Running sum over parks of each park's sentiment percentages"""
+        return self._park_pct_sum
+
+    @property
+    def data_version(self):
+        """Cache key that changes with every update and differs between instances"""
+        return f"{self._uid}:{self.version}"
+
+    def _park_code(self, park):
+        code = self._park_codes.get(park)
+        if code is None:
+            code = self._park_codes[park] = len(self.parks)
+            self.parks.append(park)
+            self.park_counts = np.vstack([self.park_counts, np.zeros((1, _N_SENTIMENTS), dtype=np.int64)])
+            self.cell_counts = np.concatenate(
+                [self.cell_counts, np.zeros((1,) + self.cell_counts.shape[1:], dtype=np.int64)], axis=0)
+        return code
+
+    def _feature_code(self, feature):
+        code = self._feature_codes.get(feature)
+        if code is None:
+            code = self._feature_codes[feature] = len(self.features)
+            self.features.append(feature)
+            self.feature_counts = np.vstack([self.feature_counts, np.zeros((1, _N_SENTIMENTS), dtype=np.int64)])
+            shape = self.cell_counts.shape
+            self.cell_counts = np.concatenate(
+                [self.cell_counts, np.zeros((shape[0], 1, shape[2]), dtype=np.int64)], axis=1)
+        return code
+
+    @staticmethod
+    def _pct(counts):
+        total = counts.sum(axis=-1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total > 0, counts * 100.0 / np.maximum(total, 1), 0.0)
+
+    def _bump_park(self, park_code, sentiment_counts):
+        # O(1) patch of the cross-park percentage sum for the one park that changed
+        before = self._pct(self.park_counts[park_code])
+        self.park_counts[park_code] += sentiment_counts
+        self._pct_sum_patches += 1
+        if self._pct_sum_patches >= PCT_SUM_RESYNC:
+            self._park_pct_sum = self._pct(self.park_counts).sum(axis=0)
+            self._pct_sum_patches = 0
+        else:
+            self._park_pct_sum += self._pct(self.park_counts[park_code]) - before
+
+    # -- updates -------------------------------------------------------------
+
+    def seed_park(self, park, positive, negative, neutral=0):
+        """Add baseline counts for a park (e.g. the published survey percentages)"""
+        self.seeded_parks.add(park)
+        self._bump_park(self._park_code(park), np.array([positive, negative, neutral], dtype=np.int64))
+        self.version += 1
+
+    def seed_feature(self, feature, positive, negative, neutral=0):
+        """Add baseline counts for a feature without touching park totals"""
+        self.seeded_features.add(feature)
+        self.feature_counts[self._feature_code(feature)] += [positive, negative, neutral]
+        self.version += 1
+
+    def seed_cell(self, park, feature, sentiment):
+        """Count a review in its (park, feature) cell only"""
+        p, f = self._park_code(park), self._feature_code(feature)
+        self.cell_counts[p, f, SENTIMENT_CODES[sentiment]] += 1
+        self.version += 1
+
+    def add(self, park, feature, sentiment):
+        """Count one new review at every level in O(1)"""
+        p, f, s = self._park_code(park), self._feature_code(feature), SENTIMENT_CODES[sentiment]
+        one_hot = np.zeros(_N_SENTIMENTS, dtype=np.int64)
+        one_hot[s] = 1
+        self._bump_park(p, one_hot)
+        self.feature_counts[f, s] += 1
+        self.cell_counts[p, f, s] += 1
+        self.version += 1
+
+    def append(self, chunk):
+        """Count a chunk of reviews (DataFrame or list of dicts); cost is O(len(chunk))"""
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.DataFrame.from_records(list(chunk), columns=["park", "feature", "sentiment"])
+        if chunk.empty:
+            return
+        park = self._codes(chunk["park"], self._park_code)
+        feature = self._codes(chunk["feature"], self._feature_code)
+        sentiment = chunk["sentiment"].map(SENTIMENT_CODES).to_numpy(dtype=np.int64)
+
+        cells = np.zeros_like(self.cell_counts)
+        np.add.at(cells, (park, feature, sentiment), 1)
+        self.add_cells(cells)
+
+    def register(self, parks=(), features=()):
+        """Give unseen park and feature names codes (in the order given) without counting anything"""
+        for park in parks:
+            self._park_code(park)
+        for feature in features:
+            self._feature_code(feature)
+
+    def add_cells(self, cells):
+        """Count a (parks, features, sentiments) block of reviews in this table's codes, e.g. a merged shard chunk.
+
+        Adding the block of a chunk updates every counter exactly as
+        append() does for that chunk, down to the order in which the park
+        percentage sum is patched, so merged counts match a single pass.
+        """
+        self.cell_counts += cells
+        self.feature_counts += cells.sum(axis=0)
+        per_park = cells.sum(axis=1)
+        for p in np.flatnonzero(per_park.any(axis=1)):
+            self._bump_park(p, per_park[p])
+        self.version += 1
+
+    @staticmethod
+    def _codes(values, encode):
+        inverse, uniques = pd.factorize(values.to_numpy())
+        lookup = np.array([encode(v) for v in uniques], dtype=np.int64)
+        return lookup[inverse]
+
+    # -- reads ---------------------------------------------------------------
+
+    def park_percentages(self, park):
+        """(positive, negative, neutral) percentages for one park"""
+        return tuple(self._pct(self.park_counts[self._park_codes[park]]).tolist())
+
+    def feature_percentages(self, feature):
+        """(positive, negative, neutral) percentages for one feature"""
+        return tuple(self._pct(self.feature_counts[self._feature_codes[feature]]).tolist())
+
+    def reviewed_parks(self):
+        """Boolean mask of the park codes that have at least one review (or seeded count)"""
+        return self.park_counts.any(axis=1)
+
+    def reviewed_park_count(self):
+        """Number of parks with reviews; registered parks without any are left out of averages and ranks"""
+        return int(np.count_nonzero(self.reviewed_parks()))
+
+    def average_percentages(self):
+        """Mean over parks with reviews of each park's (positive, negative, neutral) percentages"""
+        # Parks without reviews add 0 to the running sum, so only the divisor needs them left out
+        n = self.reviewed_park_count()
+        return tuple((self._park_pct_sum / n).tolist()) if n else (0.0, 0.0, 0.0)
+
+    def park_table(self):
+        """Per-park percentage matrix, shape (parks, 3)"""
+        return self._pct(self.park_counts)
+
+    def feature_table(self):
+        """Per-feature percentage matrix, shape (features, 3)"""
+        return self._pct(self.feature_counts)
+
+    def most_positive_park(self):
+        """(park name, positive percentage) of the best-rated park"""
+        positive = self.park_table()[:, SENTIMENT_CODES["Positive"]]
+        best = int(np.argmax(positive))
+        return self.parks[best], float(positive[best])
+
+    def review_counts(self, kind, names):
+        """Reviews counted per park or feature name (kind "park" or "feature"); NaN where the counts were seeded"""
+        codes = self.park_codes(names) if kind == "park" else self.feature_codes(names)
+        counts = (self.park_counts if kind == "park" else self.feature_counts)[codes].sum(axis=1).astype(np.float64)
+        seeded = self.seeded_parks if kind == "park" else self.seeded_features
+        counts[[name in seeded for name in names]] = np.nan
+        return counts
+
+    def park_codes(self, parks):
+        """Codes of the given park names, as an int64 array (unknown parks raise KeyError)"""
+        return np.fromiter((self._park_codes[p] for p in parks), dtype=np.int64, count=len(parks))
+
+    def feature_codes(self, features):
+        """Codes of the given feature names, as an int64 array (unknown features raise KeyError)"""
+        return np.fromiter((self._feature_codes[f] for f in features), dtype=np.int64, count=len(features))
+
+    def ranks(self):
+        """1-based rank by positive percentage per park code, computed once per version.
+
+        Parks with reviews take ranks 1..reviewed_park_count(); parks without
+        any come after them, in park order.
+        """
+        version, ranks = self._ranks
+        if version != self.version or len(ranks) != len(self.parks):
+            positive = self.park_table()[:, SENTIMENT_CODES["Positive"]]
+            # Stable descending order so ties keep PARKS_DATA order, as sorted() did
+            order = np.lexsort((-positive, ~self.reviewed_parks()))
+            ranks = np.empty(len(order), dtype=np.int64)
+            ranks[order] = np.arange(1, len(order) + 1)
+            self._ranks = (self.version, ranks)
+        return ranks
+
+    def park_rank(self, park):
+        """1-based rank of a park by positive percentage"""
+        return int(self.ranks()[self._park_codes[park]])
@@ -0,0 +1,590 @@
+"""Headless analytics core for the National Park dashboard.
+
+Holds the data model (parks, features, sample reviews), loading of review
+corpora into a Dataset, and the numbers the dashboard shows: filtering,
+per-park metrics, cross-park averages and ranking, chart tables, sentiment
+trends, aspect highlights/complaints, approximate sketch statistics and recommendations. Nothing here imports Streamlit or has side effects at import
+time, so it can be called from batch jobs, services and benchmarks.
+"""
+import hashlib
+import logging
+import os
+import time
+from datetime import date
+from functools import lru_cache
+from typing import List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from aggregates import SentimentAggregates, wilson_interval
+from aspects import Aspect, AspectTable
+from dedup import NearDuplicateIndex
+from ingest import Map, expand_paths, ingest_files
+from lazy_imports import lazy_module
+from recommendations import DEFAULT_DIR as DEFAULT_CATALOG_DIR, RecommendationCatalog
+from review_store import ALL_FEATURES, ALL_PARKS, ReviewStore, strip_emoji
+from sketches import SketchTable, TermCount
+from trends import SentimentTrends
+
+# Progress of loading and ingesting, which runs inside the dashboard server; the CLIs pass print
+logger = logging.getLogger("dashboard.ingest")
+
+pd = lazy_module("pandas")
+
+# Enhanced data with consistent structure - using text instead of emojis in dictionary keys
+PARKS_DATA = {
+    "Yellowstone": {"positive": 78, "negative": 22, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/yell/index.htm", "emoji": "🏞️"},
+    "Yosemite": {"positive": 85, "negative": 15, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/yose/index.htm", "emoji": "⛰️"},
+    "Grand Canyon": {"positive": 92, "negative": 8, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/grca/index.htm", "emoji": "🏜️"},
+    "Zion": {"positive": 70, "negative": 30, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/zion/index.htm", "emoji": "🪨"},
+    "Big Bend": {"positive": 82, "negative": 12, "neutral": 6, "reviews": [], "url": "https://www.nps.gov/bibe/index.htm", "emoji": "🌋"},
+    "Black Canyon": {"positive": 75, "negative": 20, "neutral": 5, "reviews": [], "url": "https://www.nps.gov/blca/index.htm", "emoji": "🏔️"},
+    "Biscayne": {"positive": 68, "negative": 25, "neutral": 7, "reviews": [], "url": "https://www.nps.gov/bisc/index.htm", "emoji": "🌊"},
+    "Hot Springs": {"positive": 72, "negative": 18, "neutral": 10, "reviews": [], "url": "https://www.nps.gov/hosp/index.htm", "emoji": "🌡️"},
+    "Independence": {"positive": 88, "negative": 10, "neutral": 2, "reviews": [], "url": "https://www.nps.gov/inde/index.htm", "emoji": "🏛️"},
+    "Valley Forge": {"positive": 80, "negative": 15, "neutral": 5, "reviews": [], "url": "https://www.nps.gov/vafo/index.htm", "emoji": "⚔️"},
+    "Dry Tortugas": {"positive": 95, "negative": 4, "neutral": 1, "reviews": [], "url": "https://www.nps.gov/drto/index.htm", "emoji": "🏝️"},
+    "Everglades": {"positive": 84, "negative": 12, "neutral": 4, "reviews": [], "url": "https://www.nps.gov/ever/index.htm", "emoji": "🐊"},
+}
+
+FEATURE_DATA = [
+    {"feature": "Hiking", "positive": 65, "negative": 35, "neutral": 0, "emoji": "🥾"},
+    {"feature": "Camping", "positive": 58, "negative": 42, "neutral": 0, "emoji": "🏕️"},
+    {"feature": "Scenery", "positive": 95, "negative": 5, "neutral": 0, "emoji": "🌄"},
+    {"feature": "Wildlife", "positive": 82, "negative": 18, "neutral": 0, "emoji": "🐻"},
+    {"feature": "Facilities", "positive": 45, "negative": 48, "neutral": 7, "emoji": "🚻"},
+    {"feature": "Crowds", "positive": 30, "negative": 65, "neutral": 5, "emoji": "👨‍👩‍👧‍👦"},
+    {"feature": "Fees", "positive": 35, "negative": 60, "neutral": 5, "emoji": "💵"},
+    {"feature": "Parking", "positive": 40, "negative": 55, "neutral": 5, "emoji": "🅿️"},
+]
+
+# Sample reviews; park and feature emojis are looked up from PARKS_DATA/FEATURE_DATA when shown
+REVIEWS = [
+    {"park": "Yellowstone", "feature": "Wildlife", "sentiment": "Positive", "date": "2024-07-14",
+     "text": "Amazing wildlife sightings including bears and wolves!"},
+    {"park": "Grand Canyon", "feature": "Scenery", "sentiment": "Positive", "date": "2024-05-02",
+     "text": "Most breathtaking views I've ever experienced!"},
+    {"park": "Yosemite", "feature": "Hiking", "sentiment": "Positive", "date": "2024-06-21",
+     "text": "The trails offer incredible variety and challenge for all skill levels."},
+    {"park": "Zion", "feature": "Camping", "sentiment": "Negative", "date": "2023-08-09",
+     "text": "Campgrounds were overcrowded and facilities needed maintenance."},
+    {"park": "Big Bend", "feature": "Scenery", "sentiment": "Positive", "date": "2024-02-17",
+     "text": "The desert and mountain landscapes are stunning, especially at sunset."},
+    {"park": "Black Canyon", "feature": "Hiking", "sentiment": "Positive", "date": "2023-09-30",
+     "text": "The rim trails offer vertigo-inducing views that are worth every step!"},
+    {"park": "Biscayne", "feature": "Wildlife", "sentiment": "Positive", "date": "2024-03-23",
+     "text": "Snorkeling here was incredible - so many colorful fish and coral formations."},
+    {"park": "Hot Springs", "feature": "Facilities", "sentiment": "Neutral", "date": "2023-11-04",
+     "text": "The bathhouses are historic but could use some modern updates."},
+    {"park": "Independence", "feature": "Scenery", "sentiment": "Positive", "date": "2024-04-12",
+     "text": "Walking through history with beautifully preserved buildings and monuments."},
+    {"park": "Valley Forge", "feature": "Crowds", "sentiment": "Negative", "date": "2023-10-15",
+     "text": "Too many people on weekends made it difficult to enjoy the historical sites."},
+    {"park": "Dry Tortugas", "feature": "Wildlife", "sentiment": "Positive", "date": "2024-01-27",
+     "text": "The sea turtles and reef fish were abundant and the water clarity was perfect!"},
+    {"park": "Everglades", "feature": "Wildlife", "sentiment": "Positive", "date": "2024-02-03",
+     "text": "Saw countless alligators, beautiful birds, and even a rare Florida panther from a distance!"},
+    {"park": "Yellowstone", "feature": "Facilities", "sentiment": "Negative", "date": "2023-07-22",
+     "text": "Restrooms were poorly maintained and often out of supplies."},
+    {"park": "Grand Canyon", "feature": "Fees", "sentiment": "Negative", "date": "2024-06-08",
+     "text": "Entry price is too steep for families, especially with additional parking costs."},
+    {"park": "Yosemite", "feature": "Parking", "sentiment": "Negative", "date": "2024-07-30",
+     "text": "Impossible to find parking near popular trailheads after 9am."},
+    {"park": "Zion", "feature": "Crowds", "sentiment": "Negative", "date": "2023-05-28",
+     "text": "Angels Landing was so crowded it felt dangerous on narrow sections."},
+    {"park": "Big Bend", "feature": "Camping", "sentiment": "Positive", "date": "2024-03-09",
+     "text": "Chisos Basin campground has some of the best stargazing in the country!"},
+    {"park": "Black Canyon", "feature": "Fees", "sentiment": "Neutral", "date": "2023-09-02",
+     "text": "The entrance fee is reasonable considering the amazing views."},
+    {"park": "Biscayne", "feature": "Camping", "sentiment": "Positive", "date": "2024-01-13",
+     "text": "Camping on Boca Chita Key was a unique and peaceful experience."},
+    {"park": "Hot Springs", "feature": "Hiking", "sentiment": "Positive", "date": "2023-12-16",
+     "text": "The Hot Springs Mountain Trail offers beautiful forest views and historic sites."},
+]
+
+
+# Curated visitor-research aspects, as (aspect, emoji, % of mentions): positive
+# for highlights, negative for complaints. They seed the aspect table of the
+# bundled sample; loaded corpora mine their aspects from the review text.
+ASPECT_HIGHLIGHTS = {
+    "Yellowstone": [("Wildlife", "🐻", 92), ("Geysers", "🌋", 88), ("Hiking Trails", "🥾", 75)],
+    "Yosemite": [("Waterfalls", "🌊", 96), ("Hiking", "🥾", 90), ("Forests", "🌲", 85)],
+    "Grand Canyon": [("Scenery", "🌄", 98), ("Rim Trails", "🥾", 90), ("Viewpoints", "👀", 85)],
+    "Zion": [("Narrows", "🏞️", 92), ("Angels Landing", "😇", 85), ("Scenery", "🌅", 80)],
+    "Big Bend": [("Night Skies", "🌌", 95), ("Desert Views", "🏜️", 90), ("Mountain Trails", "⛰️", 85)],
+    "Black Canyon": [("Canyon Views", "🏞️", 96), ("Photography", "📸", 88), ("Rim Trails", "🥾", 82)],
+    "Biscayne": [("Snorkeling", "🤿", 94), ("Boating", "⛵", 88), ("Marine Life", "🐠", 86)],
+    "Hot Springs": [("Thermal Waters", "♨️", 95), ("Historic Buildings", "🏛️", 85), ("Health Benefits", "💆", 80)],
+    "Independence": [("Historical Significance", "🏛️", 95), ("Liberty Bell", "🔔", 92), ("Architecture", "🏛️", 88)],
+    "Valley Forge": [("Historical Significance", "⚔️", 92), ("Memorial Monuments", "🗿", 85), ("Walking Trails", "🚶", 80)],
+    "Dry Tortugas": [("Marine Life", "🐠", 98), ("Fort Jefferson", "🏰", 94), ("Snorkeling", "🤿", 92)],
+    "Everglades": [("Wildlife Diversity", "🐊", 95), ("Airboat Tours", "🚤", 88), ("Bird Watching", "🦅", 86)],
+    "All Parks": [("Scenery", "🌄", 95), ("Wildlife", "🦌", 82), ("Hiking Trails", "🥾", 65)],
+}
+
+ASPECT_COMPLAINTS = {
+    "Yellowstone": [("Crowds", "👥", 75), ("Traffic", "🚗", 65), ("Lodging Availability", "🏨", 60)],
+    "Yosemite": [("Parking", "🅿️", 80), ("Valley Crowds", "👥", 70), ("Campsite Reservations", "⛺", 65)],
+    "Grand Canyon": [("Summer Heat", "☀️", 70), ("Tour Prices", "💰", 60), ("Shuttle Waits", "⏱️", 55)],
+    "Zion": [("Shuttle System", "🚌", 80), ("Crowds", "👥", 75), ("Trail Safety", "⚠️", 60), ("Parking Availability", "🅿️", 55)],
+    "Big Bend": [("Remote Location", "🏜️", 70), ("Lack of Services", "🏪", 65), ("Extreme Temperatures", "🌡️", 60)],
+    "Black Canyon": [("Limited Accessibility", "♿", 75), ("Steep Trails", "⚠️", 65), ("Weather Variability", "⛈️", 55)],
+    "Biscayne": [("Boat Access Only", "⛵", 80), ("Mosquitoes", "🦟", 70), ("Limited Facilities", "🚻", 60)],
+    "Hot Springs": [("Aging Facilities", "🏚️", 75), ("Limited Parking", "🅿️", 65), ("Commercialization", "💰", 55)],
+    "Independence": [("Urban Setting", "🏙️", 70), ("Wait Times", "⏳", 65), ("Noise Levels", "🔊", 55)],
+    "Valley Forge": [("Weekend Crowds", "👥", 80), ("Limited Shade", "☀️", 70), ("Trail Maintenance", "🚧", 55)],
+    "Dry Tortugas": [("Ferry Costs", "⛴️", 75), ("Weather Dependence", "⛈️", 70), ("Limited Amenities", "🏝️", 65)],
+    "Everglades": [("Mosquitoes", "🦟", 85), ("Humidity", "💦", 75), ("Limited Wildlife Sightings", "👀", 55)],
+    "All Parks": [("Crowds", "👥", 75), ("Parking", "🅿️", 70), ("Facilities", "🚻", 65), ("Fees", "💰", 60)],
+}
+
+
+class Dataset:
+    """A loaded corpus: the review store plus the aggregates, trend rollups and aspects maintained alongside it"""
+
+    def __init__(self, store: ReviewStore, aggregates: SentimentAggregates, fingerprint: str = "",
+                 trends: Optional[SentimentTrends] = None, aspects: Optional[AspectTable] = None,
+                 duplicates: Optional[NearDuplicateIndex] = None, sketches: Optional[SketchTable] = None):
+        self.store = store
+        self.aggregates = aggregates
+        self.trends = trends if trends is not None else SentimentTrends(aggregates.parks, aggregates.features)
+        self.aspects = aspects if aspects is not None else AspectTable(
+            emojis={f["feature"]: f["emoji"] for f in FEATURE_DATA})
+        # Stable identity of the source data, for reusing persisted indexes
+        self.fingerprint = fingerprint
+        # LSH index of the reviews kept so far, when ingest drops near-duplicates
+        self.duplicates = duplicates
+        # Per-park sketches in approximate mode; they take the place of the exact aspect counts
+        self.sketches = sketches
+
+    @property
+    def data_version(self) -> str:
+        """Changes whenever the aggregates change; use it as a cache key"""
+        return self.aggregates.data_version
+
+    def copy(self, fingerprint: Optional[str] = None) -> "Dataset":
+        """An independent Dataset to append to while this one keeps serving reads.
+
+        The review columns, text and index arrays (or a ReviewDB's database
+        file) are shared, since appends never modify them in place; the
+        counters and sketches are copied, and the trend rollups and
+        near-duplicate tables are copied on their first write.
+        """
+        store = self.store.copy()
+        a = self.aggregates
+        aggregates = SentimentAggregates.from_counts(a.parks, a.features, a.park_counts, a.feature_counts,
+                                                     a.cell_counts, a.park_pct_sum, a.seeded_parks,
+                                                     a.seeded_features)
+        trend_meta, trend_counts = self.trends.state()
+        trends = SentimentTrends.from_state(trend_meta, {name: _read_only(c) for name, c in trend_counts.items()})
+        aspects = AspectTable.from_state(self.aspects.state())
+        duplicates = self.duplicates.copy() if self.duplicates is not None else None
+        sketches = self.sketches.copy() if self.sketches is not None else None
+        return Dataset(store, aggregates, self.fingerprint if fingerprint is None else fingerprint, trends, aspects,
+                       duplicates, sketches)
+
+    def append(self, chunk) -> None:
+        """Add a chunk of reviews to the store, the aggregates, trends and aspects (or sketches) together"""
+        self.store.append(chunk)
+        self.aggregates.append(chunk)
+        self.trends.append(chunk)
+        if self.sketches is not None:
+            self.sketches.append(chunk)
+        else:
+            # Only chunks annotated by an AspectMiner carry aspect mentions
+            self.aspects.append(chunk)
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class ParkMetrics(NamedTuple):
+    park: str
+    positive: float
+    negative: float
+    neutral: float
+    rank: int
+    total_parks: int
+
+
+class OverallMetrics(NamedTuple):
+    total_parks: int
+    avg_positive: float
+    avg_negative: float
+    avg_neutral: float
+    most_positive_park: str
+    most_positive_pct: float
+
+
+class ParkComparison(NamedTuple):
+    parks: "pd.DataFrame"  # one row per park, best ranked first
+    features: "pd.DataFrame"  # positive % per park (rows) and feature (columns); NaN without reviews
+
+
+def park_emoji(park: str) -> str:
+    """Emoji for a park, with a generic fallback for parks outside PARKS_DATA"""
+    return PARKS_DATA.get(park, {}).get("emoji", "🏞️")
+
+
+def feature_emoji(feature: str) -> str:
+    """Emoji for a feature, with a generic fallback for features outside FEATURE_DATA"""
+    return next((f["emoji"] for f in FEATURE_DATA if f["feature"] == feature), "📌")
+
+
+def _emojis() -> Tuple[dict, dict]:
+    return ({park: data["emoji"] for park, data in PARKS_DATA.items()},
+            {f["feature"]: f["emoji"] for f in FEATURE_DATA})
+
+
+def empty_dataset(fingerprint: str = "", database: str = "", dedup_threshold: float = 0.0,
+                  approximate: bool = False) -> Dataset:
+    """A Dataset with the known parks and features registered but no reviews.
+
+    With database set, reviews are stored in a new SQLite file at that path
+    (see review_db) instead of in memory. With dedup_threshold set, reviews
+    ingested into it that are at least that similar (Jaccard, see dedup) to
+    an earlier one are dropped. With approximate set, highlights,
+    complaints, top terms and distinct reviewers come from fixed-size
+    sketches (see sketches) instead of exact per-aspect counts.
+    """
+    park_names = list(PARKS_DATA)
+    feature_names = [f["feature"] for f in FEATURE_DATA]
+    park_emojis, feature_emojis = _emojis()
+    if database:
+        from review_db import ReviewDB
+
+        store = ReviewDB.create(database, park_names, feature_names, park_emojis, feature_emojis)
+    else:
+        # Columnar store with park/feature indexes, so filters never rescan REVIEWS
+        store = ReviewStore(park_names, feature_names, park_emojis, feature_emojis)
+    # Running counts the metrics, charts and pie chart read from
+    aggregates = SentimentAggregates(store.parks, store.features)
+    duplicates = NearDuplicateIndex(dedup_threshold) if dedup_threshold else None
+    sketches = SketchTable(emojis=feature_emojis) if approximate else None
+    return Dataset(store, aggregates, fingerprint, duplicates=duplicates, sketches=sketches)
+
+
+def corpus_fingerprint(data_path: str = "", scoring_model: str = "") -> str:
+    """Identity of a corpus from its file names, sizes and mtimes (or the bundled sample)"""
+    digest = hashlib.sha1(f"{data_path}|{scoring_model}".encode())
+    if data_path:
+        for path in expand_paths(data_path.split(os.pathsep)):
+            stat = os.stat(path)
+            digest.update(f"|{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    else:
+        for review in REVIEWS:
+            digest.update(review["text"].encode())
+    return digest.hexdigest()
+
+
+def bundled_dataset() -> Dataset:
+    """Dataset for the sample REVIEWS and the published park/feature percentages"""
+    dataset = empty_dataset(corpus_fingerprint())
+    aggregates = dataset.aggregates
+    # The bundled sample reviews are already reflected in the published
+    # park/feature percentages, so those seed the counters and the sample
+    # only fills the (park, feature) cells
+    for park, data in PARKS_DATA.items():
+        aggregates.seed_park(park, data["positive"], data["negative"], data.get("neutral", 0))
+    for f in FEATURE_DATA:
+        aggregates.seed_feature(f["feature"], f["positive"], f["negative"], f.get("neutral", 0))
+    for review in REVIEWS:
+        aggregates.seed_cell(review["park"], review["feature"], review["sentiment"])
+    dataset.store.append(REVIEWS)
+    dataset.trends.append(REVIEWS)
+    # Aspect mentions come from the curated research percentages, per 100 mentions
+    for park, items in ASPECT_HIGHLIGHTS.items():
+        for aspect, emoji, pct in items:
+            dataset.aspects.seed(None if park == ALL_PARKS else park, aspect, pct, 100 - pct, emoji=emoji)
+    for park, items in ASPECT_COMPLAINTS.items():
+        for aspect, emoji, pct in items:
+            dataset.aspects.seed(None if park == ALL_PARKS else park, aspect, 100 - pct, pct, emoji=emoji)
+    return dataset
+
+
+def dataset_key(data_path: str, scoring_model: str = "", aspect_model: str = "", dedup_threshold: float = 0.0,
+                approximate: bool = False) -> str:
+    """Key of the snapshot or database a load_dataset call with these arguments may reopen"""
+    key = f"{corpus_fingerprint(data_path, scoring_model)}|{aspect_model}"
+    if dedup_threshold:
+        key += f"|dedup={dedup_threshold:g}"
+    if approximate:
+        key += "|approximate"
+    return key
+
+
+def load_dataset(data_path: str = "", scoring_model: str = "", aspect_model: str = "", report=logger.info,
+                 score_cache: str = "", snapshot: str = "", database: str = "",
+                 dedup_threshold: float = 0.0, approximate: bool = False) -> Dataset:
+    """Load review files (os.pathsep-separated paths) or, if none, the bundled sample.
+
+    With scoring_model set, sentiment and feature labels are derived from the
+    review text by spaCy instead of read from the files. With aspect_model
+    set (a spaCy pipeline with a parser), highlights and complaints are mined
+    from the review text. score_cache is a SQLite file that keeps both
+    results across restarts, so only new or changed reviews are processed.
+    snapshot is a directory holding a memory-mapped copy of the processed
+    dataset: it is opened instead of re-ingesting while the files are
+    unchanged, and rewritten after every ingest. database is a SQLite file
+    to keep the reviews in instead of memory, for corpora that do not fit;
+    it is reopened the same way and takes the place of the snapshot. With
+    dedup_threshold set, near-duplicate reviews (reposts, templated spam)
+    are dropped on ingest, here and in later ingest_into calls. With
+    approximate set, per-park text statistics are kept in constant-memory
+    sketches (see empty_dataset).
+    """
+    if not data_path:
+        return bundled_dataset()
+    key = dataset_key(data_path, scoring_model, aspect_model, dedup_threshold, approximate)
+    if database:
+        return _load_database(data_path, scoring_model, aspect_model, report, score_cache, database, key,
+                              dedup_threshold, approximate)
+    if not snapshot:
+        return ingest_dataset(data_path, scoring_model, aspect_model, report, score_cache,
+                              dedup_threshold=dedup_threshold, approximate=approximate)
+    from snapshot import load_snapshot, save_snapshot, stored_key
+
+    if stored_key(snapshot) == key:
+        started = time.perf_counter()
+        try:
+            dataset = load_snapshot(snapshot)
+            report(f"Opened snapshot {snapshot} ({len(dataset.store):,} reviews) in "
+                   f"{(time.perf_counter() - started) * 1000:.1f}ms")
+            return dataset
+        except (OSError, ValueError, KeyError) as e:
+            report(f"Ignoring unreadable snapshot {snapshot}: {e}")
+    dataset = ingest_dataset(data_path, scoring_model, aspect_model, report, score_cache,
+                             dedup_threshold=dedup_threshold, approximate=approximate)
+    try:
+        save_snapshot(dataset, snapshot, key)
+        report(f"Wrote snapshot {snapshot}")
+    except OSError as e:
+        report(f"Could not write snapshot {snapshot}: {e}")
+    return dataset
+
+
+def _load_database(data_path: str, scoring_model: str, aspect_model: str, report, score_cache: str,
+                   database: str, key: str, dedup_threshold: float = 0.0, approximate: bool = False) -> Dataset:
+    from review_db import load_database, save_state, stored_key
+
+    if stored_key(database) == key:
+        started = time.perf_counter()
+        try:
+            dataset = load_database(database, *_emojis())
+            report(f"Opened review database {database} ({len(dataset.store):,} reviews) in "
+                   f"{(time.perf_counter() - started) * 1000:.1f}ms")
+            return dataset
+        except (OSError, ValueError, KeyError) as e:
+            report(f"Rebuilding unreadable review database {database}: {e}")
+    dataset = ingest_dataset(data_path, scoring_model, aspect_model, report, score_cache, database, dedup_threshold,
+                             approximate)
+    save_state(dataset, key)
+    report(f"Wrote review database {database}")
+    return dataset
+
+
+def ingest_dataset(data_path: str, scoring_model: str = "", aspect_model: str = "", report=logger.info,
+                   score_cache: str = "", database: str = "", dedup_threshold: float = 0.0,
+                   approximate: bool = False) -> Dataset:
+    """Ingest review files into a new Dataset (see load_dataset)"""
+    dataset = empty_dataset(corpus_fingerprint(data_path, scoring_model), database, dedup_threshold, approximate)
+    ingest_into(dataset, data_path.split(os.pathsep), scoring_model, aspect_model, report, score_cache)
+    return dataset
+
+
+def ingest_into(dataset: Dataset, paths: List[str], scoring_model: str = "", aspect_model: str = "", report=logger.info,
+                score_cache: str = "") -> list:
+    """Append review files to an existing Dataset, deduplicating/scoring/mining them as load_dataset does; returns IngestStats"""
+    scorer = miner = cache = None
+    if score_cache and (scoring_model or aspect_model):
+        from score_cache import ScoreCache
+
+        cache = ScoreCache(score_cache)
+    if scoring_model:
+        from scoring import SentimentScorer
+
+        scorer = SentimentScorer(scoring_model, n_process=0, cache=cache)
+    if aspect_model:
+        from aspects import AspectMiner
+
+        miner = AspectMiner(aspect_model, n_process=0, cache=cache)
+    sink = dataset if miner is None else Map(miner.annotate, dataset)
+    duplicates = dataset.duplicates
+    dedup = None if duplicates is None else lambda chunk: duplicates.filter(chunk, dataset.store)
+    all_stats = []
+    try:
+        for stats in ingest_files(paths, sink, scorer=scorer, dedup=dedup):
+            report(f"Ingested {stats}")
+            all_stats.append(stats)
+        if duplicates is not None:
+            report(f"Near-duplicates: {duplicates}")
+        if dataset.sketches is not None:
+            report(f"Sketches: {dataset.sketches}")
+    finally:
+        if scorer is not None:
+            report(f"Scored {scorer}")
+            scorer.close()
+        if miner is not None:
+            report(f"Mined aspects {miner}")
+            miner.close()
+        if cache is not None:
+            report(f"Score cache {cache}")
+            cache.close()
+    return all_stats
+
+
+@lru_cache(maxsize=1)
+def default_dataset() -> Dataset:
+    """The bundled sample, built on first use"""
+    return bundled_dataset()
+
+
+def filter_rows(dataset: Dataset, park_filter: str, feature_filter: str) -> np.ndarray:
+    """Resolve the park/feature filters to row ids via the store indexes"""
+    # Remove emoji from the display names before the index lookup
+    park_name = strip_emoji(park_filter) if park_filter != ALL_PARKS else None
+    feature_name = strip_emoji(feature_filter) if feature_filter != ALL_FEATURES else None
+    return dataset.store.rows(park_name, feature_name)
+
+
+def filter_data(park_filter: str, feature_filter: str, dataset: Optional[Dataset] = None) -> List[dict]:
+    """Filter reviews based on selected park and feature"""
+    dataset = dataset or default_dataset()
+    return dataset.store.records(filter_rows(dataset, park_filter, feature_filter))
+
+
+def park_metrics(dataset: Dataset, park: str) -> ParkMetrics:
+    """Sentiment percentages and positive-rank for one park"""
+    aggregates = dataset.aggregates
+    positive, negative, neutral = aggregates.park_percentages(park)
+    return ParkMetrics(park, positive, negative, neutral, aggregates.park_rank(park),
+                       aggregates.reviewed_park_count())
+
+
+def overall_metrics(dataset: Dataset) -> OverallMetrics:
+    """Cross-park averages and the most positive park"""
+    aggregates = dataset.aggregates
+    avg_positive, avg_negative, avg_neutral = aggregates.average_percentages()
+    best_park, best_pct = aggregates.most_positive_park()
+    return OverallMetrics(aggregates.reviewed_park_count(), avg_positive, avg_negative, avg_neutral, best_park,
+                          best_pct)
+
+
+def park_ranking(dataset: Dataset) -> List[Tuple[str, float]]:
+    """Parks with reviews as (name, positive %) from most to least positive"""
+    aggregates = dataset.aggregates
+    positive = aggregates.park_table()[:, 0]
+    order = np.argsort(aggregates.ranks(), kind="stable")[:aggregates.reviewed_park_count()]
+    return [(aggregates.parks[i], float(positive[i])) for i in order]
+
+
+def compare_parks(dataset: Dataset, parks: List[str], z: float = 1.96) -> ParkComparison:
+    """Sentiment, rank, confidence interval and feature breakdown for any subset of parks.
+
+    Every statistic is one indexed read of the count arrays for the selected
+    park codes, so hundreds of parks cost about as much as two. The interval
+    is the Wilson score interval of the positive share (95% for z=1.96).
+    Parks whose counts were seeded from published percentages have no
+    review count, so their Reviews and interval are NaN.
+    """
+    aggregates = dataset.aggregates
+    codes = aggregates.park_codes(parks)
+    counts = aggregates.park_counts[codes]
+    pct = aggregates.park_table()[codes]
+    reviews = aggregates.review_counts("park", parks)
+    low, high = wilson_interval(counts[:, 0], reviews, z)
+    names = [f"{park_emoji(p)} {p}" for p in parks]
+    frame = pd.DataFrame({
+        "Park": names, "ParkName": list(parks), "Rank": aggregates.ranks()[codes],
+        "Positive": pct[:, 0], "Negative": pct[:, 1], "Neutral": pct[:, 2],
+        "Positive low": low, "Positive high": high, "Reviews": reviews,
+    })
+    order = np.argsort(frame["Rank"].to_numpy(), kind="stable")
+
+    cells = aggregates.cell_counts[codes]
+    cell_totals = cells.sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        feature_pct = np.where(cell_totals > 0, cells[:, :, 0] * 100.0 / cell_totals, np.nan)
+    features = pd.DataFrame(feature_pct, index=names,
+                            columns=[f"{feature_emoji(f)} {f}" for f in aggregates.features])
+    return ParkComparison(frame.iloc[order].reset_index(drop=True), features.iloc[order])
+
+
+def park_frame(dataset: Dataset) -> "pd.DataFrame":
+    """Park sentiment percentages with emoji display names, one row per park"""
+    aggregates = dataset.aggregates
+    park_pct = aggregates.park_table()
+    return pd.DataFrame({
+        "Park": [f"{park_emoji(k)} {k}" for k in aggregates.parks],
+        "Positive": park_pct[:, 0], "Negative": park_pct[:, 1], "Neutral": park_pct[:, 2],
+        "ParkName": list(aggregates.parks),
+    })
+
+
+def feature_frame(dataset: Dataset) -> "pd.DataFrame":
+    """Feature sentiment percentages with emoji display names, one row per feature"""
+    aggregates = dataset.aggregates
+    feature_pct = aggregates.feature_table()
+    return pd.DataFrame({
+        "feature": list(aggregates.features),
+        "positive": feature_pct[:, 0], "negative": feature_pct[:, 1], "neutral": feature_pct[:, 2],
+        "emoji": [feature_emoji(f) for f in aggregates.features],
+        "display_name": [f"{feature_emoji(f)} {f}" for f in aggregates.features],
+    })
+
+
+def sentiment_trend(dataset: Dataset, park_filter: str, feature_filter: str, granularity: str = "month",
+                    start=None, end=None) -> "pd.DataFrame":
+    """Sentiment per day/week/month for the selected park and feature, read from the rollups"""
+    park_name = strip_emoji(park_filter) if park_filter != ALL_PARKS else None
+    feature_name = strip_emoji(feature_filter) if feature_filter != ALL_FEATURES else None
+    return dataset.trends.trend(granularity, park_name, feature_name, start, end)
+
+
+def trend_date_range(dataset: Dataset) -> Optional[Tuple[date, date]]:
+    """First and last review dates, or None if no review is dated"""
+    return dataset.trends.date_range()
+
+def park_highlights(dataset: Dataset, park_filter: str) -> Tuple[Aspect, ...]:
+    """Top positively mentioned aspects for a park (or all parks), precomputed or estimated from sketches"""
+    park_name = strip_emoji(park_filter) if park_filter != ALL_PARKS else None
+    table = dataset.sketches if dataset.sketches is not None else dataset.aspects
+    return tuple(table.highlights(park_name))
+
+
+def park_complaints(dataset: Dataset, park_filter: str) -> Tuple[Aspect, ...]:
+    """Top negatively mentioned aspects for a park (or all parks), precomputed or estimated from sketches"""
+    park_name = strip_emoji(park_filter) if park_filter != ALL_PARKS else None
+    table = dataset.sketches if dataset.sketches is not None else dataset.aspects
+    return tuple(table.complaints(park_name))
+
+
+def top_terms(dataset: Dataset, park_filter: str) -> Tuple[TermCount, ...]:
+    """Most mentioned terms for a park (or all parks), estimated from sketches; empty outside approximate mode"""
+    if dataset.sketches is None:
+        return ()
+    park_name = strip_emoji(park_filter) if park_filter != ALL_PARKS else None
+    return tuple(dataset.sketches.top_terms(park_name))
+
+
+def distinct_reviewers(dataset: Dataset, park_filter: str) -> Optional[Tuple[float, float]]:
+    """(estimated distinct reviewers, relative standard error) for a park (or all parks), if reviewer ids were sketched"""
+    if dataset.sketches is None:
+        return None
+    park_name = strip_emoji(park_filter) if park_filter != ALL_PARKS else None
+    reviewers = dataset.sketches.reviewers(park_name)
+    return None if reviewers is None else (reviewers, dataset.sketches.reviewer_error)
+
+
+@lru_cache(maxsize=None)
+def recommendation_catalog(directory: str = DEFAULT_CATALOG_DIR) -> RecommendationCatalog:
+    """The recommendations catalog for a directory, loaded on first use"""
+    return RecommendationCatalog(directory)
+
+
+def get_recommendations(park: str, catalog_dir: str = DEFAULT_CATALOG_DIR) -> Mapping[str, object]:
+    """Get park-specific recommendations based on sentiment analysis research"""
+    return recommendation_catalog(catalog_dir).get(park)
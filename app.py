@@ -1,82 +1,132 @@
+import time
+# Start of this script run, before the imports below, for the rerun and first-render timings
+SCRIPT_STARTED = time.perf_counter()
+import hashlib
+import html
+import logging
+import os
+import numpy as np
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from collections import defaultdict
+from lazy_imports import lazy_module
+import analytics
+from analytics import PARKS_DATA, feature_emoji, filter_rows, get_recommendations, park_emoji
+from aggregates import format_pct
+from scoring import load_model
+from refresher import DEFAULT_INTERVAL, DatasetRefresher
+from search import open_or_build, spacy_analyzer
+import similar
+from profiling import PROFILER as profiler, serve_metrics
 
-# MUST BE FIRST STREAMLIT COMMAND
-st.set_page_config(layout="wide", page_title="National Park Analytics", page_icon="🌲")
-
-# Enhanced data with consistent structure - using text instead of emojis in dictionary keys
-PARKS_DATA = {
-    "Yellowstone": {"positive": 78, "negative": 22, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/yell/index.htm", "emoji": "🏞️"},
-    "Yosemite": {"positive": 85, "negative": 15, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/yose/index.htm", "emoji": "⛰️"},
-    "Grand Canyon": {"positive": 92, "negative": 8, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/grca/index.htm", "emoji": "🏜️"},
-    "Zion": {"positive": 70, "negative": 30, "neutral": 0, "reviews": [], "url": "https://www.nps.gov/zion/index.htm", "emoji": "🪨"},
-    "Big Bend": {"positive": 82, "negative": 12, "neutral": 6, "reviews": [], "url": "https://www.nps.gov/bibe/index.htm", "emoji": "🌋"},
-    "Black Canyon": {"positive": 75, "negative": 20, "neutral": 5, "reviews": [], "url": "https://www.nps.gov/blca/index.htm", "emoji": "🏔️"},
-    "Biscayne": {"positive": 68, "negative": 25, "neutral": 7, "reviews": [], "url": "https://www.nps.gov/bisc/index.htm", "emoji": "🌊"},
-    "Hot Springs": {"positive": 72, "negative": 18, "neutral": 10, "reviews": [], "url": "https://www.nps.gov/hosp/index.htm", "emoji": "🌡️"},
-    "Independence": {"positive": 88, "negative": 10, "neutral": 2, "reviews": [], "url": "https://www.nps.gov/inde/index.htm", "emoji": "🏛️"},
-    "Valley Forge": {"positive": 80, "negative": 15, "neutral": 5, "reviews": [], "url": "https://www.nps.gov/vafo/index.htm", "emoji": "⚔️"},
-    "Dry Tortugas": {"positive": 95, "negative": 4, "neutral": 1, "reviews": [], "url": "https://www.nps.gov/drto/index.htm", "emoji": "🏝️"},
-    "Everglades": {"positive": 84, "negative": 12, "neutral": 4, "reviews": [], "url": "https://www.nps.gov/ever/index.htm", "emoji": "🐊"},
-}
-
-FEATURE_DATA = [
-    {"feature": "Hiking", "positive": 65, "negative": 35, "neutral": 0, "emoji": "🥾"},
-    {"feature": "Camping", "positive": 58, "negative": 42, "neutral": 0, "emoji": "🏕️"},
-    {"feature": "Scenery", "positive": 95, "negative": 5, "neutral": 0, "emoji": "🌄"},
-    {"feature": "Wildlife", "positive": 82, "negative": 18, "neutral": 0, "emoji": "🐻"},
-    {"feature": "Facilities", "positive": 45, "negative": 48, "neutral": 7, "emoji": "🚻"},
-    {"feature": "Crowds", "positive": 30, "negative": 65, "neutral": 5, "emoji": "👨‍👩‍👧‍👦"},
-    {"feature": "Fees", "positive": 35, "negative": 60, "neutral": 5, "emoji": "💵"},
-    {"feature": "Parking", "positive": 40, "negative": 55, "neutral": 5, "emoji": "🅿️"},
-]
-
-# Create reviews without emojis in dictionary keys
-REVIEWS = [
-    {"park": "Yellowstone", "feature": "Wildlife", "sentiment": "Positive",
-     "text": "Amazing wildlife sightings including bears and wolves!", "park_emoji": "🏞️", "feature_emoji": "🐻"},
-    {"park": "Grand Canyon", "feature": "Scenery", "sentiment": "Positive",
-     "text": "Most breathtaking views I've ever experienced!", "park_emoji": "🏜️", "feature_emoji": "🌄"},
-    {"park": "Yosemite", "feature": "Hiking", "sentiment": "Positive",
-     "text": "The trails offer incredible variety and challenge for all skill levels.", "park_emoji": "⛰️", "feature_emoji": "🥾"},
-    {"park": "Zion", "feature": "Camping", "sentiment": "Negative",
-     "text": "Campgrounds were overcrowded and facilities needed maintenance.", "park_emoji": "🪨", "feature_emoji": "🏕️"},
-    {"park": "Big Bend", "feature": "Scenery", "sentiment": "Positive",
-     "text": "The desert and mountain landscapes are stunning, especially at sunset.", "park_emoji": "🌋", "feature_emoji": "🌄"},
-    {"park": "Black Canyon", "feature": "Hiking", "sentiment": "Positive",
-     "text": "The rim trails offer vertigo-inducing views that are worth every step!", "park_emoji": "🏔️", "feature_emoji": "🥾"},
-    {"park": "Biscayne", "feature": "Wildlife", "sentiment": "Positive",
-     "text": "Snorkeling here was incredible - so many colorful fish and coral formations.", "park_emoji": "🌊", "feature_emoji": "🐻"},
-    {"park": "Hot Springs", "feature": "Facilities", "sentiment": "Neutral",
-     "text": "The bathhouses are historic but could use some modern updates.", "park_emoji": "🌡️", "feature_emoji": "🚻"},
-    {"park": "Independence", "feature": "Scenery", "sentiment": "Positive",
-     "text": "Walking through history with beautifully preserved buildings and monuments.", "park_emoji": "🏛️", "feature_emoji": "🌄"},
-    {"park": "Valley Forge", "feature": "Crowds", "sentiment": "Negative",
-     "text": "Too many people on weekends made it difficult to enjoy the historical sites.", "park_emoji": "⚔️", "feature_emoji": "👨‍👩‍👧‍👦"},
-    {"park": "Dry Tortugas", "feature": "Wildlife", "sentiment": "Positive",
-     "text": "The sea turtles and reef fish were abundant and the water clarity was perfect!", "park_emoji": "🏝️", "feature_emoji": "🐻"},
-    {"park": "Everglades", "feature": "Wildlife", "sentiment": "Positive",
-     "text": "Saw countless alligators, beautiful birds, and even a rare Florida panther from a distance!", "park_emoji": "🐊", "feature_emoji": "🐻"},
-    {"park": "Yellowstone", "feature": "Facilities", "sentiment": "Negative",
-     "text": "Restrooms were poorly maintained and often out of supplies.", "park_emoji": "🏞️", "feature_emoji": "🚻"},
-    {"park": "Grand Canyon", "feature": "Fees", "sentiment": "Negative",
-     "text": "Entry price is too steep for families, especially with additional parking costs.", "park_emoji": "🏜️", "feature_emoji": "💵"},
-    {"park": "Yosemite", "feature": "Parking", "sentiment": "Negative",
-     "text": "Impossible to find parking near popular trailheads after 9am.", "park_emoji": "⛰️", "feature_emoji": "🅿️"},
-    {"park": "Zion", "feature": "Crowds", "sentiment": "Negative",
-     "text": "Angels Landing was so crowded it felt dangerous on narrow sections.", "park_emoji": "🪨", "feature_emoji": "👨‍👩‍👧‍👦"},
-    {"park": "Big Bend", "feature": "Camping", "sentiment": "Positive",
-     "text": "Chisos Basin campground has some of the best stargazing in the country!", "park_emoji": "🌋", "feature_emoji": "🏕️"},
-    {"park": "Black Canyon", "feature": "Fees", "sentiment": "Neutral",
-     "text": "The entrance fee is reasonable considering the amazing views.", "park_emoji": "🏔️", "feature_emoji": "💵"},
-    {"park": "Biscayne", "feature": "Camping", "sentiment": "Positive",
-     "text": "Camping on Boca Chita Key was a unique and peaceful experience.", "park_emoji": "🌊", "feature_emoji": "🏕️"},
-    {"park": "Hot Springs", "feature": "Hiking", "sentiment": "Positive",
-     "text": "The Hot Springs Mountain Trail offers beautiful forest views and historic sites.", "park_emoji": "🌡️", "feature_emoji": "🥾"},
-]
+# pandas, plotly and the pyarrow writers behind exports are imported on first use,
+# after the header and metrics have rendered
+pd = lazy_module("pandas")
+px = lazy_module("plotly.express")
+go = lazy_module("plotly.graph_objects")
+export = lazy_module("export")
+
+# Optional review corpus on disk: CSV/JSONL/Parquet files or directories,
+# separated by os.pathsep. Falls back to the bundled REVIEWS when unset.
+REVIEW_DATA_PATH = os.environ.get("REVIEW_DATA_PATH", "")
+# spaCy model used to label reviews on ingest (e.g. en_core_web_sm); unset keeps file labels
+REVIEW_SCORING_MODEL = os.environ.get("REVIEW_SCORING_MODEL", "")
+# spaCy model with a parser used to mine highlights/complaints from review text on ingest
+REVIEW_ASPECT_MODEL = os.environ.get("REVIEW_ASPECT_MODEL", "")
+# SQLite cache of scoring/mining results, so restarts only process new or changed reviews
+REVIEW_SCORE_CACHE = os.environ.get("REVIEW_SCORE_CACHE", os.path.join(".cache", "scores.sqlite"))
+# Memory-mapped snapshot of the processed corpus; worker processes open it instead of re-ingesting
+REVIEW_SNAPSHOT_DIR = os.environ.get("REVIEW_SNAPSHOT_DIR", os.path.join(".cache", "snapshot"))
+# SQLite file to keep reviews in instead of memory (e.g. .cache/reviews.sqlite); replaces the snapshot when set
+REVIEW_DATABASE = os.environ.get("REVIEW_DATABASE", "")
+# Drop reviews at least this similar (Jaccard of word bigrams, e.g. 0.8) to an earlier one on ingest; unset keeps all
+REVIEW_DEDUP_THRESHOLD = float(os.environ.get("REVIEW_DEDUP_THRESHOLD", "0") or 0)
+# "1" keeps highlights, complaints, top terms and distinct reviewers in constant-memory sketches instead of exact counts
+REVIEW_APPROXIMATE = os.environ.get("REVIEW_APPROXIMATE", "") == "1"
+
+@st.cache_resource(show_spinner="Loading reviews...")
+def load_dataset(data_path, scoring_model="", aspect_model=""):
+    """Build (or open the snapshot of) the review store and sentiment aggregates once per process"""
+    return analytics.load_dataset(data_path, scoring_model, aspect_model, score_cache=REVIEW_SCORE_CACHE,
+                                  snapshot=REVIEW_SNAPSHOT_DIR, database=REVIEW_DATABASE,
+                                  dedup_threshold=REVIEW_DEDUP_THRESHOLD, approximate=REVIEW_APPROXIMATE)
+
+# Review files dropped here are ingested in the background and swapped in as a new data version
+REVIEW_DROP_DIR = os.environ.get("REVIEW_DROP_DIR", os.path.join("data", "incoming"))
+REVIEW_REFRESH_INTERVAL = float(os.environ.get("REVIEW_REFRESH_INTERVAL", DEFAULT_INTERVAL))
+
+@st.cache_resource(show_spinner=False)
+def load_refresher(data_path, scoring_model="", aspect_model="", drop_dir=""):
+    """Start the drop directory watcher once per server process"""
+    dataset = load_dataset(data_path, scoring_model, aspect_model)
+    return DatasetRefresher(dataset, drop_dir, REVIEW_REFRESH_INTERVAL, scoring_model, aspect_model,
+                            REVIEW_SCORE_CACHE).start()
+
+def current_dataset():
+    """Latest data version; read once per rerun so the whole page shows a single version"""
+    return load_refresher(REVIEW_DATA_PATH, REVIEW_SCORING_MODEL, REVIEW_ASPECT_MODEL, REVIEW_DROP_DIR).dataset
+
+# Directory of per-park recommendation JSON files; edits are picked up without a restart
+RECOMMENDATIONS_DIR = os.environ.get("RECOMMENDATIONS_DIR", analytics.DEFAULT_CATALOG_DIR)
+
+# Where the full-text search index is persisted between restarts
+SEARCH_INDEX_DIR = os.environ.get("SEARCH_INDEX_DIR", os.path.join(".cache", "search_index"))
+# Optional spaCy model to lemmatize indexed text and queries; unset uses plain word tokens
+SEARCH_ANALYZER_MODEL = os.environ.get("SEARCH_ANALYZER_MODEL", "")
+# Where the review vectors behind "More like this" are persisted between restarts
+SIMILAR_INDEX_DIR = os.environ.get("SIMILAR_INDEX_DIR", os.path.join(".cache", "vector_index"))
+# Optional spaCy model with word vectors (e.g. en_core_web_md); unset embeds hashed words and word pairs
+SIMILAR_VECTOR_MODEL = os.environ.get("SIMILAR_VECTOR_MODEL", "")
+SIMILAR_REVIEWS = 5
+
+# Exports are streamed to files here in chunks, then offered for download
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(".cache", "exports"))
+# st.download_button holds the whole file in memory, so larger exports are left on disk instead
+EXPORT_DOWNLOAD_LIMIT_MB = float(os.environ.get("EXPORT_DOWNLOAD_LIMIT_MB", "100"))
+EXPORT_TABLES = {"Filtered reviews": None, "Park table": "parks", "Feature table": "features",
+                 "Park × feature table": "park_features"}
+
+# Rerun profiling: DASHBOARD_DEBUG=1 (or ?debug=1 in the URL) shows the timings panel in the sidebar.
+# PROFILE_METRICS_PORT serves Prometheus text at :PORT/metrics, PROFILE_METRICS_FILE rewrites it
+# after every rerun (node_exporter textfile collector) and PROFILE_LOG=1 logs one JSON line per rerun.
+DASHBOARD_DEBUG = os.environ.get("DASHBOARD_DEBUG", "") == "1"
+PROFILE_METRICS_PORT = int(os.environ.get("PROFILE_METRICS_PORT", "0") or 0)
+PROFILE_METRICS_FILE = os.environ.get("PROFILE_METRICS_FILE", "")
+PROFILE_LOG = os.environ.get("PROFILE_LOG", "") == "1"
+
+@st.cache_resource(show_spinner=False)
+def start_profile_export(port, log):
+    """Start the metrics endpoint and the JSON rerun log once per server process"""
+    if log:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        profile_logger = logging.getLogger("dashboard.profile")
+        profile_logger.addHandler(handler)
+        profile_logger.setLevel(logging.INFO)
+        profile_logger.propagate = False
+    return serve_metrics(profiler, port) if port else None
+
+@st.cache_resource(show_spinner="Loading language model...")
+def nlp_model(name):
+    """Load a spaCy model once per server process, the first time a page needs it"""
+    return load_model(name)
+
+# Index builds are logged here rather than printed by the server
+index_logger = logging.getLogger("dashboard.index")
+
+# One entry each: a refresh is a new data version, and the index of the old one is not needed again
+@st.cache_resource(max_entries=1, show_spinner="Preparing search index...")
+def load_search_index(fingerprint, index_dir, analyzer_model, _store):
+    """Open the persisted search index, building it on first use only"""
+    analyzer = spacy_analyzer(nlp_model(analyzer_model)) if analyzer_model else None
+    return open_or_build(index_dir, _store.texts(), f"{fingerprint}|{analyzer_model}", analyzer,
+                         report=index_logger.info)
+
+@st.cache_resource(max_entries=1, show_spinner="Embedding reviews...")
+def load_vector_index(fingerprint, index_dir, vector_model, _store):
+    """Open the persisted review vectors, embedding the corpus on first use only"""
+    embed = similar.spacy_embedder(nlp_model(vector_model)) if vector_model else None
+    return similar.open_or_build(index_dir, _store.texts(), len(_store), f"{fingerprint}|{vector_model}", embed,
+                                 report=index_logger.info)
 
 def create_bar_chart(data, x_col, y_col, title, color_map):
     """Create a customized bar chart using plotly express"""
@@ -85,6 +135,7 @@ def create_bar_chart(data, x_col, y_col, title, color_map):
     fig.update_layout(showlegend=False)
     return fig
 
+@profiler.timed("create_pie_chart")
 def create_pie_chart(positive, negative, neutral=0):
     """Create a pie chart showing sentiment distribution"""
     fig = go.Figure(data=[go.Pie(
@@ -95,209 +146,427 @@ def create_pie_chart(positive, negative, neutral=0):
     fig.update_layout(title='Overall Sentiment Distribution')
     return fig
 
-def filter_data(park_filter, feature_filter):
-    """Filter reviews based on selected park and feature"""
-    filtered_reviews = REVIEWS
-    
-    if park_filter != "All Parks":
-        # Remove emoji from park filter
-        park_name = park_filter.split(" ", 1)[1] if " " in park_filter else park_filter
-        filtered_reviews = [r for r in filtered_reviews if r["park"] == park_name]
+# Derived frames and figures are cached per (filters, data version) across
+# reruns and sessions; the version key changes whenever the counters do.
+# Arguments starting with "_" are not hashed by Streamlit.
+FIGURE_CACHE_ENTRIES = 256
+
+@st.cache_resource
+def cache_counters():
+    """Process-wide lookup/miss counters for the frame and figure caches"""
+    return defaultdict(lambda: {"lookups": 0, "misses": 0})
+
+def count_miss(name):
+    """Called from inside a cached function body, which only runs on a miss"""
+    cache_counters()[name]["misses"] += 1
+
+def cached_call(name, cached_fn, *args):
+    """Call a cached builder and record the lookup for the hit/miss counters"""
+    cache_counters()[name]["lookups"] += 1
+    return cached_fn(*args)
+
+def cache_stats():
+    """Hit/miss counts per cached builder"""
+    return {name: {"hits": c["lookups"] - c["misses"], "misses": c["misses"]}
+            for name, c in sorted(cache_counters().items())}
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def park_frame(data_version, _dataset):
+    """Park sentiment percentages from the counters, with emoji display names"""
+    count_miss("park_frame")
+    return analytics.park_frame(_dataset)
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def feature_frame(data_version, _dataset):
+    """Feature sentiment percentages from the counters, with emoji display names"""
+    count_miss("feature_frame")
+    return analytics.feature_frame(_dataset)
+
+def create_park_sentiment_chart(park_df, selected_park):
+    """Stacked park comparison bar chart, highlighting the selected park"""
+    y_cols = ["Positive", "Negative", "Neutral"] if park_df["Neutral"].sum() > 0 else ["Positive", "Negative"]
+    color_map = {"Positive": "#4CAF50", "Negative": "#F44336", "Neutral": "#FF9800"}
     
-    if feature_filter != "All Features":
-        # Remove emoji from feature filter
-        feature_name = feature_filter.split(" ", 1)[1] if " " in feature_filter else feature_filter
-        filtered_reviews = [r for r in filtered_reviews if r["feature"] == feature_name]
+    if selected_park != "All Parks":
+        chart_title = f"{selected_park} vs Other Parks"
+        # Highlight the selected park with a different color pattern
+        fig = px.bar(park_df, x="Park", y=y_cols, title=chart_title, barmode='stack',
+                     color_discrete_map=color_map)
         
-    return filtered_reviews
+        # Add a pattern to highlight the selected park
+        if selected_park in set(park_df["Park"]):
+            for bar in fig.data[:3]:  # Apply to all sentiment bars for selected park
+                bar.marker.line = dict(width=2, color="#1E88E5")
+                bar.marker.pattern = dict(shape="x", solidity=0.2)
+    else:
+        chart_title = "Park Sentiment Distribution"
+        fig = px.bar(park_df, x="Park", y=y_cols, title=chart_title, barmode='stack',
+                     color_discrete_map=color_map)
+    return fig
 
-def get_recommendations(park):
-    """Get park-specific recommendations based on sentiment analysis research"""
-    # First extract park name without emoji if needed
-    park_name = park.split(" ", 1)[1] if " " in park else park 
+def create_feature_sentiment_chart(feature_df, selected_park, selected_feature):
+    """Stacked feature sentiment bar chart, optionally narrowed to one feature"""
+    if selected_park != "All Parks":
+        chart_title = f"{selected_park} Feature Analysis"
+    else:
+        chart_title = "Feature Sentiment Analysis"
     
-    recommendations = {
-        "Yellowstone": {
-            "improvements": [
-                "Increase wildlife protection zones and viewing platforms 🦬",
-                "Improve facility maintenance schedules for restrooms 🚽",
-                "Implement traffic management system during peak seasons 🚦"
-            ],
-            "enhancements": [
-                "Expand guided wolf watching programs 🐺",
-                "Create virtual reality geyser experiences 🌋",
-                "Develop wildlife tracking apps for visitors 📱"
-            ],
-            "research": "Research shows visitors highly value wildlife viewing experiences in Yellowstone, with social media posts demonstrating positive emotional responses to wildlife sightings."
-        },
-        "Yosemite": {
-            "improvements": [
-                "Implement reservations for popular trails 🥾",
-                "Increase shuttle service frequency 🚌",
-                "Expand parking capacity at main trailheads 🅿️"
-            ],
-            "enhancements": [
-                "Create more climbing programs for beginners 🧗",
-                "Develop stargazing observation points ✨",
-                "Add more interpretive hiking trails 🪧"
-            ],
-            "research": "Studies indicate visitors to Yosemite express high satisfaction with scenic beauty but frustration with parking and crowding issues during peak seasons."
-        },
-        "Grand Canyon": {
-            "improvements": [
-                "Expand shade structures at viewpoints ⛱️",
-                "Increase water refill stations on trails 💧",
-                "Implement tiered pricing structure for different access levels 💰"
-            ],
-            "enhancements": [
-                "Create accessible viewpoints for visitors with disabilities ♿",
-                "Develop geology-focused educational programs 🪨",
-                "Install time-lapse cameras for erosion education 📷"
-            ],
-            "research": "Analysis of visitor reviews shows extremely high positive sentiment regarding Grand Canyon's scenery, but concerns about fees and facilities."
-        },
-        "Zion": {
-            "improvements": [
-                "Redesign shuttle loading areas to reduce wait times ⏱️",
-                "Renovate restroom facilities parkwide 🚻",
-                "Implement digital permits for popular hikes to reduce crowding 📲"
-            ],
-            "enhancements": [
-                "Create flash flood awareness programs 🌊",
-                "Develop night sky observation areas 🌌",
-                "Add more family-friendly short trail options 👨‍👩‍👧‍👦"
-            ],
-            "research": "Sentiment analysis reveals visitor frustration with crowding on popular trails like Angels Landing and concerns about safety in narrow sections."
-        },
-        "Big Bend": {
-            "improvements": [
-                "Improve cellular coverage in emergency areas 📶",
-                "Increase water availability at remote trailheads 🚰",
-                "Enhance road maintenance in remote areas 🛣️"
-            ],
-            "enhancements": [
-                "Develop dark sky viewing platforms with telescopes 🔭",
-                "Create desert ecology educational programs 🌵",
-                "Expand guided border culture experiences 🏜️"
-            ],
-            "research": "Reviews highlight exceptional stargazing opportunities and desert landscapes, with neutral to positive sentiment about remote camping experiences."
-        },
-        "Black Canyon": {
-            "improvements": [
-                "Add safety railings at selected viewpoints 🚧",
-                "Improve trail marking for difficulty levels 🥾",
-                "Expand visitor center educational displays 🏫"
-            ],
-            "enhancements": [
-                "Create guided geology tours 🪨",
-                "Develop photography workshops focused on canyon lighting 📸",
-                "Add more intermediate hiking options 🏞️"
-            ],
-            "research": "Visitor sentiment shows strong positive reactions to dramatic views but concerns about trail safety and clarity of difficulty ratings."
-        },
-        "Biscayne": {
-            "improvements": [
-                "Enhance boat launch facilities ⛵",
-                "Improve reef protection markers 🪸",
-                "Increase water quality monitoring 🔍"
-            ],
-            "enhancements": [
-                "Expand guided snorkeling tours with marine biologists 🐠",
-                "Create underwater photography programs 📷",
-                "Develop coral reef conservation education 🐡"
-            ],
-            "research": "Analysis of reviews indicates high satisfaction with marine wildlife viewing but some concerns about facility maintenance and accessibility."
-        },
-        "Hot Springs": {
-            "improvements": [
-                "Modernize historic bathhouse facilities while preserving character 🏛️",
-                "Create more seating areas along promenade 🪑",
-                "Improve accessibility options for mobility-limited visitors ♿"
-            ],
-            "enhancements": [
-                "Develop interactive exhibits on thermal water science ♨️",
-                "Create historical reenactments of 1920s spa culture 🕰️",
-                "Expand wellness programs using natural springs 💆"
-            ],
-            "research": "Sentiment analysis shows mixed opinions about facilities, with positive reactions to historical aspects but desire for modernization of amenities."
-        },
-        "Independence": {
-            "improvements": [
-                "Reduce queue times at Liberty Bell with timed entries ⏳",
-                "Enhance signage for self-guided history tours 🪧",
-                "Improve accessibility for historic buildings ♿"
-            ],
-            "enhancements": [
-                "Create augmented reality historical experiences 📱",
-                "Develop interactive constitutional history programs 📜",
-                "Expand living history demonstrations 🎭"
-            ],
-            "research": "Visitors express highly positive sentiment about historical significance and preservation, with suggestions for enhanced interpretive experiences."
-        },
-        "Valley Forge": {
-            "improvements": [
-                "Implement weekend crowd management strategies 👥",
-                "Expand parking at popular monuments 🅿️",
-                "Create more rest areas along hiking trails 🪑"
-            ],
-            "enhancements": [
-                "Develop Revolutionary War reenactments ⚔️",
-                "Create military strategy educational programs 🗺️",
-                "Expand winter encampment living history exhibits ❄️"
-            ],
-            "research": "Review analysis indicates concerns about weekend crowding affecting visitor experience at historical monuments."
-        },
-        "Dry Tortugas": {
-            "improvements": [
-                "Increase frequency of ferry service ⛴️",
-                "Enhance camping reservations system ⛺",
-                "Improve weather shelter facilities ⛈️"
-            ],
-            "enhancements": [
-                "Expand guided snorkeling programs 🤿",
-                "Create night sky viewing events 🌠",
-                "Develop marine conservation education 🐬"
-            ],
-            "research": "Extremely high positive sentiment in visitor reviews, especially regarding marine wildlife and remote island experience quality."
-        },
-        "Everglades": {
-            "improvements": [
-                "Enhance mosquito management during peak seasons 🦟",
-                "Improve accessibility of wilderness waterways 🛶",
-                "Create more elevated boardwalks for wildlife viewing 👀"
-            ],
-            "enhancements": [
-                "Develop guided night expeditions 🌙",
-                "Create ecosystem restoration education programs 🌿",
-                "Expand photography blinds for wildlife viewing 📸"
-            ],
-            "research": "Social media sentiment analysis shows strong positive emotions related to wildlife sightings, especially birds and alligators."
-        },
-        "All Parks": {
-            "improvements": [
-                "Implement timed entry systems to reduce crowding ⏱️",
-                "Increase maintenance frequency for restroom facilities 🧹",
-                "Consider tiered pricing options 💰"
-            ],
-            "enhancements": [
-                "Develop more wildlife viewing programs 🦉",
-                "Add panoramic viewpoint installations 🌅",
-                "Create interactive educational displays 📚"
-            ],
-            "research": "Research across multiple parks shows visitors generally express positive sentiment, with joy and anticipation being common emotions in social media posts about park visits."
-        }
-    }
+    # Apply feature filter if selected
+    if selected_feature != "All Features":
+        # Extract feature name without emoji
+        feature_name = selected_feature.split(" ", 1)[1] if " " in selected_feature else selected_feature
+        feature_df = feature_df[feature_df["feature"] == feature_name]
     
-    return recommendations.get(park_name, recommendations["All Parks"])
+    fig = px.bar(feature_df, x="display_name", y=["positive", "negative", "neutral"] if feature_df["neutral"].sum() > 0 else ["positive", "negative"], 
+                title=chart_title, barmode='stack',
+                color_discrete_map={"positive": "#4CAF50", "negative": "#F44336", "neutral": "#FF9800"})
+    fig.update_xaxes(title="Feature")
+    fig.update_yaxes(title="Sentiment %")
+    return fig
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def park_comparison(parks, data_version, _dataset):
+    """Comparison statistics for a tuple of park names at one data version"""
+    count_miss("comparison")
+    return analytics.compare_parks(_dataset, list(parks))
 
-def national_park_dashboard():    
+def create_comparison_chart(parks_df):
+    """Positive share per park with its confidence interval as error bars"""
+    fig = px.bar(parks_df, x="Park", y="Positive", title="Positive Sentiment (95% confidence interval)",
+                 error_y=parks_df["Positive high"] - parks_df["Positive"],
+                 error_y_minus=parks_df["Positive"] - parks_df["Positive low"],
+                 hover_data={"Rank": True, "Reviews": True}, color_discrete_sequence=["#4CAF50"])
+    fig.update_yaxes(title="Positive %", range=[0, 100])
+    return fig
+
+def create_feature_heatmap(features_df):
+    """Positive % per park and feature; blank cells have no reviews"""
+    fig = px.imshow(features_df, zmin=0, zmax=100, aspect="auto", color_continuous_scale="RdYlGn",
+                    labels={"color": "Positive %"}, title="Positive Sentiment by Feature")
+    fig.update_layout(height=max(300, 28 * len(features_df) + 120))
+    return fig
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def comparison_figures(parks, data_version, _dataset):
+    """Cached comparison bar chart and feature heatmap"""
+    count_miss("comparison_figures")
+    comparison = cached_call("comparison", park_comparison, parks, data_version, _dataset)
+    return create_comparison_chart(comparison.parks), create_feature_heatmap(comparison.features)
+
+def render_comparison(dataset):
+    """Side-by-side statistics for any subset of parks"""
+    aggregates = dataset.aggregates
+    options = [f"{park_emoji(p)} {p}" for p, reviewed in zip(aggregates.parks, aggregates.reviewed_parks()) if reviewed]
+    selected = st.multiselect("Parks to compare", options, default=options[:3], key="compare_parks")
+    if not selected:
+        st.info("Select parks to compare")
+        return
+    parks = tuple(analytics.strip_emoji(p) for p in selected)
+    comparison = cached_call("comparison", park_comparison, parks, dataset.data_version, dataset)
+    bar_fig, heatmap_fig = cached_call("comparison_figures", comparison_figures, parks, dataset.data_version, dataset)
+    st.dataframe(comparison.parks.drop(columns="ParkName"), hide_index=True, use_container_width=True,
+                 column_config={
+                     "Positive": st.column_config.NumberColumn(format="%.1f%%"),
+                     "Negative": st.column_config.NumberColumn(format="%.1f%%"),
+                     "Neutral": st.column_config.NumberColumn(format="%.1f%%"),
+                     "Positive low": st.column_config.NumberColumn("95% CI low", format="%.1f%%"),
+                     "Positive high": st.column_config.NumberColumn("95% CI high", format="%.1f%%"),
+                     # Empty for parks seeded from published percentages
+                     "Reviews": st.column_config.NumberColumn(format="%d"),
+                 })
+    chart_col, heatmap_col = st.columns(2)
+    chart_col.plotly_chart(bar_fig, use_container_width=True)
+    heatmap_col.plotly_chart(heatmap_fig, use_container_width=True)
+
+# Figures are shared read-only objects, so cache_resource avoids re-pickling them
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def park_sentiment_figure(selected_park, data_version, _dataset):
+    """Cached park comparison chart for the current data version"""
+    count_miss("park_figure")
+    park_df = cached_call("park_frame", park_frame, data_version, _dataset)
+    return create_park_sentiment_chart(park_df, selected_park)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def feature_sentiment_figure(selected_park, selected_feature, data_version, _dataset):
+    """Cached feature sentiment chart for the current data version"""
+    count_miss("feature_figure")
+    feature_df = cached_call("feature_frame", feature_frame, data_version, _dataset)
+    return create_feature_sentiment_chart(feature_df, selected_park, selected_feature)
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def sentiment_pie_figure(selected_park, data_version, _dataset):
+    """Pie chart for the selected park, or the cross-park average"""
+    count_miss("pie_figure")
+    if selected_park != "All Parks":
+        # Extract park name without emoji
+        park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
+        metrics = analytics.park_metrics(_dataset, park_name)
+        return create_pie_chart(metrics.positive, metrics.negative, metrics.neutral)
+    metrics = analytics.overall_metrics(_dataset)
+    return create_pie_chart(metrics.avg_positive, metrics.avg_negative, metrics.avg_neutral)
+
+TREND_GRANULARITIES = {"Daily": "day", "Weekly": "week", "Monthly": "month"}
+
+def create_trend_chart(trend_df, title):
+    """Line chart of sentiment percentages per period"""
+    y_cols = ["Positive %", "Negative %", "Neutral %"] if trend_df["Neutral"].sum() > 0 else ["Positive %", "Negative %"]
+    fig = px.line(trend_df, x="period", y=y_cols, title=title, markers=len(trend_df) <= 60,
+                  color_discrete_map={"Positive %": "#4CAF50", "Negative %": "#F44336", "Neutral %": "#FF9800"},
+                  hover_data={"total": True})
+    fig.update_xaxes(title="Period")
+    fig.update_yaxes(title="Sentiment %", range=[0, 100])
+    fig.update_layout(legend_title_text="")
+    return fig
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def trend_figure(selected_park, selected_feature, granularity, start, end, data_version, _dataset):
+    """Cached trend chart, built from the pre-aggregated rollups"""
+    count_miss("trend_figure")
+    trend_df = analytics.sentiment_trend(_dataset, selected_park, selected_feature, granularity, start, end)
+    if trend_df.empty:
+        return None
+    scope = " / ".join(name for name in (selected_park, selected_feature) if not name.startswith("All "))
+    label = {v: k for k, v in TREND_GRANULARITIES.items()}[granularity]
+    return create_trend_chart(trend_df, f"{label} Sentiment Trend" + (f" - {scope}" if scope else ""))
+
+def render_trends(dataset, selected_park, selected_feature):
+    """Sentiment over time for the current filters, at a chosen granularity and date range"""
+    date_range = analytics.trend_date_range(dataset)
+    if date_range is None:
+        st.info("No dated reviews to chart")
+        return
+    first, last = date_range
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        granularity_label = st.selectbox("Granularity", list(TREND_GRANULARITIES), index=2, key="trend_granularity")
+    with c2:
+        picked = st.date_input("Date range", value=(first, last), min_value=first, max_value=last,
+                               key="trend_range")
+    # While a range is half-picked the widget returns only the start date
+    picked = tuple(picked) if isinstance(picked, (tuple, list)) else (picked,)
+    start = picked[0] if picked else first
+    end = picked[1] if len(picked) > 1 else last
+    fig = cached_call("trend_figure", trend_figure, selected_park, selected_feature,
+                      TREND_GRANULARITIES[granularity_label], start, end, dataset.data_version, dataset)
+    if fig is None:
+        st.info("No dated reviews match the current filters and date range")
+        return
+    st.plotly_chart(fig, use_container_width=True)
+
+SENTIMENT_COLORS = {"Positive": "#4CAF50", "Negative": "#F44336", "Neutral": "#FF9800"}
+REVIEW_PAGE_SIZES = [10, 20, 50, 100]
+REVIEW_SORT_ORDERS = {"Default": "default", "Most recent": "recent",
+                      "Positive first": "positive", "Negative first": "negative"}
+# Sorted row ids of up to 1M matches are 8 MB each, so fewer of them are kept than of figures
+REVIEW_ORDER_CACHE_ENTRIES = 32
+
+@st.cache_resource(max_entries=REVIEW_ORDER_CACHE_ENTRIES, show_spinner=False)
+def sorted_review_rows(park, feature, query, order, data_version, _dataset, _rows):
+    """Matching row ids in display order, sorted once per (filters, query, order, data version)"""
+    count_miss("review_order")
+    if query:
+        # Back to insertion order before applying the chosen display order
+        _rows = np.sort(_rows)
+    return _dataset.store.sort_rows(_rows, order)
+
+def review_card_html(review):
+    """HTML body of one review card"""
+    sentiment_color = SENTIMENT_COLORS.get(review["sentiment"], "#FF9800")
+    return f"""
+    <div style="border-left: 4px solid {sentiment_color}; padding-left: 1rem;">
+        <p style="font-weight: bold; margin-bottom: 0.2rem;">{html.escape(review['park'])} - {html.escape(review['feature'])}</p>
+        <p style="color: {sentiment_color}; margin-top: 0; margin-bottom: 0.5rem;">{review['sentiment']}{f" · {review['date']}" if review.get('date') else ""}</p>
+        <p style="margin-top: 0;">{html.escape(review['text'])}</p>
+    </div>
+    """
+
+def review_page_html(reviews):
+    """The whole visible page as one HTML element, one row per review"""
+    rows = "".join(
+        f"<div style='display: flex; gap: 1rem; align-items: flex-start; border-bottom: 1px solid #ddd; padding: 0.5rem 0;'>"
+        f"<div style='font-size: 1.5rem; min-width: 4rem; text-align: center;'>{r['park_emoji']}{r['feature_emoji']}</div>"
+        f"<div style='flex: 1;'>{review_card_html(r)}</div></div>"
+        for r in reviews
+    )
+    return f"<div>{rows}</div>"
+
+def search_rows(dataset, query, rows):
+    """BM25-ranked row ids for a text query, restricted to the filtered rows"""
+    index = load_search_index(f"{dataset.fingerprint}|{len(dataset.store)}",
+                              SEARCH_INDEX_DIR, SEARCH_ANALYZER_MODEL, dataset.store)
+    ranked, _ = index.search(query, candidates=rows)
+    return ranked
+
+def similar_rows(dataset, row):
+    """(rows, cosine similarities) of the reviews most like review row, across all parks"""
+    index = load_vector_index(f"{dataset.fingerprint}|{len(dataset.store)}",
+                              SIMILAR_INDEX_DIR, SIMILAR_VECTOR_MODEL, dataset.store)
+    return index.similar(row, SIMILAR_REVIEWS)
+
+def has_similar(review):
+    """Whether "More like this" can match review: with hashed vectors, stop-word-only texts embed to zero"""
+    # spaCy vectors cover stop words too, so only the hash embedder needs the check
+    return bool(SIMILAR_VECTOR_MODEL) or similar.has_content_words(review["text"])
+
+def show_similar(row):
+    """Button callback: show the reviews like review row (None closes the panel)"""
+    st.session_state["similar_to"] = row
+
+def render_similar(dataset, row):
+    """The review picked with "More like this" and the reviews nearest to it"""
+    with profiler.section("similar"):
+        rows, scores = similar_rows(dataset, row)
+    with st.container(border=True):
+        c1, c2 = st.columns([6, 1])
+        with c1:
+            st.markdown("#### Reviews like this one")
+        with c2:
+            st.button("Close", key="similar_close", on_click=show_similar, args=(None,))
+        st.markdown(review_card_html(dataset.store.records([row])[0]), unsafe_allow_html=True)
+        if not len(rows):
+            st.caption("No similar reviews yet")
+        for review, score in zip(dataset.store.records(rows), scores.tolist()):
+            st.markdown("---")
+            st.markdown(review_card_html(review), unsafe_allow_html=True)
+            st.caption(f"{score:.0%} similar")
+
+def render_reviews(dataset, selected_park, selected_feature):
+    """Paginated review list: only the visible page is materialized and rendered"""
+    # A row picked on an earlier data version may be past the end of the current one
+    similar_to = st.session_state.get("similar_to")
+    if similar_to is not None and similar_to < len(dataset.store):
+        # The vectors are only embedded (or opened) once someone asks for similar reviews
+        render_similar(dataset, similar_to)
+    query = st.text_input("Search reviews", key="review_query",
+                          placeholder='Keywords or "exact phrase", e.g. crowded "angels landing"')
+    searching = bool(query.strip())
+    with profiler.section("filter_rows"):
+        rows = filter_rows(dataset, selected_park, selected_feature)
+    if searching:
+        # The index is only opened (or built) once someone actually searches
+        rows = search_rows(dataset, query, rows)
+    if not len(rows):
+        st.warning("No reviews match the current filters")
+        return
+    render_export(dataset, rows, f"{selected_park}|{selected_feature}|{query.strip()}")
+    
+    # "Relevance" (search ranking order) is offered only while searching
+    sort_orders = {"Relevance": None, **REVIEW_SORT_ORDERS} if searching else REVIEW_SORT_ORDERS
+    c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+    with c1:
+        sort_label = st.selectbox("Sort reviews", list(sort_orders), key="review_sort")
+    with c2:
+        page_size = st.selectbox("Per page", REVIEW_PAGE_SIZES, index=1, key="review_page_size")
+    page_count = max(1, -(-len(rows) // page_size))
+    with c3:
+        # Keyed on the filters so the cursor resets instead of pointing past the last page
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1,
+                               key=f"review_page:{selected_park}:{selected_feature}:{page_size}")
+    with c4:
+        compact = st.toggle("Compact view", key="review_compact",
+                            help="Render the page as a single element (faster for large pages)")
+    
+    # The matches are put in display order once per selection and data version (page changes reuse it);
+    # only the visible slice is turned into dicts
+    start = (int(page) - 1) * page_size
+    order = sort_orders[sort_label]
+    if order is not None:
+        rows = cached_call("review_order", sorted_review_rows, selected_park, selected_feature, query.strip(),
+                           order, dataset.data_version, dataset, rows)
+    page_rows = rows[start:start + page_size]
+    reviews = dataset.store.records(page_rows)
+    st.caption(f"Showing {start + 1:,}–{start + len(reviews):,} of {len(rows):,} reviews")
+    
+    if compact:
+        st.markdown(review_page_html(reviews), unsafe_allow_html=True)
+        # The page is one element without per-review buttons, so similar reviews are picked from a list
+        rows_by_label = {f"{start + i + 1}. {review['park']} - {review['feature']}: {review['text'][:80]}": row
+                         for i, (row, review) in enumerate(zip(page_rows.tolist(), reviews)) if has_similar(review)}
+        if not rows_by_label:
+            return
+        c1, c2 = st.columns([4, 1])
+        with c1:
+            picked = st.selectbox("More like this", list(rows_by_label), key="similar_pick")
+        with c2:
+            st.button("Find similar", key="similar_compact", on_click=show_similar, args=(rows_by_label[picked],))
+        return
+    for row, review in zip(page_rows.tolist(), reviews):
+        with st.container():
+            cols = st.columns([1, 10])
+            with cols[0]:
+                st.markdown(f"<h3 style='text-align: center;'>{review['park_emoji']}{review['feature_emoji']}</h3>", unsafe_allow_html=True)
+            with cols[1]:
+                st.markdown(review_card_html(review), unsafe_allow_html=True)
+                if has_similar(review):
+                    st.button("More like this", key=f"similar:{row}", on_click=show_similar, args=(row,))
+            st.markdown("---")
+
+def render_export(dataset, rows, selection):
+    """Download the filtered reviews or an aggregate table; the file is written chunk by chunk on request"""
+    with st.expander("📥 Export data"):
+        c1, c2 = st.columns([2, 1])
+        with c1:
+            table = EXPORT_TABLES[st.selectbox("Data", list(EXPORT_TABLES), key="export_table",
+                                               help=f"{len(rows):,} reviews match the current filters")]
+        with c2:
+            fmt = st.radio("Format", list(export.FORMATS), horizontal=True, key="export_format")
+        # Named by content, so an export is written once per selection and data version
+        name = table or "reviews-" + hashlib.sha1(selection.encode("utf-8")).hexdigest()[:12]
+        path = os.path.join(EXPORT_DIR, f"{name}-{dataset.data_version.replace(':', '-')}.{fmt}")
+        if not os.path.exists(path):
+            if not st.button("Prepare file", key="export_prepare"):
+                return
+            os.makedirs(EXPORT_DIR, exist_ok=True)
+            export.prune_exports(EXPORT_DIR)
+            with st.spinner("Writing export..."), profiler.section("export"):
+                if table:
+                    export.write_aggregates(dataset.aggregates, table, path, fmt)
+                else:
+                    export.write_reviews(dataset.store, rows, path, fmt)
+        size_mb = os.path.getsize(path) / 2**20
+        if size_mb > EXPORT_DOWNLOAD_LIMIT_MB:
+            st.info(f"The export is {size_mb:,.0f} MB, above the {EXPORT_DOWNLOAD_LIMIT_MB:g} MB download limit; "
+                    f"it was written to {os.path.abspath(path)}")
+            return
+        with open(path, "rb") as f:
+            st.download_button(f"Download {fmt.upper()} ({size_mb:.1f} MB)", f, file_name=os.path.basename(path),
+                               mime=export.FORMATS[fmt], key="export_download")
+
+def render_aspects(aspects, label):
+    """Markdown list of aspects with their share of mentions"""
+    if not aspects:
+        st.caption("Not enough aspect mentions yet")
+        return
+    st.markdown("\n".join(
+        f"- **{a.aspect}**{' ' + a.emoji if a.emoji else ''}: {format_pct(a.share)} {label}" for a in aspects
+    ))
+
+def render_terms(terms):
+    """Markdown list of the most mentioned terms with their estimated reviews and positive share"""
+    if not terms:
+        st.caption("No terms counted yet")
+        return
+    st.markdown("\n".join(
+        f"- **{t.term}**: ~{t.reviews:,} reviews{f' (+{t.error:,} at most)' if t.error else ''}, "
+        f"{format_pct(t.positive)} positive"
+        for t in terms
+    ))
+
+def national_park_dashboard(dataset=None):
+    if dataset is None:
+        dataset = current_dataset()
+    
     # Header
     st.title("🏞️ National Park Sentiment Dashboard")
     st.markdown("Analyzing visitor experiences across U.S. National Parks")
     
     # Create display names with emojis for UI
-    park_display_names = ["All Parks"] + [f"{data['emoji']} {park}" for park, data in PARKS_DATA.items()]
-    feature_display_names = ["All Features"] + [f"{f['emoji']} {f['feature']}" for f in FEATURE_DATA]
+    # Parks and features with data in this version, including ones only the ingested corpus or a refresh added
+    aggregates = dataset.aggregates
+    park_display_names = ["All Parks"] + [f"{park_emoji(park)} {park}" for park, reviewed
+                                          in zip(aggregates.parks, aggregates.reviewed_parks()) if reviewed]
+    feature_display_names = ["All Features"] + [f"{feature_emoji(feature)} {feature}" for feature, counts
+                                                in zip(aggregates.features, aggregates.feature_counts) if counts.any()]
     
     # Filters
     col1, col2 = st.columns(2)
@@ -310,6 +579,12 @@ def national_park_dashboard():
     selected_park = selected_park_display
     selected_feature = selected_feature_display
     
+    # Comparison mode: any subset of parks side by side
+    with profiler.section("comparison"):
+        if st.toggle("⚖️ Compare parks", key="compare_mode"):
+            st.subheader("⚖️ Park Comparison")
+            render_comparison(dataset)
+    
     # Display selected park header if a specific park is selected
     if selected_park != "All Parks":
         st.markdown(f"## {selected_park} Analysis")
@@ -324,354 +599,175 @@ def national_park_dashboard():
         st.markdown(f"Detailed analysis and recommendations for {selected_park}")
     
     # Main metrics
-    st.subheader("📊 Key Metrics")
-    m1, m2, m3, m4 = st.columns(4)
-    
-    # Dynamic metrics based on selection
-    if selected_park != "All Parks":
-        # Extract park name without emoji
-        park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
-        
-        # Park-specific metrics
-        park_data = PARKS_DATA[park_name]
-        m1.metric("Park Name", selected_park)
-        m2.metric("Positive Sentiment", f"{park_data['positive']}%")
-        m3.metric("Negative Sentiment", f"{park_data['negative']}%")
+    with profiler.section("metrics"):
+        st.subheader("📊 Key Metrics")
+        m1, m2, m3, m4 = st.columns(4)
         
-        if 'neutral' in park_data and park_data['neutral'] > 0:
-            m4.metric("Neutral Sentiment", f"{park_data['neutral']}%")
+        # Dynamic metrics based on selection
+        if selected_park != "All Parks":
+            # Extract park name without emoji
+            park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
+            
+            # Park-specific metrics, read from the maintained counters
+            metrics = analytics.park_metrics(dataset, park_name)
+            m1.metric("Park Name", selected_park)
+            m2.metric("Positive Sentiment", format_pct(metrics.positive))
+            m3.metric("Negative Sentiment", format_pct(metrics.negative))
+            
+            if metrics.neutral > 0:
+                m4.metric("Neutral Sentiment", format_pct(metrics.neutral))
+            else:
+                # Park's position in ranking
+                # Parks without reviews rank after every reviewed one
+                m4.metric("Rank (by Positive)", f"{metrics.rank} of {metrics.total_parks}"
+                          if metrics.rank <= metrics.total_parks else "Not ranked yet")
         else:
-            # Find park's position in ranking
-            parks_sorted = sorted(PARKS_DATA.items(), key=lambda x: x[1]['positive'], reverse=True)
-            park_rank = next(i+1 for i, p in enumerate(parks_sorted) if p[0] == park_name)
-            m4.metric("Rank (by Positive)", f"{park_rank} of {len(PARKS_DATA)}")
-    else:
-        # Overall metrics
-        avg_positive = sum(p['positive'] for p in PARKS_DATA.values())/len(PARKS_DATA)
-        avg_negative = sum(p['negative'] for p in PARKS_DATA.values())/len(PARKS_DATA)
-        avg_neutral = sum(p.get('neutral', 0) for p in PARKS_DATA.values())/len(PARKS_DATA)
-        most_positive_park = max(PARKS_DATA.items(), key=lambda x: x[1]['positive'])
-        most_positive_display = f"{most_positive_park[1]['emoji']} {most_positive_park[0]}"
+            # Overall metrics
+            metrics = analytics.overall_metrics(dataset)
+            most_positive_display = f"{park_emoji(metrics.most_positive_park)} {metrics.most_positive_park}"
+            
+            m1.metric("Total Parks", metrics.total_parks)
+            m2.metric("Average Positive", f"{metrics.avg_positive:.1f}%")
+            m3.metric("Average Negative", f"{metrics.avg_negative:.1f}%")
+            m4.metric("Most Positive Park", f"{most_positive_display} ({format_pct(metrics.most_positive_pct)})")
         
-        m1.metric("Total Parks", len(PARKS_DATA))
-        m2.metric("Average Positive", f"{avg_positive:.1f}%")
-        m3.metric("Average Negative", f"{avg_negative:.1f}%")
-        m4.metric("Most Positive Park", f"{most_positive_display} ({most_positive_park[1]['positive']}%)")
+        # Approximate mode: distinct reviewers from the HyperLogLog sketch
+        reviewers = analytics.distinct_reviewers(dataset, selected_park)
+        if reviewers is not None:
+            estimate, error = reviewers
+            st.caption(f"~{estimate:,.0f} distinct reviewers (±{error:.1%} standard error)")
+    # Header, filters and metrics are on screen; everything below may load heavier modules
+    profiler.mark("first_render")
     
     # Charts
     st.subheader("📈 Sentiment Analysis")
     chart1, chart2 = st.columns(2)
     
-    with chart1:
-        # Park comparison chart (highlight selected park if applicable)
-        park_df = pd.DataFrame([
-            {"Park": f"{v['emoji']} {k}", "Positive": v["positive"], "Negative": v["negative"], 
-             "Neutral": v.get("neutral", 0), "ParkName": k}
-            for k, v in PARKS_DATA.items()
-        ])
-        
-        # Filter to selected park if applicable
-        if selected_park != "All Parks":
-            chart_title = f"{selected_park} vs Other Parks"
-            # Highlight the selected park with a different color pattern
-            fig = px.bar(park_df, x="Park", y=["Positive", "Negative", "Neutral"] if "Neutral" in park_df.columns and park_df["Neutral"].sum() > 0 else ["Positive", "Negative"], 
-                        title=chart_title, barmode='stack',
-                        color_discrete_map={"Positive": "#4CAF50", "Negative": "#F44336", "Neutral": "#FF9800"})
-            
-            # Add a pattern to highlight the selected park
-            for i, bar in enumerate(fig.data):
-                for j, park in enumerate(park_df["Park"]):
-                    if park == selected_park:
-                        if i < 3:  # Apply to all sentiment bars for selected park
-                            bar.marker.line = dict(width=2, color="#1E88E5")
-                            bar.marker.pattern = dict(shape="x", solidity=0.2)
-        else:
-            chart_title = "Park Sentiment Distribution"
-            fig = px.bar(park_df, x="Park", y=["Positive", "Negative", "Neutral"] if "Neutral" in park_df.columns and park_df["Neutral"].sum() > 0 else ["Positive", "Negative"], 
-                        title=chart_title, barmode='stack',
-                        color_discrete_map={"Positive": "#4CAF50", "Negative": "#F44336", "Neutral": "#FF9800"})
-        
-        st.plotly_chart(fig, use_container_width=True)
+    with profiler.section("park_chart"):
+        with chart1:
+            # Park comparison chart (highlight selected park if applicable)
+            fig = cached_call("park_figure", park_sentiment_figure, selected_park, dataset.data_version, dataset)
+            st.plotly_chart(fig, use_container_width=True)
     
-    with chart2:
-        # For feature analysis, filter to selected park's features if applicable
-        if selected_park != "All Parks":
-            # Extract park name without emoji
-            park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
-            
-            # Get features mentioned in reviews for this park
-            park_features = [r["feature"] for r in REVIEWS if r["park"] == park_name]
-            
-            # Create a filtered feature dataset focused on this park
-            feature_df = pd.DataFrame(FEATURE_DATA)
-            # Add display name with emoji
-            feature_df["display_name"] = feature_df.apply(lambda row: f"{row['emoji']} {row['feature']}", axis=1)
-            chart_title = f"{selected_park} Feature Analysis"
-        else:
-            feature_df = pd.DataFrame(FEATURE_DATA)
-            # Add display name with emoji
-            feature_df["display_name"] = feature_df.apply(lambda row: f"{row['emoji']} {row['feature']}", axis=1)
-            chart_title = "Feature Sentiment Analysis"
-        
-        # Apply feature filter if selected
-        if selected_feature != "All Features":
-            # Extract feature name without emoji
-            feature_name = selected_feature.split(" ", 1)[1] if " " in selected_feature else selected_feature
-            feature_df = feature_df[feature_df["feature"] == feature_name]
-        
-        fig = px.bar(feature_df, x="display_name", y=["positive", "negative", "neutral"] if "neutral" in feature_df.columns and feature_df["neutral"].sum() > 0 else ["positive", "negative"], 
-                    title=chart_title, barmode='stack',
-                    color_discrete_map={"positive": "#4CAF50", "negative": "#F44336", "neutral": "#FF9800"})
-        fig.update_xaxes(title="Feature")
-        fig.update_yaxes(title="Sentiment %")
-        st.plotly_chart(fig, use_container_width=True)
+    with profiler.section("feature_chart"):
+        with chart2:
+            fig = cached_call("feature_figure", feature_sentiment_figure,
+                              selected_park, selected_feature, dataset.data_version, dataset)
+            st.plotly_chart(fig, use_container_width=True)
+    
+    # Trends over time
+    with profiler.section("trends"):
+        st.subheader("📅 Sentiment Trends")
+        render_trends(dataset, selected_park, selected_feature)
     
     # Insights and Pie Chart
     st.subheader("🔍 Detailed Insights")
     insight_col, pie_col = st.columns([2, 1])
     
-    with insight_col:
-        with st.expander("🌟 Top Positive Aspects", expanded=True):
-            if selected_park != "All Parks":
-                # Extract park name without emoji
-                park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
-                
-                # Park-specific positive aspects
-                if park_name == "Yellowstone":
-                    st.markdown("""
-                    - **Wildlife** 🐻: 92% positive reviews
-                    - **Geysers** 🌋: 88% positive reviews
-                    - **Hiking Trails** 🥾: 75% positive reviews
-                    """)
-                elif park_name == "Yosemite":
-                    st.markdown("""
-                    - **Waterfalls** 🌊: 96% positive reviews
-                    - **Hiking** 🥾: 90% positive reviews
-                    - **Forests** 🌲: 85% positive reviews
-                    """)
-                elif park_name == "Grand Canyon":
-                    st.markdown("""
-                    - **Scenery** 🌄: 98% positive reviews
-                    - **Rim Trails** 🥾: 90% positive reviews
-                    - **Viewpoints** 👀: 85% positive reviews
-                    """)
-                elif park_name == "Zion":
-                    st.markdown("""
-                    - **Narrows** 🏞️: 92% positive reviews
-                    - **Angels Landing** 😇: 85% positive reviews
-                    - **Scenery** 🌅: 80% positive reviews
-                    """)
-                elif park_name == "Big Bend":
-                    st.markdown("""
-                    - **Night Skies** 🌌: 95% positive reviews
-                    - **Desert Views** 🏜️: 90% positive reviews
-                    - **Mountain Trails** ⛰️: 85% positive reviews
-                    """)
-                elif park_name == "Black Canyon":
-                    st.markdown("""
-                    - **Canyon Views** 🏞️: 96% positive reviews
-                    - **Photography** 📸: 88% positive reviews
-                    - **Rim Trails** 🥾: 82% positive reviews
-                    """)
-                elif park_name == "Biscayne":
-                    st.markdown("""
-                    - **Snorkeling** 🤿: 94% positive reviews
-                    - **Boating** ⛵: 88% positive reviews
-                    - **Marine Life** 🐠: 86% positive reviews
-                    """)
-                elif park_name == "Hot Springs":
-                    st.markdown("""
-                    - **Thermal Waters** ♨️: 95% positive reviews
-                    - **Historic Buildings** 🏛️: 85% positive reviews
-                    - **Health Benefits** 💆: 80% positive reviews
-                    """)
-                elif park_name == "Independence":
-                    st.markdown("""
-                    - **Historical Significance** 🏛️: 95% positive reviews
-                    - **Liberty Bell** 🔔: 92% positive reviews
-                    - **Architecture** 🏛️: 88% positive reviews
-                    """)
-                elif park_name == "Valley Forge":
-                    st.markdown("""
-                    - **Historical Significance** ⚔️: 92% positive reviews
-                    - **Memorial Monuments** 🗿: 85% positive reviews
-                    - **Walking Trails** 🚶: 80% positive reviews
-                    """)
-                elif park_name == "Dry Tortugas":
-                    st.markdown("""
-                    - **Marine Life** 🐠: 98% positive reviews
-                    - **Fort Jefferson** 🏰: 94% positive reviews
-                    - **Snorkeling** 🤿: 92% positive reviews
-                    """)
-                elif park_name == "Everglades":
-                    st.markdown("""
-                    - **Wildlife Diversity** 🐊: 95% positive reviews
-                    - **Airboat Tours** 🚤: 88% positive reviews
-                    - **Bird Watching** 🦅: 86% positive reviews
-                    """)
-                else:
-                    st.markdown("""
-                    - **Scenery** 🌄: 90% positive reviews
-                    - **Wildlife** 🦌: 85% positive reviews
-                    - **Natural Features** 🏞️: 82% positive reviews
-                    """)
-            else:
-                # Overall positive aspects
-                st.markdown("""
-                - **Scenery** 🌄: 95% positive reviews
-                - **Wildlife** 🦌: 82% positive reviews
-                - **Hiking Trails** 🥾: 65% positive reviews
-                """)
-        
-        with st.expander("⚠️ Common Complaints", expanded=True):
-            if selected_park != "All Parks":
-                # Extract park name without emoji
-                park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
-                
-                # Park-specific complaints
-                if park_name == "Yellowstone":
-                    st.markdown("""
-                    - **Crowds** 👥: 75% negative mentions
-                    - **Traffic** 🚗: 65% negative mentions
-                    - **Lodging Availability** 🏨: 60% negative mentions
-                    """)
-                elif park_name == "Yosemite":
-                    st.markdown("""
-                    - **Parking** 🅿️: 80% negative mentions
-                    - **Valley Crowds** 👥: 70% negative mentions
-                    - **Campsite Reservations** ⛺: 65% negative mentions
-                    """)
-                elif park_name == "Grand Canyon":
-                    st.markdown("""
-                    - **Summer Heat** ☀️: 70% negative mentions
-                    - **Tour Prices** 💰: 60% negative mentions
-                    - **Shuttle Waits** ⏱️: 55% negative mentions
-                    """)
-                elif park_name == "Zion":
-                    st.markdown("""
-                    - **Shuttle System** 🚌: 80% negative mentions
-                    - **Crowds** 👥: 75% negative mentions  
-                    - **Trail Safety** ⚠️: 60% negative mentions
-                    - **Parking Availability** 🅿️: 55% negative mentions
-                    """)
-                elif park_name == "Big Bend":
-                    st.markdown("""
-                    - **Remote Location** 🏜️: 70% negative mentions
-                    - **Lack of Services** 🏪: 65% negative mentions
-                    - **Extreme Temperatures** 🌡️: 60% negative mentions
-                    """)
-                elif park_name == "Black Canyon":
-                    st.markdown("""
-                    - **Limited Accessibility** ♿: 75% negative mentions
-                    - **Steep Trails** ⚠️: 65% negative mentions
-                    - **Weather Variability** ⛈️: 55% negative mentions
-                    """)
-                elif park_name == "Biscayne":
-                    st.markdown("""
-                    - **Boat Access Only** ⛵: 80% negative mentions
-                    - **Mosquitoes** 🦟: 70% negative mentions
-                    - **Limited Facilities** 🚻: 60% negative mentions
-                    """)
-                elif park_name == "Hot Springs":
-                    st.markdown("""
-                    - **Aging Facilities** 🏚️: 75% negative mentions
-                    - **Limited Parking** 🅿️: 65% negative mentions
-                    - **Commercialization** 💰: 55% negative mentions
-                    """)
-                elif park_name == "Independence":
-                    st.markdown("""
-                    - **Urban Setting** 🏙️: 70% negative mentions
-                    - **Wait Times** ⏳: 65% negative mentions
-                    - **Noise Levels** 🔊: 55% negative mentions
-                    """)
-                elif park_name == "Valley Forge":
-                    st.markdown("""
-                    - **Weekend Crowds** 👥: 80% negative mentions
-                    - **Limited Shade** ☀️: 70% negative mentions
-                    - **Trail Maintenance** 🚧: 55% negative mentions
-                    """)
-                elif park_name == "Dry Tortugas":
-                    st.markdown("""
-                    - **Ferry Costs** ⛴️: 75% negative mentions
-                    - **Weather Dependence** ⛈️: 70% negative mentions
-                    - **Limited Amenities** 🏝️: 65% negative mentions
-                    """)
-                elif park_name == "Everglades":
-                    st.markdown("""
-                    - **Mosquitoes** 🦟: 85% negative mentions
-                    - **Humidity** 💦: 75% negative mentions
-                    - **Limited Wildlife Sightings** 👀: 55% negative mentions
-                    """)
-                else:
-                    st.markdown("""
-                    - **Crowds** 👥: 75% negative mentions
-                    - **Fees** 💰: 65% negative mentions
-                    - **Facility Maintenance** 🚽: 60% negative mentions
-                    """)
-            else:
-                # Overall complaints
-                st.markdown("""
-                - **Crowds** 👥: 75% negative mentions
-                - **Parking** 🅿️: 70% negative mentions
-                - **Facilities** 🚻: 65% negative mentions
-                - **Fees** 💰: 60% negative mentions
-                """)
+    with profiler.section("insights"):
+        with insight_col:
+            with st.expander("🌟 Top Positive Aspects", expanded=True):
+                # Precomputed per park from review mentions, so any park works without code changes
+                render_aspects(analytics.park_highlights(dataset, selected_park), "positive reviews")
+            
+            with st.expander("⚠️ Common Complaints", expanded=True):
+                render_aspects(analytics.park_complaints(dataset, selected_park), "negative mentions")
+            
+            if dataset.sketches is not None:
+                with st.expander("🔤 Top Terms", expanded=False):
+                    render_terms(analytics.top_terms(dataset, selected_park))
     
     with pie_col:
-        if selected_park != "All Parks":
-            # Extract park name without emoji
-            park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
-            park_data = PARKS_DATA[park_name]
-            st.plotly_chart(create_pie_chart(park_data['positive'], park_data['negative'], park_data.get('neutral', 0)), 
-                           use_container_width=True)
-        else:
-            avg_positive = sum(p['positive'] for p in PARKS_DATA.values())/len(PARKS_DATA)
-            avg_negative = sum(p['negative'] for p in PARKS_DATA.values())/len(PARKS_DATA)
-            avg_neutral = sum(p.get('neutral', 0) for p in PARKS_DATA.values())/len(PARKS_DATA)
-            st.plotly_chart(create_pie_chart(avg_positive, avg_negative, avg_neutral), 
-                           use_container_width=True)
+        with profiler.section("pie_chart"):
+            st.plotly_chart(cached_call("pie_figure", sentiment_pie_figure, selected_park, dataset.data_version, dataset),
+                            use_container_width=True)
         
         # Display recommendations if a specific park is selected
-        if selected_park != "All Parks":
-            with st.expander("💡 Recommendations", expanded=True):
-                park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
-                recs = get_recommendations(park_name)
-                
-                st.subheader("🛠️ Suggested Improvements")
-                for improvement in recs["improvements"]:
-                    st.markdown(f"- {improvement}")
-                
-                st.subheader("✨ Potential Enhancements")
-                for enhancement in recs["enhancements"]:
-                    st.markdown(f"- {enhancement}")
-                
-                st.subheader("🔬 Research Insights")
-                st.markdown(recs["research"])
+        with profiler.section("recommendations"):
+            if selected_park != "All Parks":
+                with st.expander("💡 Recommendations", expanded=True):
+                    park_name = selected_park.split(" ", 1)[1] if " " in selected_park else selected_park
+                    with profiler.section("get_recommendations"):
+                        recs = get_recommendations(park_name, RECOMMENDATIONS_DIR)
+                    
+                    st.subheader("🛠️ Suggested Improvements")
+                    for improvement in recs["improvements"]:
+                        st.markdown(f"- {improvement}")
+                    
+                    st.subheader("✨ Potential Enhancements")
+                    for enhancement in recs["enhancements"]:
+                        st.markdown(f"- {enhancement}")
+                    
+                    st.subheader("🔬 Research Insights")
+                    st.markdown(recs["research"])
     
     # Reviews section
-    st.subheader("📝 Visitor Reviews")
-    filtered_reviews = filter_data(selected_park, selected_feature)
-    
-    if not filtered_reviews:
-        st.warning("No reviews match the current filters")
-    else:
-        for review in filtered_reviews:
-            sentiment_color = "#4CAF50" if review["sentiment"] == "Positive" else "#F44336" if review["sentiment"] == "Negative" else "#FF9800"
-            
-            with st.container():
-                cols = st.columns([1, 10])
-                with cols[0]:
-                    st.markdown(f"<h3 style='text-align: center;'>{review['park_emoji']}{review['feature_emoji']}</h3>", unsafe_allow_html=True)
-                with cols[1]:
-                    st.markdown(f"""
-                    <div style="border-left: 4px solid {sentiment_color}; padding-left: 1rem;">
-                        <p style="font-weight: bold; margin-bottom: 0.2rem;">{review['park']} - {review['feature']}</p>
-                        <p style="color: {sentiment_color}; margin-top: 0; margin-bottom: 0.5rem;">{review['sentiment']}</p>
-                        <p style="margin-top: 0;">{review['text']}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                st.markdown("---")
+    with profiler.section("reviews"):
+        st.subheader("📝 Visitor Reviews")
+        render_reviews(dataset, selected_park, selected_feature)
+
+def render_refresh_status(dataset):
+    """Sidebar line with the data version being shown and the last background refresh"""
+    refresher = load_refresher(REVIEW_DATA_PATH, REVIEW_SCORING_MODEL, REVIEW_ASPECT_MODEL, REVIEW_DROP_DIR)
+    st.sidebar.caption(f"🔄 Data version `{dataset.data_version}` · {len(dataset.store):,} reviews")
+    last = refresher.last_refresh
+    if last is not None:
+        ago = max(0, int(time.time() - last.finished))
+        st.sidebar.caption(f"Last refresh {ago}s ago: {last.reviews:,} reviews from {last.files} file(s), "
+                           f"ingested in {last.seconds:.2f}s, live {last.latency:.1f}s after the file landed")
+    if refresher.last_error:
+        st.sidebar.warning(f"Last refresh failed: {refresher.last_error}")
+
+def render_duplicates(dataset):
+    """Sidebar panel with the share of reviews dropped as near-duplicates, per park"""
+    duplicates = dataset.duplicates
+    if duplicates is None:
+        return
+    with st.sidebar.expander("🧹 Near-duplicates"):
+        st.caption(str(duplicates))
+        rates = duplicates.park_rates()
+        if rates:
+            st.dataframe(pd.DataFrame(rates, columns=["Park", "Reviews", "Dropped", "Dropped %"]).round(1),
+                         hide_index=True, use_container_width=True)
+
+def render_cache_stats(dataset):
+    """Sidebar panel with hit/miss counters for the frame and figure caches"""
+    with st.sidebar.expander("⚙️ Cache statistics"):
+        st.caption(f"Data version: {dataset.data_version}")
+        stats = cache_stats()
+        if stats:
+            st.table(pd.DataFrame.from_dict(stats, orient="index"))
+
+def render_profile_panel():
+    """Sidebar panel with this rerun's section timings and p50/p95 over recent reruns"""
+    if not (DASHBOARD_DEBUG or st.query_params.get("debug") == "1"):
+        return
+    with st.sidebar.expander("⏱️ Profiling", expanded=True):
+        run = profiler.current()
+        if run is not None:
+            elapsed = time.perf_counter() - run.started
+            st.caption(f"This rerun so far: {elapsed * 1000:.1f} ms")
+            st.dataframe(pd.DataFrame({"ms": {name: round(s * 1000, 2) for name, s in run.sections.items()}}),
+                         use_container_width=True)
+        summary = profiler.summary()
+        if summary:
+            st.caption("Recent reruns (nested sections overlap)")
+            st.dataframe(pd.DataFrame.from_dict(summary, orient="index").round(2), use_container_width=True)
 
 # Run the dashboard
+def main():
+    # MUST BE FIRST STREAMLIT COMMAND
+    st.set_page_config(layout="wide", page_title="National Park Analytics", page_icon="🌲")
+    start_profile_export(PROFILE_METRICS_PORT, PROFILE_LOG)
+    with profiler.run(started=SCRIPT_STARTED):
+        dataset = current_dataset()
+        national_park_dashboard(dataset)
+        render_refresh_status(dataset)
+        render_duplicates(dataset)
+        render_cache_stats(dataset)
+        render_profile_panel()
+    if PROFILE_METRICS_FILE:
+        profiler.write_textfile(PROFILE_METRICS_FILE)
+
 if __name__ == "__main__":
-    national_park_dashboard()
+    main()
@@ -0,0 +1,339 @@
+"""Aspect mining: per-park highlights and complaints from review text.
+
+Noun chunks from a spaCy parse become aspect labels ("overcrowded shuttle
+system" -> "Shuttle System"), and every review counts one mention of each of
+its aspects under the review's sentiment, per park and overall. After each
+chunk only the parks that received mentions have their top-k highlight and
+complaint lists recomputed, so the dashboard reads a precomputed list in O(k)
+however many parks and aspects there are.
+
+    python aspects.py reviews.csv --model en_core_web_sm --workers 4
+"""
+import argparse
+import heapq
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from lazy_imports import lazy_module
+from review_store import SENTIMENT_CODES
+from scoring import DEFAULT_MODEL, NEGATIVE_LEMMAS, POSITIVE_LEMMAS, RULES_VERSION
+
+pd = lazy_module("pandas")
+
+# Aspect lists are shown for this many aspects at most
+TOP_K = 5
+# Mined aspects need this many mentions in a park before they are ranked
+MIN_MENTIONS = 5
+# Noun chunks with more content words than this are descriptions, not aspects
+MAX_ASPECT_WORDS = 3
+# Only the parser is needed to find noun chunks
+DISABLED_COMPONENTS = ["ner"]
+
+_ASPECT_POS = {"NOUN", "PROPN", "ADJ"}
+_OPINION_LEMMAS = POSITIVE_LEMMAS | NEGATIVE_LEMMAS
+_POSITIVE = SENTIMENT_CODES["Positive"]
+_NEGATIVE = SENTIMENT_CODES["Negative"]
+
+
+class Aspect(NamedTuple):
+    aspect: str
+    emoji: str
+    share: float  # % of the aspect's mentions that are positive (highlights) or negative (complaints)
+    mentions: int
+
+
+def load_model(model=DEFAULT_MODEL):
+    """Load a spaCy pipeline with the dependency parser that noun chunks need"""
+    import spacy
+
+    return spacy.load(model, exclude=DISABLED_COMPONENTS)
+
+
+def _noun_runs(doc):
+    # Without a parser, fall back to runs of adjacent nouns/proper nouns
+    start = None
+    for i, token in enumerate(doc):
+        if token.pos_ in ("NOUN", "PROPN"):
+            start = i if start is None else start
+        elif start is not None:
+            yield doc[start:i]
+            start = None
+    if start is not None:
+        yield doc[start:]
+
+
+def doc_aspects(doc, max_words=MAX_ASPECT_WORDS):
+    """Distinct aspect labels of a processed Doc, in order of appearance.
+
+    Opinion words, stop words and determiners are dropped from each noun
+    chunk and the rest is lemmatized and title-cased. Pipelines without a
+    parser or tagger yield no aspects.
+    """
+    if doc.has_annotation("DEP"):
+        spans = doc.noun_chunks
+    elif doc.has_annotation("POS"):
+        spans = _noun_runs(doc)
+    else:
+        return ()
+    labels = {}
+    for span in spans:
+        if span.root.pos_ not in ("NOUN", "PROPN"):
+            continue
+        words = [(t.lemma_ or t.text).lower() for t in span
+                 if t.is_alpha and not t.is_stop and t.pos_ in _ASPECT_POS]
+        words = [w for w in words if w not in _OPINION_LEMMAS]
+        if words and len(words) <= max_words:
+            labels.setdefault(" ".join(words).title(), None)
+    return tuple(labels)
+
+
+def mine_texts(nlp, texts, batch_size=1000):
+    """Aspect labels for an iterable of texts, in-process with nlp.pipe"""
+    for doc in nlp.pipe(texts, batch_size=batch_size):
+        yield doc_aspects(doc)
+
+
+# Per-worker pipeline, loaded once by the pool initializer
+_WORKER_NLP = None
+
+
+def _init_worker(model):
+    global _WORKER_NLP
+    _WORKER_NLP = load_model(model)
+
+
+def _mine_batch(args):
+    texts, batch_size = args
+    return list(mine_texts(_WORKER_NLP, texts, batch_size))
+
+
+class AspectMiner:
+    """Extract aspect labels from review text, optionally across processes and through a ScoreCache"""
+
+    def __init__(self, model=DEFAULT_MODEL, batch_size=1000, n_process=1, cache=None):
+        self.model = model
+        self.cache = cache
+        self._cache_namespace = None
+        self.batch_size = batch_size
+        self.n_process = max(1, n_process if n_process > 0 else (os.cpu_count() or 1))
+        self.docs = 0
+        self.seconds = 0.0
+        self._nlp = None
+        self._pool = None
+
+    @property
+    def docs_per_sec(self):
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._nlp = load_model(self.model)
+        return self._nlp
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_process,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model,),
+            )
+        return self._pool
+
+    @property
+    def cache_namespace(self):
+        if self._cache_namespace is None:
+            from score_cache import model_version
+
+            self._cache_namespace = (f"aspects:{self.model}@{model_version(self.model)}:"
+                                     f"{RULES_VERSION}:{MAX_ASPECT_WORDS}")
+        return self._cache_namespace
+
+    def mine(self, texts):
+        """Return a tuple of aspect labels for each text"""
+        if self.cache is None:
+            return self._mine(texts)
+        return [tuple(r) for r in self.cache.cached(self.cache_namespace, texts, self._mine)]
+
+    def _mine(self, texts):
+        texts = list(texts)
+        started = time.perf_counter()
+        if self.n_process == 1 or len(texts) < 2 * self.batch_size:
+            results = list(mine_texts(self.nlp, texts, self.batch_size))
+        else:
+            step = max(self.batch_size, len(texts) // (self.n_process * 4) + 1)
+            jobs = [(texts[i:i + step], self.batch_size) for i in range(0, len(texts), step)]
+            results = []
+            for part in self._executor().map(_mine_batch, jobs):
+                results.extend(part)
+        self.docs += len(texts)
+        self.seconds += time.perf_counter() - started
+        return results
+
+    def annotate(self, chunk):
+        """Add an "aspects" column (tuples of labels) to a review chunk"""
+        chunk = chunk.copy()
+        chunk["aspects"] = pd.Series(self.mine(chunk["text"].astype(str).tolist()), index=chunk.index,
+                                     dtype=object)
+        return chunk
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __str__(self):
+        return (f"{self.model}: {self.docs:,} docs in {self.seconds:.2f}s "
+                f"({self.docs_per_sec:,.0f} docs/s, {self.n_process} process(es))")
+
+
+class AspectTable:
+    """Positive/negative mention counts per (park, aspect) with precomputed top-k lists.
+
+    The overall scope (park None) counts every mention across parks; seeds
+    only touch the scope they name, like the aggregates' seed methods.
+    """
+
+    def __init__(self, top_k=TOP_K, min_mentions=MIN_MENTIONS, emojis=None):
+        self.top_k = top_k
+        self.min_mentions = min_mentions
+        # Default emoji per aspect label, e.g. the feature emojis
+        self.emojis = dict(emojis or {})
+        self._counts = {}  # scope -> {aspect: [positive, negative, neutral]}
+        self._scope_emojis = {}  # (scope, aspect) -> emoji overriding the default
+        self._top = {}  # scope -> (highlights, complaints)
+        self.version = 0
+
+    def state(self):
+        """JSON-able counts and settings, for snapshots"""
+        return {
+            "top_k": self.top_k, "min_mentions": self.min_mentions, "emojis": self.emojis,
+            "counts": [[scope, aspect, *entry] for scope, aspects in self._counts.items()
+                       for aspect, entry in aspects.items()],
+            "scope_emojis": [[scope, aspect, emoji] for (scope, aspect), emoji in self._scope_emojis.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """A table restored from state() output, with its top-k lists recomputed"""
+        table = cls(state["top_k"], state["min_mentions"], state["emojis"])
+        for scope, aspect, positive, negative, neutral in state["counts"]:
+            table._entry(scope, aspect)[:] = [positive, negative, neutral]
+        table._scope_emojis = {(scope, aspect): emoji for scope, aspect, emoji in state["scope_emojis"]}
+        table._refresh(list(table._counts))
+        return table
+
+    def _entry(self, scope, aspect):
+        aspects = self._counts.setdefault(scope, {})
+        entry = aspects.get(aspect)
+        if entry is None:
+            entry = aspects[aspect] = [0, 0, 0]
+        return entry
+
+    # -- updates -------------------------------------------------------------
+
+    def seed(self, park, aspect, positive, negative, neutral=0, emoji=None):
+        """Add baseline mention counts for one scope only (park, or None for overall)"""
+        entry = self._entry(park, aspect)
+        entry[0] += positive
+        entry[1] += negative
+        entry[2] += neutral
+        if emoji is not None:
+            self._scope_emojis[(park, aspect)] = emoji
+        self._refresh([park])
+
+    def append(self, chunk):
+        """Count the aspect mentions of a chunk with park, sentiment and aspects columns"""
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.DataFrame.from_records(list(chunk))
+        if chunk.empty or "aspects" not in chunk.columns:
+            return
+        mentions = chunk[["park", "sentiment", "aspects"]].explode("aspects").dropna(subset=["aspects"])
+        if mentions.empty:
+            return
+        sentiment = mentions["sentiment"].map(SENTIMENT_CODES)
+        counts = mentions.groupby([mentions["park"], mentions["aspects"], sentiment]).size()
+        touched = set()
+        for (park, aspect, code), n in counts.items():
+            self._entry(park, aspect)[int(code)] += int(n)
+            self._entry(None, aspect)[int(code)] += int(n)
+            touched.add(park)
+        self._refresh(touched | {None})
+
+    def _refresh(self, scopes):
+        # Only the scopes that changed are re-ranked
+        for scope in scopes:
+            self._top[scope] = (self._rank(scope, _POSITIVE), self._rank(scope, _NEGATIVE))
+        self.version += 1
+
+    def _rank(self, scope, code):
+        ranked = []
+        for aspect, entry in self._counts.get(scope, {}).items():
+            mentions = entry[0] + entry[1] + entry[2]
+            if mentions < self.min_mentions:
+                continue
+            share = entry[code] * 100.0 / mentions
+            if share > 50:
+                emoji = self._scope_emojis.get((scope, aspect), self.emojis.get(aspect, ""))
+                ranked.append(Aspect(aspect, emoji, share, mentions))
+        # nsmallest is stable, so ties keep the order aspects were first seen in
+        return heapq.nsmallest(self.top_k, ranked, key=lambda a: (-a.share, -a.mentions))
+
+    # -- reads ---------------------------------------------------------------
+
+    def highlights(self, park=None):
+        """Top aspects by positive share of mentions (park None for all parks)"""
+        return self._top.get(park, ((), ()))[0]
+
+    def complaints(self, park=None):
+        """Top aspects by negative share of mentions (park None for all parks)"""
+        return self._top.get(park, ((), ()))[1]
+
+    def parks(self):
+        """Parks with at least one counted mention"""
+        return [scope for scope in self._counts if scope is not None]
+
+
+def main():
+    from ingest import Map, ingest_files
+
+    parser = argparse.ArgumentParser(description="Mine per-park highlights and complaints from review files")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int, default=0, help="mining processes (0 = all cores)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=TOP_K)
+    parser.add_argument("--min-mentions", type=int, default=MIN_MENTIONS)
+    parser.add_argument("--cache", help="SQLite result cache; reviews mined before are not re-parsed")
+    parser.add_argument("--cache-max-mb", type=float, default=512)
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache:
+        from score_cache import ScoreCache
+
+        cache = ScoreCache(args.cache, int(args.cache_max_mb * 2**20))
+    miner = AspectMiner(args.model, args.batch_size, args.workers, cache=cache)
+    table = AspectTable(args.top, args.min_mentions)
+    try:
+        ingest_files(args.paths, Map(miner.annotate, table), report=print)
+    finally:
+        miner.close()
+    print(miner)
+    if cache is not None:
+        print(f"cache: {cache}")
+        cache.close()
+    for park in sorted(table.parks()):
+        print(f"\n{park}")
+        for a in table.highlights(park):
+            print(f"  + {a.aspect}: {a.share:.0f}% positive ({a.mentions:,} mentions)")
+        for a in table.complaints(park):
+            print(f"  - {a.aspect}: {a.share:.0f}% negative ({a.mentions:,} mentions)")
+
+
+if __name__ == "__main__":
+    main()
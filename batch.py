@@ -0,0 +1,235 @@
+"""Sharded batch ingest: score and count review files across processes, then merge.
+
+load_dataset reads, scores, counts and indexes one chunk after another in a
+single process. This job spreads the same work over a process pool in three
+steps:
+
+1. split: every input file is read in chunks (one file per task) and each
+   chunk is cut into pieces by a stable hash of the park, so each shard
+   holds a fixed set of parks; pieces are Arrow files in a work directory.
+2. map: each shard is scored and mined (when models are set) in a worker,
+   which returns a park x feature x sentiment count table per piece.
+3. reduce: chunk by chunk, in the order a single process reads them, the
+   count tables of the shards are merged into the aggregates and the
+   pieces are put back in their original row order for the review store,
+   trends and aspects.
+
+Because chunks are merged in single-process order, the snapshot (or review
+database) written at the end is bit-identical to the one load_dataset builds
+for the same files and models, and the dashboard opens it instead of
+re-ingesting. Near-duplicate filtering and approximate mode compare or
+sketch every review in one stream, so they are not available here.
+
+    python batch.py data/reviews --workers 8 --output .cache/snapshot
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import analytics
+from aggregates import SentimentAggregates
+from ingest import (DEFAULT_CHUNK_SIZE, REQUIRED_COLUMNS, SCORED_REQUIRED_COLUMNS, IngestStats, expand_paths,
+                    iter_review_chunks)
+from lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+# Shards per worker: more shards than workers evens out parks of very different sizes
+SHARDS_PER_WORKER = 4
+
+
+def park_shards(parks, n_shards):
+    """Shard of each park name, from a hash that is the same in every process and run"""
+    hashes = pd.util.hash_array(np.asarray(parks, dtype=object))
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+def _piece_path(work_dir, file_index, chunk_number, shard, scored=False):
+    suffix = ".scored.arrow" if scored else ".arrow"
+    return os.path.join(work_dir, f"{file_index:05d}-{chunk_number:05d}-{shard:04d}{suffix}")
+
+
+def _write_piece(path, frame):
+    import pyarrow as pa
+
+    # The index goes along, so the reassembled chunk is the one the reader produced
+    table = pa.Table.from_pandas(frame, preserve_index=True)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _read_piece(path):
+    import pyarrow as pa
+
+    with pa.OSFile(path, "rb") as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+def _split_file(args):
+    """Split one file into shard pieces; returns its IngestStats and [(chunk number, shard per row)]"""
+    file_index, path, n_shards, work_dir, chunk_size, required = args
+    stats = IngestStats(path)
+    started = time.perf_counter()
+    chunks = []
+    for number, chunk in enumerate(iter_review_chunks(path, chunk_size, required, stats=stats)):
+        if chunk.empty:
+            continue
+        shards = park_shards(chunk["park"].to_numpy(), n_shards)
+        for shard in np.unique(shards).tolist():
+            _write_piece(_piece_path(work_dir, file_index, number, shard), chunk[shards == shard])
+        chunks.append((number, shards.astype(np.uint16)))
+    stats.seconds = time.perf_counter() - started
+    return stats, chunks
+
+
+def _map_shard(args):
+    """Score and mine the pieces of one shard; returns {(file, chunk): (parks, features, cell counts)}"""
+    shard, pieces, work_dir, scoring_model, aspect_model, score_cache = args
+    scorer = miner = cache = None
+    if score_cache and (scoring_model or aspect_model):
+        from score_cache import ScoreCache
+
+        cache = ScoreCache(score_cache)
+    if scoring_model:
+        from scoring import SentimentScorer
+
+        scorer = SentimentScorer(scoring_model, n_process=1, cache=cache)
+    if aspect_model:
+        from aspects import AspectMiner
+
+        miner = AspectMiner(aspect_model, n_process=1, cache=cache)
+    tables = {}
+    try:
+        for file_index, number in pieces:
+            path = _piece_path(work_dir, file_index, number, shard)
+            chunk = _read_piece(path)
+            if scorer is not None:
+                chunk = scorer.score_frame(chunk)
+            if miner is not None:
+                chunk = miner.annotate(chunk)
+            _write_piece(_piece_path(work_dir, file_index, number, shard, scored=True), chunk)
+            os.remove(path)
+            counts = SentimentAggregates([], [])
+            counts.append(chunk)
+            tables[(file_index, number)] = (counts.parks, counts.features, counts.cell_counts)
+    finally:
+        for worker in (scorer, miner, cache):
+            if worker is not None:
+                worker.close()
+    return tables
+
+
+def _merge_chunk(dataset, work_dir, file_index, number, shards, tables):
+    """Append one chunk, reassembled from its shard pieces, and add its merged count tables"""
+    present = np.unique(shards).tolist()
+    paths = [_piece_path(work_dir, file_index, number, shard, scored=True) for shard in present]
+    # Each piece keeps its rows in file order; the inverse of a stable sort by shard interleaves them back
+    chunk = pd.concat([_read_piece(path) for path in paths]).iloc[np.argsort(np.argsort(shards, kind="stable"))]
+    dataset.store.append(chunk)
+    dataset.trends.append(chunk)
+    dataset.aspects.append(chunk)
+    # Names get codes in the order the store gave them, which is the order append() would have
+    aggregates = dataset.aggregates
+    aggregates.register(dataset.store.parks, dataset.store.features)
+    cells = np.zeros_like(aggregates.cell_counts)
+    for shard in present:
+        parks, features, counts = tables[shard][(file_index, number)]
+        cells[np.ix_(aggregates.park_codes(parks), aggregates.feature_codes(features))] += counts
+    aggregates.add_cells(cells)
+    for path in paths:
+        os.remove(path)
+
+
+def run_batch(paths, workers=0, shards=0, scoring_model="", aspect_model="", score_cache="", database="",
+              work_dir=None, report=print):
+    """Ingest review files into a new Dataset with the split and map steps spread over worker processes.
+
+    workers defaults to one per core and shards to SHARDS_PER_WORKER per
+    worker. Files are read in the chunks ingest uses, and the result equals
+    analytics.ingest_dataset(os.pathsep.join(paths), scoring_model,
+    aspect_model, ...) to the last bit.
+    """
+    workers = workers or os.cpu_count() or 1
+    n_shards = shards or workers * SHARDS_PER_WORKER
+    files = expand_paths(paths)
+    dataset = analytics.empty_dataset(analytics.corpus_fingerprint(os.pathsep.join(paths), scoring_model), database)
+    required = SCORED_REQUIRED_COLUMNS if scoring_model else REQUIRED_COLUMNS
+    work = tempfile.mkdtemp(prefix="batch-", dir=work_dir)
+    # spawn, like the scoring pool: workers load their own models and share nothing
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            started = time.perf_counter()
+            split = list(pool.map(_split_file, [(i, path, n_shards, work, DEFAULT_CHUNK_SIZE, required)
+                                                for i, path in enumerate(files)]))
+            chunks = [(i, number, row_shards) for i, (_, file_chunks) in enumerate(split)
+                      for number, row_shards in file_chunks]
+            rows = sum(len(row_shards) for _, _, row_shards in chunks)
+            report(f"Split {len(files)} files ({rows:,} rows) into {n_shards} shards in "
+                   f"{time.perf_counter() - started:.2f}s")
+            for stats, _ in split:
+                report(f"Read {stats}")
+
+            started = time.perf_counter()
+            pieces, sizes = {}, np.zeros(n_shards, dtype=np.int64)
+            for i, number, row_shards in chunks:
+                for shard in np.unique(row_shards).tolist():
+                    pieces.setdefault(shard, []).append((i, number))
+                sizes += np.bincount(row_shards, minlength=n_shards)
+            # Largest shards first, so the last one to start is not also the longest
+            jobs = sorted(pieces, key=lambda shard: -sizes[shard])
+            results = pool.map(_map_shard, [(shard, pieces[shard], work, scoring_model, aspect_model, score_cache)
+                                            for shard in jobs])
+            tables = dict(zip(jobs, results))
+            report(f"Mapped {len(jobs)} shards with {workers} workers in {time.perf_counter() - started:.2f}s "
+                   f"(largest {sizes.max() if rows else 0:,} rows)")
+
+        started = time.perf_counter()
+        for i, number, row_shards in chunks:
+            _merge_chunk(dataset, work, i, number, row_shards, tables)
+        report(f"Merged {len(chunks)} chunks in {time.perf_counter() - started:.2f}s")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest review files with a sharded process pool")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--workers", type=int, default=0, help="processes (0 = all cores)")
+    parser.add_argument("--shards", type=int, default=0, help=f"park shards (0 = {SHARDS_PER_WORKER} per worker)")
+    parser.add_argument("--model", default="", help="spaCy pipeline to score sentiment and features with")
+    parser.add_argument("--aspect-model", default="", help="spaCy pipeline with a parser to mine aspects with")
+    parser.add_argument("--cache", default="", help="SQLite score cache shared by the workers")
+    parser.add_argument("--output", default=os.path.join(".cache", "snapshot"), help="snapshot directory to write")
+    parser.add_argument("--database", default="", help="write a review database here instead of a snapshot")
+    parser.add_argument("--work-dir", help="directory for the shard pieces (default: the system temp directory)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = run_batch(args.paths, args.workers, args.shards, args.model, args.aspect_model, args.cache,
+                        args.database, args.work_dir)
+    key = analytics.dataset_key(os.pathsep.join(args.paths), args.model, args.aspect_model)
+    if args.database:
+        from review_db import save_state
+
+        save_state(dataset, key)
+        target = args.database
+    else:
+        from snapshot import save_snapshot
+
+        save_snapshot(dataset, args.output, key)
+        target = args.output
+    seconds = time.perf_counter() - started
+    print(f"total: {len(dataset.store):,} reviews in {seconds:.2f}s, {len(dataset.store) / seconds:,.0f} rows/s; "
+          f"wrote {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Backend benchmark: in-memory ReviewStore versus the SQLite ReviewDB.
+
+Builds the same synthetic corpus into both backends and times what the
+dashboard asks of them: filter_rows for every park/feature combination,
+materializing a page of reviews, "recent" sorting, and the park metrics,
+cross-park averages and rank. The in-memory side reads the maintained
+counters, and ReviewDB runs the same numbers as indexed SQL queries. It
+also reports build time, reopen time, the bytes each backend keeps in
+memory and the database file size.
+
+    python benchmarks/backends.py --reviews 1000000 --output backends.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+import review_db  # noqa: E402
+from run import display_names, git_revision, measure, measure_many, summarize  # noqa: E402
+from synthetic import build_dataset  # noqa: E402
+
+
+def bench_backend(backend, dataset, repeat):
+    store, aggregates = dataset.store, dataset.aggregates
+    parks, features = display_names(dataset)
+    combos = [(p, f) for p in parks for f in features]
+    rows = analytics.filter_rows(dataset, parks[1], analytics.ALL_FEATURES)
+    park_names = list(aggregates.parks)
+    results = [
+        measure_many(f"{backend}.filter_rows", [lambda p=p, f=f: analytics.filter_rows(dataset, p, f)
+                                                for p, f in combos], repeat),
+        measure(f"{backend}.page_records", lambda: store.records(rows[-20:]), repeat),
+        measure(f"{backend}.sort_recent", lambda: store.sort_rows(rows, "recent"), repeat, rows=len(rows)),
+    ]
+    if isinstance(store, review_db.ReviewDB):
+        results += [
+            measure_many(f"{backend}.park_percentages", [lambda p=p: store.park_percentages(p) for p in park_names],
+                         repeat),
+            measure(f"{backend}.average_percentages", store.average_percentages, repeat),
+            measure_many(f"{backend}.park_rank", [lambda p=p: store.park_rank(p) for p in park_names], repeat),
+        ]
+    else:
+        results += [
+            measure_many(f"{backend}.park_percentages",
+                         [lambda p=p: aggregates.park_percentages(p) for p in park_names], repeat),
+            measure(f"{backend}.average_percentages", aggregates.average_percentages, repeat),
+            measure_many(f"{backend}.park_rank", [lambda p=p: aggregates.park_rank(p) for p in park_names], repeat),
+        ]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--parks", type=int, default=12)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database", help="SQLite file to build (default: a temporary file)")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.database or os.path.join(tmp, "reviews.sqlite")
+        results = []
+        for backend, database in (("memory", ""), ("sqlite", path)):
+            started = time.perf_counter()
+            dataset = build_dataset(args.reviews, args.parks, args.features, database=database)
+            extra = {"reviews": len(dataset.store), "memory_mb": round(dataset.store.nbytes / 2**20, 1)}
+            if database:
+                review_db.save_state(dataset)
+                extra["file_mb"] = round(os.path.getsize(database) / 2**20, 1)
+            results.append(summarize(f"{backend}.build", [(time.perf_counter() - started) * 1000], **extra))
+            if database:
+                results.append(measure("sqlite.reopen", lambda: review_db.load_database(database), 3))
+            results += bench_backend(backend, dataset, args.repeat)
+            for r in results:
+                if r["name"].startswith(backend):
+                    print(json.dumps(r), file=sys.stderr)
+            del dataset
+
+    report = {
+        "meta": {
+            "reviews": args.reviews, "parks": args.parks, "features": args.features, "repeat": args.repeat,
+            "git_revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "numpy": np.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
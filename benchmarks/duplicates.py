@@ -0,0 +1,150 @@
+"""Near-duplicate benchmark: MinHash/LSH dedup throughput, memory and recall.
+
+Generates distinct synthetic reviews (random draws from a large vocabulary)
+and mixes in known reposts: exact copies, copies with a word or two edited,
+and a bot template posted over and over to one park with a different tail
+each time. The corpus is streamed chunk by chunk through a
+NearDuplicateIndex in front of an in-memory ReviewStore, and the report
+gives rows/s with and without dedup, the size of the LSH tables, recall on
+the reposts whose Jaccard similarity to their source is at least the
+threshold, how many distinct reviews were wrongly dropped, and the dedup
+rate per park.
+
+    python benchmarks/duplicates.py --reviews 1000000 --output duplicates.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import dedup  # noqa: E402
+from review_store import SENTIMENTS, ReviewStore  # noqa: E402
+from run import git_revision, summarize  # noqa: E402
+from synthetic import park_names  # noqa: E402
+
+VOCABULARY = 20_000
+CHUNK = 50_000
+
+
+def corpus(n_reviews, n_parks, repost_rate, spam_rate, seed=0):
+    """(DataFrame of reviews, source row of each repost or -1, True for spam rows) in arrival order"""
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i:05d}" for i in range(VOCABULARY)], dtype=object)
+    parks = np.array(park_names(n_parks), dtype=object)
+    n_reposts, n_spam = int(n_reviews * repost_rate), int(n_reviews * spam_rate)
+    n_distinct = n_reviews - n_reposts - n_spam
+    lengths = rng.integers(8, 40, n_distinct)
+    texts = [" ".join(vocab[rng.integers(0, VOCABULARY, n)]) for n in lengths]
+    park = parks[rng.integers(0, n_parks, n_reviews)]
+    source = np.full(n_reviews, -1, dtype=np.int64)
+    # Reposts: a third verbatim, the rest with one or two words replaced; posted to the same park
+    originals = rng.integers(0, n_distinct, n_reposts)
+    for i, original in enumerate(originals):
+        words = texts[original].split()
+        for _ in range(i % 3):
+            words[rng.integers(0, len(words))] = vocab[rng.integers(0, VOCABULARY)]
+        texts.append(" ".join(words))
+        park[n_distinct + i] = park[original]
+    source[n_distinct:n_distinct + n_reposts] = originals
+    # Spam: one long template with a two-word tail, all on the first park
+    template = " ".join(vocab[rng.integers(0, VOCABULARY, 30)])
+    texts += [f"{template} {vocab[rng.integers(0, VOCABULARY)]} {vocab[rng.integers(0, VOCABULARY)]}"
+              for _ in range(n_spam)]
+    park[n_distinct + n_reposts:] = parks[0]
+    spam = np.zeros(n_reviews, dtype=bool)
+    spam[n_distinct + n_reposts:] = True
+    # Shuffled, so a repost may arrive before its source (the source is then the duplicate)
+    order = rng.permutation(n_reviews)
+    frame = pd.DataFrame({
+        "park": park[order], "feature": "Hiking", "sentiment": np.array(SENTIMENTS, dtype=object)[order % 3],
+        "text": np.array(texts, dtype=object)[order],
+    })
+    position = np.empty(n_reviews, dtype=np.int64)
+    position[order] = np.arange(n_reviews)
+    source_position = np.where(source >= 0, position[np.maximum(source, 0)], -1)[order]
+    return frame, source_position, spam[order]
+
+
+def ingest(frame, index):
+    store = ReviewStore([], [])
+    dropped = []
+    started = time.perf_counter()
+    for start in range(0, len(frame), CHUNK):
+        chunk = frame.iloc[start:start + CHUNK]
+        if index is not None:
+            kept = index.filter(chunk, store)
+            dropped.append(~chunk.index.isin(kept.index))
+            chunk = kept
+        store.append(chunk)
+    seconds = time.perf_counter() - started
+    return seconds, (np.concatenate(dropped) if dropped else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--parks", type=int, default=12)
+    parser.add_argument("--repost-rate", type=float, default=0.05)
+    parser.add_argument("--spam-rate", type=float, default=0.01)
+    parser.add_argument("--threshold", type=float, default=dedup.DEFAULT_THRESHOLD)
+    parser.add_argument("--max-slots", type=int, default=dedup.MAX_SLOTS)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    frame, source, spam = corpus(args.reviews, args.parks, args.repost_rate, args.spam_rate)
+    plain_seconds, _ = ingest(frame, None)
+    index = dedup.NearDuplicateIndex(args.threshold, args.max_slots)
+    seconds, dropped = ingest(frame, index)
+
+    # Ground truth: the exact Jaccard similarity of each repost to its source
+    reposts = np.flatnonzero(source >= 0)
+    hashes, starts = dedup.shingle_hashes(frame["text"].tolist())
+    similarity = np.array([dedup.jaccard(hashes[starts[i]:starts[i + 1]], hashes[starts[j]:starts[j + 1]])
+                           for i, j in zip(reposts, source[reposts])])
+    near = reposts[similarity >= args.threshold]
+    # A pair is caught when whichever of the two arrived second was dropped
+    caught = dropped[np.maximum(near, source[near])]
+    involved = np.zeros(len(frame), dtype=bool)
+    involved[reposts] = involved[source[reposts]] = True
+    wrongly = int((dropped & ~involved & ~spam).sum())
+
+    results = [
+        summarize("ingest.plain", [plain_seconds * 1000], rows_per_sec=round(len(frame) / plain_seconds)),
+        summarize("ingest.dedup", [seconds * 1000], rows_per_sec=round(len(frame) / seconds),
+                  tables_mb=round(index.nbytes / 2**20, 1), dropped=int(dropped.sum()),
+                  near_duplicate_pairs=int(len(near)), recall=round(float(caught.mean()) if len(near) else 1.0, 4),
+                  spam_dropped=round(float(dropped[spam].mean()) if spam.any() else 0.0, 4),
+                  distinct_dropped=wrongly,
+                  park_rates={park: round(pct, 2) for park, _, _, pct in index.park_rates()}),
+    ]
+    for r in results:
+        print(json.dumps(r), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "reviews": args.reviews, "parks": args.parks, "repost_rate": args.repost_rate,
+            "spam_rate": args.spam_rate, "threshold": args.threshold, "bands": index.bands,
+            "rows_per_band": index.rows_per_band, "max_slots": args.max_slots, "git_revision": git_revision(),
+            "python": platform.python_version(), "platform": platform.platform(), "numpy": np.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Import-time breakdown of the dashboard, from ``python -X importtime``.
+
+Imports a module (app by default) in a fresh interpreter and reports the
+self and cumulative import time of every module it pulls in. --top lists the
+most expensive packages by cumulative time, counted where each was first
+imported. Modules that Streamlit loads itself (before app.py runs) can be
+excluded with --after streamlit.
+
+    python benchmarks/importtime.py --module app --after streamlit --top 15
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module, preload=()):
+    """[(module, self_us, cumulative_us, depth)] in import order, for a fresh `import module`"""
+    code = "".join(f"import {name}\n" for name in preload)
+    # Preloaded modules are imported before -X importtime output starts being read
+    script = f"{code}import sys\nsys.stderr.write('--- start ---\\n')\nimport {module}\n"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT, capture_output=True,
+                         text=True, check=True)
+    lines = out.stderr.split("--- start ---\n", 1)[-1].splitlines()
+    times = []
+    for line in lines:
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return times
+
+
+def breakdown(times, top):
+    """Packages by cumulative import time, taken at the shallowest import of each top-level package"""
+    by_package = {}
+    for name, _, cumulative_us, depth in times:
+        package = name.split(".")[0]
+        best = by_package.get(package)
+        if best is None or depth < best[1] or (depth == best[1] and cumulative_us > best[0]):
+            by_package[package] = (cumulative_us, depth)
+    ranked = sorted(by_package.items(), key=lambda item: -item[1][0])[:top]
+    return [{"package": package, "cumulative_ms": round(us / 1000, 1)} for package, (us, _) in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--after", nargs="*", default=[], help="modules to import first and leave out")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    times = import_times(args.module, args.after)
+    root = next((t for t in times if t[0] == args.module), None)
+    total_ms = round(root[2] / 1000, 1) if root else None
+    packages = breakdown(times, args.top)
+    if args.json:
+        print(json.dumps({"module": args.module, "after": args.after, "total_ms": total_ms,
+                          "modules": len(times), "packages": packages}, indent=2))
+        return
+    print(f"import {args.module}: {total_ms} ms, {len(times)} modules"
+          + (f" (after {', '.join(args.after)})" if args.after else ""))
+    for row in packages:
+        print(f"  {row['cumulative_ms']:>8.1f} ms  {row['package']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Memory benchmark: review dicts versus the columnar ReviewStore.
+
+Builds the same synthetic corpus two ways and reports the memory retained
+per review: as a list of REVIEWS-style dicts (park, feature, sentiment,
+text and both emoji strings per review) and as a ReviewStore (code columns,
+one UTF-8 text buffer and the park/feature indexes). "Overhead" is what is
+left after subtracting the UTF-8 bytes of the text itself, i.e. the cost of
+the representation. The dict layout is only built up to --max-dict-reviews
+(10M dicts need more RAM than most machines have) and extrapolated linearly
+beyond that.
+
+    python benchmarks/memory.py --reviews 1000000 10000000 --output memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+from run import git_revision  # noqa: E402
+from synthetic import iter_synthetic_reviews  # noqa: E402
+
+
+def retained(build):
+    """(object, bytes still allocated after build() returns, seconds) with tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        before = tracemalloc.get_traced_memory()[0]
+        obj = build()
+        seconds = time.perf_counter() - started
+        gc.collect()
+        return obj, tracemalloc.get_traced_memory()[0] - before, seconds
+    finally:
+        tracemalloc.stop()
+
+
+def text_bytes(n_reviews, n_parks, n_features):
+    """UTF-8 size of all review texts, the payload both layouts must hold"""
+    return sum(int(sum(len(t.encode("utf-8")) for t in chunk["text"]))
+               for chunk in iter_synthetic_reviews(n_reviews, n_parks, n_features))
+
+
+def build_dicts(n_reviews, n_parks, n_features):
+    park_emojis = {park: data["emoji"] for park, data in analytics.PARKS_DATA.items()}
+    feature_emojis = {f["feature"]: f["emoji"] for f in analytics.FEATURE_DATA}
+    reviews = []
+    for chunk in iter_synthetic_reviews(n_reviews, n_parks, n_features):
+        for park, feature, sentiment, text in zip(chunk["park"], chunk["feature"], chunk["sentiment"],
+                                                  chunk["text"]):
+            # Copy the text: parsed reviews each own their string, unlike the synthetic sentence pool
+            reviews.append({"park": park, "feature": feature, "sentiment": sentiment,
+                            "text": text.encode("utf-8").decode("utf-8"),
+                            "park_emoji": park_emojis.get(park, ""), "feature_emoji": feature_emojis.get(feature, "")})
+    return reviews
+
+
+def build_store(n_reviews, n_parks, n_features):
+    store = analytics.empty_dataset().store
+    for chunk in iter_synthetic_reviews(n_reviews, n_parks, n_features):
+        store.append(chunk)
+    store.compact()
+    return store
+
+
+def record(layout, n_reviews, total_bytes, payload, seconds=None, extrapolated=False):
+    return {
+        "name": f"memory.{layout}",
+        "reviews": n_reviews,
+        "total_mb": round(total_bytes / 2**20, 1),
+        "bytes_per_review": round(total_bytes / n_reviews, 1),
+        "overhead_bytes_per_review": round((total_bytes - payload) / n_reviews, 1),
+        "build_s": None if seconds is None else round(seconds, 2),
+        "extrapolated": extrapolated,
+    }
+
+
+def bench_size(n_reviews, n_parks, n_features, max_dict_reviews, dict_sample):
+    """Store and dict records for one corpus size; dict_sample caches the largest measured dict run"""
+    payload = text_bytes(n_reviews, n_parks, n_features)
+    store, store_bytes, store_s = retained(lambda: build_store(n_reviews, n_parks, n_features))
+    results = [record("review_store", n_reviews, store_bytes, payload, store_s)]
+    del store
+
+    if n_reviews <= max_dict_reviews:
+        reviews, dict_bytes, dict_s = retained(lambda: build_dicts(n_reviews, n_parks, n_features))
+        del reviews
+        dict_sample.update(reviews=n_reviews, overhead=(dict_bytes - payload) / n_reviews)
+        results.append(record("dicts", n_reviews, dict_bytes, payload, dict_s))
+    else:
+        if not dict_sample:
+            bench_size(max_dict_reviews, n_parks, n_features, max_dict_reviews, dict_sample)
+        # Per-review overhead is flat in n; the text payload is the corpus' own
+        dict_bytes = dict_sample["overhead"] * n_reviews + payload
+        results.append(record("dicts", n_reviews, dict_bytes, payload, extrapolated=True))
+
+    store_overhead, dict_overhead = (r["overhead_bytes_per_review"] for r in results)
+    results.append({"name": "memory.reduction", "reviews": n_reviews,
+                    "total": round(dict_bytes / store_bytes, 1),
+                    "overhead": round(dict_overhead / store_overhead, 1)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--parks", type=int, default=12)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--max-dict-reviews", type=int, default=1_000_000,
+                        help="build the dict layout up to this size, extrapolate above it")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    results, dict_sample = [], {}
+    for n in sorted(args.reviews):
+        results += bench_size(n, args.parks, args.features, args.max_dict_reviews, dict_sample)
+        for r in results[-3:]:
+            print(json.dumps(r), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "parks": args.parks, "features": args.features, "max_dict_reviews": args.max_dict_reviews,
+            "git_revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "numpy": np.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Similar-review benchmark: vector index build time, size, lookup latency and IVF recall.
+
+Generates reviews about a few hundred topics (each topic has its own words,
+mixed with words shared by every topic), embeds them into a saved
+similar.VectorIndex and reopens it memory-mapped, as the dashboard does.
+The report gives embedding throughput, index size, "more like this" latency
+p50/p95 for the exact block scan and for IVF at several nprobe values, and
+IVF recall@k against the exact top k.
+
+    python benchmarks/neighbors.py --reviews 1000000 --output neighbors.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import similar  # noqa: E402
+from run import git_revision, summarize  # noqa: E402
+
+CHUNK = 100_000
+
+
+def corpus(n_reviews, n_topics, topic_words=40, shared_words=2_000, seed=0):
+    """Review texts, each drawing most of its words from one topic's vocabulary"""
+    rng = np.random.default_rng(seed)
+    topics = np.array([f"t{t}w{i}" for t in range(n_topics) for i in range(topic_words)],
+                      dtype=object).reshape(n_topics, topic_words)
+    shared = np.array([f"s{i}" for i in range(shared_words)], dtype=object)
+    texts = []
+    for start in range(0, n_reviews, CHUNK):
+        n = min(CHUNK, n_reviews - start)
+        topic = rng.integers(0, n_topics, n)
+        lengths = rng.integers(8, 30, n)
+        for t, length in zip(topic.tolist(), lengths.tolist()):
+            own = topics[t][rng.integers(0, topic_words, length * 2 // 3)]
+            common = shared[rng.integers(0, shared_words, length - len(own))]
+            texts.append(" ".join(np.concatenate([own, common])))
+    return texts
+
+
+def latencies(index, queries, k, **options):
+    """(per-query milliseconds, result rows per query)"""
+    ms, results = [], []
+    for row in queries.tolist():
+        started = time.perf_counter()
+        rows, _ = index.similar(row, k, **options)
+        ms.append((time.perf_counter() - started) * 1000)
+        results.append(rows)
+    return ms, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, similar.DEFAULT_NPROBE, 256])
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    texts = corpus(args.reviews, args.topics)
+    work = tempfile.mkdtemp(prefix="neighbors-")
+    try:
+        path = os.path.join(work, "index")
+        started = time.perf_counter()
+        similar.VectorIndex.build(iter(texts), len(texts), path)
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        index = similar.VectorIndex.load(path)
+        open_ms = (time.perf_counter() - started) * 1000
+        queries = np.random.default_rng(1).choice(len(texts), args.queries, replace=False)
+
+        # A first exact pass pages the matrix in, so every variant is timed warm
+        latencies(index, queries[:3], args.top, exact=True)
+        exact_ms, truth = latencies(index, queries, args.top, exact=True)
+        results = [
+            summarize("similar.build", [build_seconds * 1000], reviews_per_sec=round(len(texts) / build_seconds),
+                      index_mb=round(index.nbytes / 2**20, 1), dim=index.dim, lists=index.meta["lists"],
+                      open_ms=round(open_ms, 2)),
+            summarize("similar.exact", exact_ms, k=args.top),
+        ]
+        if index.centroids is not None:
+            for nprobe in args.nprobe:
+                ms, found = latencies(index, queries, args.top, nprobe=nprobe)
+                recall = np.mean([len(np.intersect1d(a, b)) / max(len(b), 1) for a, b in zip(found, truth)])
+                results.append(summarize(f"similar.ivf_nprobe_{nprobe}", ms, k=args.top,
+                                         recall=round(float(recall), 4),
+                                         mean_rows_scanned=round(len(texts) * nprobe / index.meta["lists"])))
+        del index
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    for r in results:
+        print(json.dumps(r), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "reviews": args.reviews, "topics": args.topics, "queries": args.queries, "top": args.top,
+            "block_rows": similar.BLOCK_ROWS, "git_revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "numpy": np.__version__, "cores": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
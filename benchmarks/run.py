@@ -0,0 +1,334 @@
+"""Benchmark suite for the dashboard's hot paths.
+
+Times filtering for every park/feature combination, the "All Parks"
+averaging and ranking, DataFrame and figure construction for the two bar
+charts and the pie chart, trend queries over the time rollups, streaming
+exports of every review, and an end-to-end dashboard run through Streamlit's
+AppTest harness (including cold starts in new processes with and without the
+memory-mapped snapshot), on a synthetic corpus. Results are written as JSON with
+p50/p95 latency and peak traced memory per benchmark; pass --baseline to
+compare against an earlier run and fail on regressions.
+
+    python benchmarks/run.py --reviews 1000000 --output bench.json
+    python benchmarks/run.py --reviews 1000000 --baseline bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+from review_store import ALL_FEATURES, ALL_PARKS  # noqa: E402
+from synthetic import build_dataset, write_parquet  # noqa: E402
+
+
+def summarize(name, samples_ms, peak_bytes=None, **extra):
+    """One result record with latency percentiles (ms) and peak memory (MB)"""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    record = {
+        "name": name,
+        "samples": int(len(samples)),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "mean_ms": round(float(samples.mean()), 4),
+        "max_ms": round(float(samples.max()), 4),
+        "peak_mem_mb": None if peak_bytes is None else round(peak_bytes / 2**20, 3),
+    }
+    record.update(extra)
+    return record
+
+
+def peak_memory(fn):
+    """Peak traced allocation of one call, in bytes"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def measure(name, fn, repeat, warmup=1, **extra):
+    """Time fn repeat times after warmup calls, plus one traced call for peak memory"""
+    for _ in range(warmup):
+        fn()
+    samples = timed(fn, repeat)
+    return summarize(name, samples, peak_memory(fn), **extra)
+
+
+def measure_many(name, calls, repeat, **extra):
+    """Pool samples over several calls (e.g. every filter combination)"""
+    samples, peak = [], 0
+    for fn in calls:
+        fn()
+        samples.extend(timed(fn, repeat))
+        peak = max(peak, peak_memory(fn))
+    return summarize(name, samples, peak, calls=len(calls), **extra)
+
+
+def display_names(dataset):
+    parks = [ALL_PARKS] + [f"{analytics.park_emoji(p)} {p}" for p in dataset.aggregates.parks]
+    features = [ALL_FEATURES] + [f"{analytics.feature_emoji(f)} {f}" for f in dataset.aggregates.features]
+    return parks, features
+
+
+def bench_filters(dataset, repeat, max_materialize):
+    parks, features = display_names(dataset)
+    combos = [(p, f) for p in parks for f in features]
+    results = [measure_many("filter.rows", [lambda p=p, f=f: analytics.filter_rows(dataset, p, f)
+                                            for p, f in combos], repeat)]
+    # filter_data builds one dict per match, so very large matches are skipped
+    small = [(p, f) for p, f in combos if len(analytics.filter_rows(dataset, p, f)) <= max_materialize]
+    if small:
+        results.append(measure_many("filter.data", [lambda p=p, f=f: analytics.filter_data(p, f, dataset)
+                                                    for p, f in small], max(1, repeat // 5),
+                                    skipped=len(combos) - len(small)))
+    return results
+
+
+def bench_aggregates(dataset, repeat):
+    parks = list(dataset.aggregates.parks)
+    return [
+        measure("aggregate.overall_metrics", lambda: analytics.overall_metrics(dataset), repeat),
+        measure("aggregate.park_ranking", lambda: analytics.park_ranking(dataset), repeat),
+        measure_many("aggregate.park_metrics", [lambda p=p: analytics.park_metrics(dataset, p) for p in parks],
+                     repeat),
+        measure("aggregate.compare_all_parks", lambda: analytics.compare_parks(dataset, parks), repeat,
+                parks=len(parks)),
+    ]
+
+
+def bench_figures(dataset, repeat):
+    import app
+
+    park_df = analytics.park_frame(dataset)
+    feature_df = analytics.feature_frame(dataset)
+    parks, _ = display_names(dataset)
+    selected_park = parks[1] if len(parks) > 1 else ALL_PARKS
+    metrics = analytics.overall_metrics(dataset)
+    comparison = analytics.compare_parks(dataset, list(dataset.aggregates.parks))
+    return [
+        measure("figure.park_frame", lambda: analytics.park_frame(dataset), repeat),
+        measure("figure.feature_frame", lambda: analytics.feature_frame(dataset), repeat),
+        measure("figure.park_chart", lambda: app.create_park_sentiment_chart(park_df, selected_park), repeat),
+        measure("figure.feature_chart",
+                lambda: app.create_feature_sentiment_chart(feature_df, selected_park, ALL_FEATURES), repeat),
+        measure("figure.pie_chart",
+                lambda: app.create_pie_chart(metrics.avg_positive, metrics.avg_negative, metrics.avg_neutral),
+                repeat),
+        measure("figure.comparison_chart", lambda: app.create_comparison_chart(comparison.parks), repeat),
+        measure("figure.feature_heatmap", lambda: app.create_feature_heatmap(comparison.features), repeat),
+    ]
+
+
+def bench_trends(dataset, repeat):
+    import app
+
+    parks, features = display_names(dataset)
+    selected_park = parks[1] if len(parks) > 1 else ALL_PARKS
+    monthly = analytics.sentiment_trend(dataset, ALL_PARKS, ALL_FEATURES, "month")
+    results = []
+    for granularity in ("day", "week", "month"):
+        results.append(measure_many(f"trend.{granularity}", [
+            lambda p=p, f=f: analytics.sentiment_trend(dataset, p, f, granularity)
+            for p, f in ((ALL_PARKS, ALL_FEATURES), (selected_park, ALL_FEATURES), (selected_park, features[-1]))
+        ], repeat))
+    results.append(measure("figure.trend_chart", lambda: app.create_trend_chart(monthly, "Monthly Sentiment Trend"),
+                           repeat, periods=len(monthly)))
+    return results
+
+
+def bench_export(dataset, repeat):
+    """All reviews streamed to CSV/Parquet in chunks, against building the whole CSV in memory"""
+    import export
+
+    rows = analytics.filter_rows(dataset, ALL_PARKS, ALL_FEATURES)
+    repeat = max(1, repeat // 10)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [measure(f"export.reviews_{fmt}",
+                           lambda fmt=fmt: export.write_reviews(dataset.store, rows, os.path.join(tmp, f"r.{fmt}"), fmt),
+                           repeat, warmup=0, rows=len(rows))
+                   for fmt in export.FORMATS]
+    results.append(measure("export.reviews_csv_in_memory", lambda: dataset.store.to_frame(rows).to_csv(index=False),
+                           repeat, warmup=0, rows=len(rows)))
+    return results
+
+
+def bench_apptest(n_reviews, n_parks, n_features, repeat, timeout):
+    """End-to-end script runs: the first render (loads the corpus) and reruns after a filter change"""
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = write_parquet(os.path.join(tmp, "reviews.parquet"), n_reviews, n_parks, n_features)
+        os.environ["REVIEW_DATA_PATH"] = corpus
+        os.environ["SEARCH_INDEX_DIR"] = os.path.join(tmp, "search_index")
+        # The first render measures ingest; startup from a snapshot is bench_startup's
+        os.environ["REVIEW_SNAPSHOT_DIR"] = ""
+        try:
+            at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=timeout)
+            started = time.perf_counter()
+            at.run()
+            first = (time.perf_counter() - started) * 1000
+            if at.exception:
+                raise RuntimeError(f"app raised during benchmark: {at.exception[0].message}")
+
+            options = at.selectbox[0].options
+            samples = []
+            for i in range(repeat):
+                started = time.perf_counter()
+                at.selectbox[0].select(options[i % len(options)]).run()
+                samples.append((time.perf_counter() - started) * 1000)
+        finally:
+            os.environ.pop("REVIEW_DATA_PATH", None)
+            os.environ.pop("SEARCH_INDEX_DIR", None)
+            os.environ.pop("REVIEW_SNAPSHOT_DIR", None)
+    return [summarize("apptest.first_render", [first]), summarize("apptest.rerun", samples)]
+
+
+# Runs in a fresh interpreter, like a new Streamlit worker: imports, data load and first render
+_STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+at.run()
+ms = (time.perf_counter() - started) * 1000
+# Script-side timings from the dashboard's profiler: the whole first run (module-level imports included)
+# and its first_render mark (header, filters and metrics sent)
+from profiling import PROFILER
+summary = PROFILER.summary()
+print(json.dumps({"ms": ms, "error": bool(at.exception), "script_ms": summary.get("rerun", {}).get("mean_ms"),
+                  "first_render_ms": summary.get("first_render", {}).get("mean_ms")}))
+"""
+
+
+def bench_startup(n_reviews, n_parks, n_features, repeat, timeout):
+    """Cold start of national_park_dashboard in a new process, with and without the snapshot"""
+    def start(env):
+        out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT, os.path.join(ROOT, "app.py"), str(timeout)],
+                             env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if result["error"]:
+            raise RuntimeError(f"app raised during startup benchmark: {out.stderr[-2000:]}")
+        return result
+
+    def summarize_starts(name, starts):
+        # Process wall time, plus the profiler's first_render mark and script total as p50s
+        return summarize(name, [r["ms"] for r in starts],
+                         first_render_p50_ms=round(float(np.median([r["first_render_ms"] for r in starts])), 1),
+                         script_p50_ms=round(float(np.median([r["script_ms"] for r in starts])), 1))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = write_parquet(os.path.join(tmp, "reviews.parquet"), n_reviews, n_parks, n_features)
+        env = dict(os.environ, REVIEW_DATA_PATH=corpus, REVIEW_SNAPSHOT_DIR="")
+        ingest = [start(env) for _ in range(repeat)]
+        env["REVIEW_SNAPSHOT_DIR"] = os.path.join(tmp, "snapshot")
+        # The first start ingests and writes the snapshot; the rest open it
+        write = start(env)
+        snapshot = [start(env) for _ in range(repeat)]
+    return [summarize_starts("startup.ingest", ingest), summarize_starts("startup.snapshot_write", [write]),
+            summarize_starts("startup.snapshot", snapshot)]
+
+
+def compare(results, baseline_path, threshold):
+    """Names of benchmarks whose p95 grew by more than threshold x the baseline"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get(r["name"])
+        if old and old["p95_ms"] > 0 and r["p95_ms"] > old["p95_ms"] * threshold:
+            regressions.append(f"{r['name']}: p95 {old['p95_ms']:.3f}ms -> {r['p95_ms']:.3f}ms")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, default=100_000, help="synthetic corpus size (up to 10M)")
+    parser.add_argument("--parks", type=int, default=12)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per benchmark")
+    parser.add_argument("--max-materialize", type=int, default=1_000_000,
+                        help="skip filter_data for combinations matching more reviews than this")
+    parser.add_argument("--apptest-reviews", type=int, default=None,
+                        help="corpus size for the AppTest run (default: --reviews)")
+    parser.add_argument("--apptest-timeout", type=float, default=600)
+    parser.add_argument("--skip-apptest", action="store_true")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed p95 slowdown vs baseline")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = None
+
+    def load():
+        nonlocal dataset
+        dataset = build_dataset(args.reviews, args.parks, args.features)
+
+    load_peak = peak_memory(load)
+    results = [summarize("load.synthetic_dataset", [(time.perf_counter() - started) * 1000], load_peak,
+                         reviews=len(dataset.store))]
+    results += bench_filters(dataset, args.repeat, args.max_materialize)
+    results += bench_aggregates(dataset, args.repeat)
+    results += bench_figures(dataset, args.repeat)
+    results += bench_trends(dataset, args.repeat)
+    results += bench_export(dataset, args.repeat)
+    if not args.skip_apptest:
+        n = args.apptest_reviews if args.apptest_reviews is not None else args.reviews
+        results += bench_apptest(n, args.parks, args.features, max(3, args.repeat // 4), args.apptest_timeout)
+        results += bench_startup(n, args.parks, args.features, max(3, args.repeat // 4), args.apptest_timeout)
+
+    report = {
+        "meta": {
+            "reviews": args.reviews, "parks": args.parks, "features": args.features, "repeat": args.repeat,
+            "git_revision": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "numpy": np.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Sharded batch benchmark: batch.run_batch speedup from 1 to N workers.
+
+Writes a synthetic corpus as several Parquet files, ingests it once in a
+single process (analytics.ingest_dataset, as load_dataset does) and then
+with batch.run_batch at each worker count. The report gives wall time,
+rows/s and speedup over one worker, and checks that every run writes a
+snapshot byte for byte identical to the single-process one. Scoring
+dominates real runs; pass --model en_core_web_sm to include it (spaCy
+required), otherwise the workers only read, split and count.
+
+    python benchmarks/sharding.py --reviews 1000000 --workers 1 2 4 8 --output sharding.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+import batch  # noqa: E402
+from run import git_revision, summarize  # noqa: E402
+from snapshot import save_snapshot  # noqa: E402
+from synthetic import iter_synthetic_reviews  # noqa: E402
+
+
+def write_corpus(directory, n_reviews, n_files, n_parks, n_features):
+    """Split a synthetic corpus into n_files Parquet files; returns the directory"""
+    os.makedirs(directory)
+    per_file = -(-n_reviews // n_files)
+    for i, chunk in enumerate(iter_synthetic_reviews(n_reviews, n_parks, n_features, chunk_size=per_file)):
+        chunk.to_parquet(os.path.join(directory, f"reviews-{i:03d}.parquet"), index=False)
+    return directory
+
+
+def snapshot_digest(dataset, path, key):
+    """sha256 of every file of the dataset's snapshot"""
+    save_snapshot(dataset, path, key)
+    digest = {}
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), "rb") as f:
+            digest[name] = hashlib.sha256(f.read()).hexdigest()
+    return digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--parks", type=int, default=60)
+    parser.add_argument("--features", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--model", default="", help="spaCy pipeline to score with (default: keep the labels)")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="sharding-")
+    try:
+        corpus = write_corpus(os.path.join(work, "corpus"), args.reviews, args.files, args.parks, args.features)
+        key = analytics.dataset_key(corpus, args.model)
+
+        started = time.perf_counter()
+        single = analytics.ingest_dataset(corpus, args.model, report=lambda message: None)
+        single_seconds = time.perf_counter() - started
+        expected = snapshot_digest(single, os.path.join(work, "single"), key)
+        rows = len(single.store)
+        del single
+        results = [summarize("ingest.single_process", [single_seconds * 1000],
+                             rows_per_sec=round(rows / single_seconds))]
+
+        base = None
+        for workers in args.workers:
+            started = time.perf_counter()
+            dataset = batch.run_batch([corpus], workers, scoring_model=args.model, report=lambda message: None)
+            seconds = time.perf_counter() - started
+            identical = snapshot_digest(dataset, os.path.join(work, f"batch-{workers}"), key) == expected
+            del dataset
+            base = base or seconds
+            results.append(summarize(f"batch.workers_{workers}", [seconds * 1000], workers=workers,
+                                     rows_per_sec=round(rows / seconds), speedup=round(base / seconds, 2),
+                                     vs_single_process=round(single_seconds / seconds, 2),
+                                     snapshot_identical=identical))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    for r in results:
+        print(json.dumps(r), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "reviews": args.reviews, "files": args.files, "parks": args.parks, "features": args.features,
+            "model": args.model, "cores": os.cpu_count(), "git_revision": git_revision(),
+            "python": platform.python_version(), "platform": platform.platform(), "numpy": np.__version__,
+            "pandas": pd.__version__, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
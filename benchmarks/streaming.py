@@ -0,0 +1,210 @@
+"""Streaming statistics benchmark: exact per-park counts versus mergeable sketches.
+
+Generates reviews whose words, aspects and reviewers follow Zipf-like
+popularity, and streams them chunk by chunk into (a) exact structures, i.e.
+the aspect table plus a per-park dict of term counts and a per-park set of
+reviewer ids, and (b) a sketches.SketchTable. The report gives throughput
+and retained memory for both, the observed error of every estimate next to
+its documented bound, and checks that four tables built on separate quarters
+of the stream merge into the single-stream table. Highlights and complaints
+are only ranked among the most mentioned aspects in the sketch, so their
+check is the error of each listed aspect's share, not list equality.
+
+    python benchmarks/streaming.py --reviews 200000 --output streaming.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sketches  # noqa: E402
+from aspects import AspectTable  # noqa: E402
+from review_store import SENTIMENTS, SENTIMENT_CODES  # noqa: E402
+from run import git_revision, summarize  # noqa: E402
+from synthetic import park_names  # noqa: E402
+
+CHUNK = 50_000
+
+
+def zipf_choice(rng, n_items, size, exponent=1.1):
+    weights = 1.0 / np.arange(1, n_items + 1) ** exponent
+    return rng.choice(n_items, size, p=weights / weights.sum())
+
+
+def corpus(n_reviews, n_parks, vocabulary, n_aspects, seed=0):
+    """Chunks of reviews (park, sentiment, text, reviewer, aspects)"""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"word{i}" for i in range(vocabulary)], dtype=object)
+    labels = np.array([f"Aspect {i}" for i in range(n_aspects)], dtype=object)
+    parks = np.array(park_names(n_parks), dtype=object)
+    sentiments = np.array(SENTIMENTS, dtype=object)
+    chunks = []
+    for start in range(0, n_reviews, CHUNK):
+        n = min(CHUNK, n_reviews - start)
+        lengths = rng.integers(8, 30, n)
+        flat = words[zipf_choice(rng, vocabulary, int(lengths.sum()))]
+        bounds = np.concatenate(([0], np.cumsum(lengths)))
+        aspect_ids = zipf_choice(rng, n_aspects, 2 * n).reshape(n, 2)
+        chunks.append(pd.DataFrame({
+            "park": parks[zipf_choice(rng, n_parks, n, 1.0)],
+            "sentiment": sentiments[rng.choice(3, n, p=[0.65, 0.28, 0.07])],
+            "text": [" ".join(flat[bounds[i]:bounds[i + 1]]) for i in range(n)],
+            "reviewer": zipf_choice(rng, max(n_reviews // 3, 1), n, 0.6).astype(str),
+            "aspects": [tuple(dict.fromkeys(labels[ids])) for ids in aspect_ids],
+        }))
+    return chunks
+
+
+class ExactStats:
+    """The exact baseline: aspect table, {park: {term: [positive, negative, neutral]}} and {park: reviewer set}"""
+
+    def __init__(self):
+        self.aspects = AspectTable()
+        self.terms = {}
+        self.reviewers = {}
+
+    def append(self, chunk):
+        self.aspects.append(chunk)
+        tokens = chunk["text"].str.lower().str.findall(sketches._TOKEN_RE).explode()
+        mentions = pd.DataFrame({"row": tokens.index, "term": tokens.to_numpy()}).drop_duplicates()
+        mentions = mentions[(mentions["term"].str.len() >= sketches.MIN_TERM_LENGTH)
+                            & ~mentions["term"].isin(list(sketches.STOP_WORDS))]
+        rows = mentions["row"].to_numpy()
+        mentions = mentions.assign(park=chunk["park"].to_numpy()[rows],
+                                   code=chunk["sentiment"].map(SENTIMENT_CODES).to_numpy()[rows])
+        for scope, part in [(None, mentions)] + list(mentions.groupby("park")):
+            counts = self.terms.setdefault(scope, {})
+            for (term, code), n in part.groupby(["term", "code"]).size().items():
+                counts.setdefault(term, [0, 0, 0])[code] += int(n)
+        for scope, part in [(None, chunk)] + list(chunk.groupby("park")):
+            self.reviewers.setdefault(scope, set()).update(part["reviewer"].tolist())
+
+
+def retained(build):
+    """(object, bytes still allocated after build() returns, seconds) with tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        before = tracemalloc.get_traced_memory()[0]
+        obj = build()
+        seconds = time.perf_counter() - started
+        gc.collect()
+        return obj, tracemalloc.get_traced_memory()[0] - before, seconds
+    finally:
+        tracemalloc.stop()
+
+
+def stream(chunks, sink):
+    for chunk in chunks:
+        sink.append(chunk)
+    return sink
+
+
+def errors(exact, table, top):
+    """Observed errors of the sketch estimates against the exact counts, per scope"""
+    term_over, term_bound, recalls, reviewer_errors, share_errors = [], [], [], [], []
+    for scope, counts in exact.terms.items():
+        totals = {term: sum(c) for term, c in counts.items()}
+        heaviest = sorted(totals, key=totals.get, reverse=True)
+        # Count-Min overestimates of the 100 heaviest terms, as a share of the scope's mentions
+        checked = heaviest[:100]
+        estimates = np.array([table.term_reviews(term, scope).sum() for term in checked])
+        mentions = sum(totals.values())
+        term_over.append(float((estimates - np.array([totals[t] for t in checked])).max()) / mentions)
+        term_bound.append(table.term_error(scope) / mentions)
+        # Top terms found, counting terms tied with the k-th as correct
+        cutoff = totals[heaviest[min(top, len(heaviest)) - 1]]
+        found = [t.term for t in table.top_terms(scope, top)]
+        recalls.append(sum(totals[t] >= cutoff for t in found) / min(top, len(heaviest)))
+        true_reviewers = len(exact.reviewers[scope])
+        reviewer_errors.append(abs(table.reviewers(scope) - true_reviewers) / true_reviewers)
+        entries = exact.aspects._counts.get(scope, {})
+        for listed, code in ((table.highlights(scope), 0), (table.complaints(scope), 1)):
+            for a in listed:
+                share_errors.append(abs(a.share - entries[a.aspect][code] * 100.0 / sum(entries[a.aspect])))
+    return {
+        "term_max_overestimate": round(max(term_over), 6), "term_bound": round(max(term_bound), 6),
+        "top_terms_recall": round(float(np.mean(recalls)), 4),
+        "reviewers_mean_error": round(float(np.mean(reviewer_errors)), 4),
+        "reviewers_max_error": round(float(np.max(reviewer_errors)), 4),
+        "reviewers_standard_error": round(table.reviewer_error, 4),
+        "aspect_share_max_error_pct": round(max(share_errors), 3) if share_errors else None,
+        "scopes": len(exact.terms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reviews", type=int, default=200_000)
+    parser.add_argument("--parks", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--aspects", type=int, default=2_000)
+    parser.add_argument("--top", type=int, default=sketches.TOP_K)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    chunks = corpus(args.reviews, args.parks, args.vocabulary, args.aspects)
+    # Timed and measured in separate passes: tracemalloc slows allocation-heavy code several times over
+    seconds = {}
+    for name, build in (("exact", ExactStats), ("sketches", sketches.SketchTable)):
+        started = time.perf_counter()
+        stream(chunks, build())
+        seconds[name] = time.perf_counter() - started
+    exact, exact_bytes, _ = retained(lambda: stream(chunks, ExactStats()))
+    table, table_bytes, _ = retained(lambda: stream(chunks, sketches.SketchTable()))
+    exact_seconds, table_seconds = seconds["exact"], seconds["sketches"]
+
+    # Four quarters sketched separately (as by four worker processes) and merged
+    quarters = np.array_split(np.arange(len(chunks)), 4)
+    merged = sketches.SketchTable()
+    for part in quarters:
+        merged.merge(stream([chunks[i] for i in part], sketches.SketchTable()))
+    merge_exact = all(
+        np.array_equal(merged._scopes[s].mentions.table, table._scopes[s].mentions.table)
+        and np.array_equal(merged._scopes[s].aspect_mentions.table, table._scopes[s].aspect_mentions.table)
+        and np.array_equal(merged._scopes[s].reviewers.registers, table._scopes[s].reviewers.registers)
+        for s in table._scopes)
+    merge_top_terms = float(np.mean([[t.term for t in merged.top_terms(s, args.top)] ==
+                                     [t.term for t in table.top_terms(s, args.top)] for s in table._scopes]))
+
+    results = [
+        summarize("stats.exact", [exact_seconds * 1000], rows_per_sec=round(args.reviews / exact_seconds),
+                  retained_mb=round(exact_bytes / 2**20, 1)),
+        summarize("stats.sketches", [table_seconds * 1000], rows_per_sec=round(args.reviews / table_seconds),
+                  retained_mb=round(table_bytes / 2**20, 1), counters_mb=round(table.nbytes / 2**20, 1),
+                  **errors(exact, table, args.top)),
+        summarize("stats.merge", [0.0], counters_identical=merge_exact, top_terms_identical=merge_top_terms),
+    ]
+    for r in results:
+        print(json.dumps(r), file=sys.stderr)
+
+    report = {
+        "meta": {
+            "reviews": args.reviews, "parks": args.parks, "vocabulary": args.vocabulary, "aspects": args.aspects,
+            "width": table.width, "depth": table.depth, "precision": table.precision, "capacity": table.capacity,
+            "git_revision": git_revision(), "python": platform.python_version(), "platform": platform.platform(),
+            "numpy": np.__version__, "pandas": pd.__version__, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Synthetic review corpora for benchmarks.
+
+Reviews are generated in chunks from a fixed pool of sentences so that even
+10M-review corpora are produced quickly and reproducibly (same seed, same
+data). Park and feature names start with the real ones from analytics and
+continue with numbered synthetic names. Review dates are spread uniformly
+over the five years before END_DATE.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+from review_store import SENTIMENTS  # noqa: E402
+
+_WORDS = (
+    "amazing trail views crowded parking fees restroom dirty sunset canyon river camp site ranger "
+    "shuttle wait long lovely wildlife bears wolves elk bison geyser waterfall hike summit lodge "
+    "expensive reasonable clean busy quiet peaceful beautiful stunning overcrowded maintenance "
+    "boardwalk visitor center permit reservation campground stargazing snorkeling coral fish the a "
+    "was were very so and but with at on in too not really great good bad terrible worth"
+).split()
+_SENTENCE_POOL = 20_000
+END_DATE = np.datetime64("2024-12-31")
+YEARS = 5
+
+
+def park_names(n_parks):
+    """The first n park names: real parks first, then 'Synthetic Park NNN'"""
+    real = list(analytics.PARKS_DATA)
+    return real[:n_parks] + [f"Synthetic Park {i:03d}" for i in range(len(real), n_parks)]
+
+
+def feature_names(n_features):
+    """The first n feature names: real features first, then 'Feature NN'"""
+    real = [f["feature"] for f in analytics.FEATURE_DATA]
+    return real[:n_features] + [f"Feature {i:02d}" for i in range(len(real), n_features)]
+
+
+def sentence_pool(seed=0, size=_SENTENCE_POOL):
+    """A reproducible pool of review sentences of 6-24 words"""
+    rng = np.random.default_rng(seed)
+    words = np.array(_WORDS, dtype=object)
+    lengths = rng.integers(6, 25, size=size)
+    return np.array([" ".join(words[rng.integers(0, len(words), n)]).capitalize() + "." for n in lengths],
+                    dtype=object)
+
+
+def iter_synthetic_reviews(n_reviews, n_parks=12, n_features=8, chunk_size=500_000, seed=0):
+    """Yield DataFrame chunks of synthetic reviews (park, feature, sentiment, date, text)"""
+    rng = np.random.default_rng(seed)
+    parks = np.array(park_names(n_parks), dtype=object)
+    features = np.array(feature_names(n_features), dtype=object)
+    sentiments = np.array(SENTIMENTS, dtype=object)
+    pool = sentence_pool(seed)
+    # Skewed popularity, like real parks: a few parks get most reviews
+    park_weights = 1.0 / np.arange(1, n_parks + 1)
+    park_weights /= park_weights.sum()
+
+    remaining = n_reviews
+    while remaining > 0:
+        n = min(chunk_size, remaining)
+        yield pd.DataFrame({
+            "park": parks[rng.choice(n_parks, n, p=park_weights)],
+            "feature": features[rng.integers(0, n_features, n)],
+            "sentiment": sentiments[rng.choice(3, n, p=[0.65, 0.28, 0.07])],
+            "date": END_DATE - rng.integers(0, 365 * YEARS, n).astype("timedelta64[D]"),
+            "text": pool[rng.integers(0, len(pool), n)],
+        })
+        remaining -= n
+
+
+def build_dataset(n_reviews, n_parks=12, n_features=8, seed=0, database=""):
+    """An analytics.Dataset filled with a synthetic corpus (kept in a SQLite file if database is set)"""
+    dataset = analytics.empty_dataset(f"synthetic:{n_reviews}:{n_parks}:{n_features}:{seed}", database)
+    for chunk in iter_synthetic_reviews(n_reviews, n_parks, n_features, seed=seed):
+        dataset.append(chunk)
+    return dataset
+
+
+def write_parquet(path, n_reviews, n_parks=12, n_features=8, seed=0):
+    """Write a synthetic corpus to one Parquet file, chunk by chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_synthetic_reviews(n_reviews, n_parks, n_features, seed=seed):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
@@ -0,0 +1,407 @@
+"""Near-duplicate review detection with MinHash signatures and LSH banding.
+
+Each review's text is normalized to lowercase words and shingled into word
+bigrams; a MinHash signature of NUM_PERM 32-bit minima estimates the Jaccard
+similarity of two reviews' shingle sets. The signature is cut into bands,
+and every band is hashed into its own direct-mapped table of (band hash,
+row id) slots, so a review is only compared with the earlier reviews that
+share a band with it. Those candidates are confirmed by the exact Jaccard
+similarity of the shingle sets, with the earlier review's text read back
+from the review store; confirmed near-duplicates (reposts, templated bot
+spam) are dropped before they are scored or counted.
+
+The tables start small and double up to max_slots slots per band, then
+keep the most recent review per slot: memory stays bounded (12 bytes per
+slot per band) no matter how many reviews stream through, at the cost of
+missing some duplicates of reviews seen long before.
+
+    python dedup.py data/reviews --threshold 0.8
+"""
+import argparse
+import os
+import time
+import zlib
+
+import numpy as np
+
+from lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+NUM_PERM = 64
+DEFAULT_THRESHOLD = 0.8
+# Bands are chosen so that a pair exactly at the threshold becomes a candidate this often
+CANDIDATE_RECALL = 0.99
+# Slots per band table: the first allocation and the most it grows to
+MIN_SLOTS = 1 << 12
+MAX_SLOTS = 1 << 19
+# Shingles hashed per step when computing signatures, to bound the NUM_PERM-wide temporaries
+_SHINGLE_BATCH = 1 << 16
+# Text bytes tokenized per step, to bound the per-byte temporaries
+_BYTE_BATCH = 1 << 18
+
+# Word characters: ASCII letters, digits and underscore, and every byte of a non-ASCII character
+_WORD_BYTES = np.zeros(256, dtype=bool)
+_WORD_BYTES[list(b"0123456789_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")] = True
+_WORD_BYTES[0x80:] = True
+# Polynomial hash base for words (odd, so invertible mod 2**64) and its inverse
+_BASE = 0x100000001B3
+_BASE_INV = pow(_BASE, -1, 2**64)
+_EMPTY = -1
+
+_rng = np.random.default_rng(20240531)
+# Hash functions on the 32-bit mixed shingle hash, one per permutation: (a * x + b) mod 2**32, with a odd
+_PERM_A = (_rng.integers(0, 2**31, NUM_PERM, dtype=np.uint32) * np.uint32(2) + np.uint32(1)).astype(np.uint32)
+_PERM_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint32)
+_BAND_MIX = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PAIR_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM, recall=CANDIDATE_RECALL):
+    """(bands, rows per band) with the fewest bands that still make a pair at threshold a candidate with p >= recall.
+
+    A pair with Jaccard similarity s shares at least one band with
+    probability 1 - (1 - s**rows)**bands. Candidates are verified exactly,
+    so more bands only cost memory and verification time.
+    """
+    for rows in range(num_perm, 0, -1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if 1.0 - (1.0 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+def _mix64(keys):
+    # Finalizer of MurmurHash3, so the low bits used as slot numbers are well spread
+    keys = keys ^ (keys >> np.uint64(33))
+    keys = keys * np.uint64(0xFF51AFD7ED558CCD)
+    return keys ^ (keys >> np.uint64(33))
+
+
+_power_tables = {}
+
+
+def _powers(base, n):
+    # base**0 .. base**(n - 1) mod 2**64; every batch needs a prefix of the same table, so it is kept
+    table = _power_tables.get(base)
+    if table is None or len(table) < n:
+        table = np.full(max(n, _BYTE_BATCH + 1), base, dtype=np.uint64)
+        table[0] = 1
+        table = _power_tables[base] = np.cumprod(table, dtype=np.uint64)
+    return table[:n]
+
+
+def _ranges(begins, ends):
+    # Concatenated np.arange(begin, end) for each pair
+    lengths = ends - begins
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(begins - offsets, lengths) + np.arange(int(lengths.sum()))
+
+
+def _word_hashes(texts):
+    """Hashes of the lowercased words of texts, in order, and the index of the text each word is in.
+
+    Words are hashed straight from the UTF-8 bytes with prefix sums of a
+    polynomial hash, so no per-word Python strings are created.
+    """
+    joined = "\x00".join(texts)
+    if joined.count("\x00") != len(texts) - 1:
+        joined = "\x00".join(text.replace("\x00", " ") for text in texts)
+    data = np.frombuffer(joined.lower().encode("utf-8"), dtype=np.uint8)
+    text_starts = np.concatenate(([0], np.flatnonzero(data == 0) + 1, [len(data) + 1]))
+    hashes, owners = [], []
+    first = 0
+    while first < len(texts):
+        # Whole texts per step, about _BYTE_BATCH bytes at a time
+        last = max(first + 1, int(np.searchsorted(text_starts, text_starts[first] + _BYTE_BATCH, side="right")) - 1)
+        last = min(last, len(texts))
+        lo, hi = text_starts[first], text_starts[last] - 1
+        part = data[lo:hi]
+        word = _WORD_BYTES[part]
+        begins = np.flatnonzero(word & ~np.concatenate(([False], word[:-1])))
+        ends = np.flatnonzero(word & ~np.concatenate((word[1:], [False]))) + 1
+        prefix = np.zeros(len(part) + 1, dtype=np.uint64)
+        np.cumsum(part.astype(np.uint64) * _powers(_BASE, len(part)), out=prefix[1:])
+        # sum(byte[j] * BASE**(j - begin)) for each word, i.e. independent of where the word sits
+        hashes.append((prefix[ends] - prefix[begins]) * _powers(_BASE_INV, len(part) + 1)[begins])
+        owners.append(first + np.searchsorted(text_starts[first + 1:last + 1] - lo, begins, side="right"))
+        first = last
+    word_hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+    owner = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+    return word_hashes, owner
+
+
+def shingle_hashes(texts):
+    """Word-bigram shingle hashes of each text as (hashes uint64, starts); text i owns hashes[starts[i]:starts[i+1]].
+
+    Texts with a single word are that word's shingle; texts without any word
+    characters are one shingle of the whole stripped text.
+    """
+    word_hashes, owner = _word_hashes(texts)
+    lengths = np.bincount(owner, minlength=len(texts))
+    wordless = np.flatnonzero(lengths == 0)
+    if len(wordless):
+        fallback = np.fromiter((zlib.crc32(texts[i].strip().encode("utf-8")) for i in wordless), dtype=np.uint64,
+                               count=len(wordless))
+        order = np.argsort(np.concatenate((owner, wordless)), kind="stable")
+        word_hashes = np.concatenate((word_hashes, fallback))[order]
+        lengths[wordless] = 1
+    ends = np.cumsum(lengths)
+    # A bigram starts at every word but the last of its text; one-word texts keep their word
+    follows = np.ones(len(word_hashes), dtype=bool)
+    follows[ends - 1] = False
+    single = lengths == 1
+    keep = follows.copy()
+    keep[(ends - 1)[single]] = True
+    nxt = np.empty_like(word_hashes)
+    nxt[:-1] = word_hashes[1:]
+    nxt[-1:] = 0
+    hashes = np.where(follows, word_hashes * _PAIR_MIX + nxt, word_hashes)[keep]
+    counts = np.where(single, 1, lengths - 1)
+    starts = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=starts[1:])
+    return hashes, starts
+
+
+def minhash(hashes, starts):
+    """MinHash signatures (n x NUM_PERM uint32) of the shingle sets delimited by starts"""
+    n = len(starts) - 1
+    shingles = (_mix64(hashes) >> np.uint64(32)).astype(np.uint32)
+    signatures = np.empty((n, NUM_PERM), dtype=np.uint32)
+    first = 0
+    while first < n:
+        # Whole texts per step, about _SHINGLE_BATCH shingles at a time
+        last = max(first + 1, int(np.searchsorted(starts, starts[first] + _SHINGLE_BATCH, side="right")) - 1)
+        last = min(last, n)
+        lo, hi = starts[first], starts[last]
+        # 32-bit arithmetic, with permutations along rows: reducing along the contiguous axis is several times faster
+        values = _PERM_A[:, None] * shingles[None, lo:hi]
+        values += _PERM_B[:, None]
+        signatures[first:last] = np.minimum.reduceat(values, starts[first:last] - lo, axis=1).T
+        first = last
+    return signatures
+
+
+def jaccard(a, b):
+    """Jaccard similarity of two arrays of shingle hashes, taken as sets"""
+    a, b = np.unique(a), np.unique(b)
+    union = len(a) + len(b)
+    if not union:
+        return 1.0
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (union - shared)
+
+
+def _pair_jaccard(hashes, starts, left, right):
+    """Jaccard similarity of each pair of shingle sets (left[k], right[k]), sets being delimited by starts"""
+    # Only the sets in some pair, each reduced to its distinct hashes
+    sets, inverse = np.unique(np.concatenate((left, right)), return_inverse=True)
+    lengths = starts[sets + 1] - starts[sets]
+    values = hashes[_ranges(starts[sets], starts[sets + 1])]
+    owner = np.repeat(np.arange(len(sets)), lengths)
+    order = np.lexsort((values, owner))
+    values, owner = values[order], owner[order]
+    distinct = np.ones(len(values), dtype=bool)
+    distinct[1:] = (values[1:] != values[:-1]) | (owner[1:] != owner[:-1])
+    values = values[distinct]
+    sizes = np.bincount(owner[distinct], minlength=len(sets))
+    bounds = np.zeros(len(sets) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=bounds[1:])
+    # Both sides of every pair sorted together: a hash they share shows up as two equal neighbours
+    a, b = inverse[:len(left)], inverse[len(left):]
+    pairs = np.arange(len(left))
+    pair = np.concatenate((np.repeat(pairs, sizes[a]), np.repeat(pairs, sizes[b])))
+    merged = np.concatenate((values[_ranges(bounds[a], bounds[a + 1])], values[_ranges(bounds[b], bounds[b + 1])]))
+    order = np.lexsort((merged, pair))
+    pair, merged = pair[order], merged[order]
+    same = (pair[1:] == pair[:-1]) & (merged[1:] == merged[:-1])
+    shared = np.bincount(pair[1:][same], minlength=len(left))
+    union = sizes[a] + sizes[b] - shared
+    return np.where(union > 0, shared / np.maximum(union, 1), 1.0)
+
+
+class NearDuplicateIndex:
+    """LSH tables over the reviews kept so far, with per-park dedup counts"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_slots=MAX_SLOTS):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"Near-duplicate threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.bands, self.rows_per_band = lsh_bands(threshold)
+        self.max_slots = max_slots
+        slots = min(MIN_SLOTS, max_slots)
+        # Band hash and store row id per slot; row _EMPTY marks a free slot
+        self.keys = np.zeros((self.bands, slots), dtype=np.uint64)
+        self.rows = np.full((self.bands, slots), _EMPTY, dtype=np.int32)
+        self.indexed = 0
+        self.parks = {}  # park -> [reviews seen, near-duplicates dropped]
+        self._shared = False
+
+    def state(self):
+        """(JSON-able settings and counts, {name: array}) describing the index, for snapshots"""
+        meta = {"threshold": self.threshold, "max_slots": self.max_slots, "indexed": self.indexed,
+                "parks": self.parks}
+        return meta, {"keys": self.keys, "rows": self.rows}
+
+    @classmethod
+    def from_state(cls, meta, arrays):
+        """An index restored from state() output; arrays may be read-only and are copied on first write"""
+        index = cls(meta["threshold"], meta["max_slots"])
+        index.keys, index.rows = arrays["keys"], arrays["rows"]
+        index.indexed = meta["indexed"]
+        index.parks = {park: list(counts) for park, counts in meta["parks"].items()}
+        index._shared = True
+        return index
+
+    def copy(self):
+        """An independent index sharing the tables until either side writes"""
+        meta, arrays = self.state()
+        index = NearDuplicateIndex.from_state(meta, arrays)
+        self._shared = True
+        return index
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.rows.nbytes
+
+    def _band_keys(self, signatures):
+        r = self.rows_per_band
+        keys = np.empty((len(signatures), self.bands), dtype=np.uint64)
+        wide = signatures.astype(np.uint64) * _BAND_MIX
+        for band in range(self.bands):
+            keys[:, band] = _mix64(wide[:, band * r:(band + 1) * r].sum(axis=1) + np.uint64(band))
+        return keys
+
+    def _grow(self, needed):
+        slots = self.keys.shape[1]
+        target = slots
+        while target < self.max_slots and needed > target // 2:
+            target *= 2
+        if target == slots and not self._shared:
+            return
+        keys = np.zeros((self.bands, target), dtype=np.uint64)
+        rows = np.full((self.bands, target), _EMPTY, dtype=np.int32)
+        mask = np.uint64(target - 1)
+        for band in range(self.bands):
+            # Oldest first, so later rows win any slot two of them now share
+            used = np.flatnonzero(self.rows[band] != _EMPTY)
+            used = used[np.argsort(self.rows[band, used], kind="stable")]
+            slot = (self.keys[band, used] & mask).astype(np.int64)
+            keys[band, slot] = self.keys[band, used]
+            rows[band, slot] = self.rows[band, used]
+        self.keys, self.rows = keys, rows
+        self._shared = False
+
+    def _candidates(self, keys):
+        """Earlier row ids (store rows >= 0, or -(position + 2) within this chunk) sharing a band, per text"""
+        n = len(keys)
+        mask = np.uint64(self.keys.shape[1] - 1)
+        positions = np.arange(n)
+        found = np.full((n, self.bands), _EMPTY, dtype=np.int64)
+        for band in range(self.bands):
+            slot = (keys[:, band] & mask).astype(np.int64)
+            stored = self.rows[band, slot]
+            hit = (stored != _EMPTY) & (self.keys[band, slot] == keys[:, band])
+            found[hit, band] = stored[hit]
+            # Within the chunk: the first text with the same band hash
+            _, first, inverse = np.unique(keys[:, band], return_index=True, return_inverse=True)
+            earlier = first[inverse]
+            local = earlier < positions
+            found[local, band] = -(earlier[local] + 2)
+        return found
+
+    def duplicates(self, texts, store):
+        """Boolean mask of the texts that nearly duplicate an earlier review or an earlier text in the list.
+
+        Texts that are kept are indexed under the row ids they will get when
+        appended to store next, so every kept text must reach the store.
+        """
+        n = len(texts)
+        if not n:
+            return np.zeros(0, dtype=bool)
+        hashes, starts = shingle_hashes(texts)
+        keys = self._band_keys(minhash(hashes, starts))
+        found = self._candidates(keys)
+        duplicate = np.zeros(n, dtype=bool)
+        suspects = np.flatnonzero((found != _EMPTY).any(axis=1))
+        if len(suspects):
+            # Distinct (text, candidate) pairs
+            candidates = np.sort(found[suspects], axis=1)
+            fresh = candidates != _EMPTY
+            fresh[:, 1:] &= candidates[:, 1:] != candidates[:, :-1]
+            texts_of = np.repeat(suspects, fresh.sum(axis=1))
+            candidates = candidates[fresh]
+            # Stored candidates are shingled again from their text, as sets numbered after the chunk's
+            stored = np.unique(candidates[candidates >= 0])
+            if len(stored):
+                old_hashes, old_starts = shingle_hashes(store.texts(stored.astype(np.int32)))
+                hashes = np.concatenate((hashes, old_hashes))
+                starts = np.concatenate((starts[:-1], old_starts + starts[-1]))
+            other = np.where(candidates >= 0, n + np.searchsorted(stored, candidates), -candidates - 2)
+            similar = _pair_jaccard(hashes, starts, texts_of, other) >= self.threshold
+            duplicate[texts_of[similar]] = True
+        kept = np.flatnonzero(~duplicate)
+        self._grow(self.indexed + len(kept))
+        mask = np.uint64(self.keys.shape[1] - 1)
+        row_ids = (len(store) + np.arange(len(kept))).astype(np.int32)
+        for band in range(self.bands):
+            slot = (keys[kept, band] & mask).astype(np.int64)
+            self.keys[band, slot] = keys[kept, band]
+            self.rows[band, slot] = row_ids
+        self.indexed += len(kept)
+        return duplicate
+
+    def filter(self, chunk, store):
+        """The chunk (DataFrame with park and text) without its near-duplicates; counts them per park"""
+        duplicate = self.duplicates(chunk["text"].astype(str).tolist(), store)
+        parks = chunk["park"].astype(str).to_numpy()
+        seen = pd.Series(1, index=parks).groupby(level=0).sum()
+        dropped = pd.Series(duplicate.astype(np.int64), index=parks).groupby(level=0).sum()
+        for park, n in seen.items():
+            counts = self.parks.setdefault(park, [0, 0])
+            counts[0] += int(n)
+            counts[1] += int(dropped[park])
+        return chunk.loc[~duplicate] if duplicate.any() else chunk
+
+    def park_rates(self):
+        """[(park, reviews seen, near-duplicates dropped, dropped %)] by dropped % descending"""
+        rates = [(park, seen, dropped, dropped * 100.0 / seen if seen else 0.0)
+                 for park, (seen, dropped) in self.parks.items()]
+        return sorted(rates, key=lambda r: (-r[3], r[0]))
+
+    @property
+    def seen(self):
+        return sum(seen for seen, _ in self.parks.values())
+
+    @property
+    def dropped(self):
+        return sum(dropped for _, dropped in self.parks.values())
+
+    def __str__(self):
+        rate = self.dropped * 100.0 / self.seen if self.seen else 0.0
+        return (f"{self.dropped:,} of {self.seen:,} reviews dropped as near-duplicates ({rate:.1f}%, "
+                f"Jaccard >= {self.threshold:g}, {self.bands}x{self.rows_per_band} bands, "
+                f"{self.nbytes / 2**20:.1f} MB of tables)")
+
+
+def main():
+    import analytics
+
+    parser = argparse.ArgumentParser(description="Report near-duplicate reviews per park")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = analytics.ingest_dataset(os.pathsep.join(args.paths), report=print,
+                                       dedup_threshold=args.threshold)
+    index = dataset.duplicates
+    print(f"{index} in {time.perf_counter() - started:.2f}s")
+    for park, seen, dropped, pct in index.park_rates():
+        print(f"  {park:<30} {dropped:>9,} of {seen:>10,}  {pct:5.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Streaming CSV/Parquet export of filtered reviews and the aggregate tables.
+
+Reviews are written CHUNK_ROWS at a time: each chunk's code columns become
+Arrow dictionary arrays over the store's park/feature/sentiment names, its
+texts are decoded from the store's UTF-8 buffer, and the batch is appended
+to a CSV or Parquet writer. Only one chunk is ever held in memory, so
+exporting millions of rows costs about as much as exporting a hundred
+thousand. Files are written next to their target and renamed into place.
+
+    python export.py data/reviews --park Zion --format parquet --output zion.parquet
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from review_store import ALL_FEATURES, ALL_PARKS, MISSING_DAY, SENTIMENTS
+
+CHUNK_ROWS = 100_000
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+AGGREGATE_TABLES = ("parks", "features", "park_features")
+# Prepared export files are kept this long for repeat downloads
+EXPORT_TTL = 24 * 3600
+
+_NAMES = pa.dictionary(pa.int32(), pa.string())
+REVIEW_SCHEMA = pa.schema([("park", _NAMES), ("feature", _NAMES), ("sentiment", _NAMES), ("date", pa.date32()),
+                           ("text", pa.string())])
+
+
+def _dictionary(codes, names):
+    return pa.DictionaryArray.from_arrays(pa.array(codes.astype(np.int32)), pa.array(names, pa.string()))
+
+
+def review_batches(store, rows, chunk_rows=CHUNK_ROWS):
+    """Yield the given reviews as Arrow record batches of at most chunk_rows rows"""
+    park, feature = store.column("park"), store.column("feature")
+    sentiment, day = store.column("sentiment"), store.column("day")
+    parks, features = list(store.parks), list(store.features)
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        days = day[chunk]
+        yield pa.RecordBatch.from_arrays([
+            _dictionary(park[chunk], parks),
+            _dictionary(feature[chunk], features),
+            _dictionary(sentiment[chunk], SENTIMENTS),
+            pa.array(days, type=pa.int32(), mask=days == MISSING_DAY).cast(pa.date32()),
+            pa.array(store.texts(chunk), pa.string()),
+        ], schema=REVIEW_SCHEMA)
+
+
+def _open_writer(path, schema, fmt):
+    if fmt == "csv":
+        return pa_csv.CSVWriter(path, schema)
+    if fmt == "parquet":
+        return pq.ParquetWriter(path, schema)
+    raise ValueError(f"Unsupported export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _write_batches(batches, schema, path, fmt):
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                               dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        with _open_writer(tmp, schema, fmt) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def write_reviews(store, rows, path, fmt="csv", chunk_rows=CHUNK_ROWS):
+    """Stream the reviews with the given row ids to path as CSV or Parquet; returns the row count"""
+    _write_batches(review_batches(store, rows, chunk_rows), REVIEW_SCHEMA, path, fmt)
+    return len(rows)
+
+
+def aggregate_table(aggregates, table):
+    """Counts and percentages per park, per feature or per (park, feature) cell as a DataFrame.
+
+    Parks and features seeded from published percentages keep their shares,
+    but their review and sentiment counts are left empty (they are not counts).
+    """
+    seeded = ()
+    if table == "parks":
+        keys, counts, seeded = {"park": aggregates.parks}, aggregates.park_counts, aggregates.seeded_parks
+    elif table == "features":
+        keys, counts, seeded = {"feature": aggregates.features}, aggregates.feature_counts, aggregates.seeded_features
+    elif table == "park_features":
+        n_parks, n_features = len(aggregates.parks), len(aggregates.features)
+        keys = {"park": np.repeat(aggregates.parks, n_features), "feature": np.tile(aggregates.features, n_parks)}
+        counts = aggregates.cell_counts.reshape(n_parks * n_features, len(SENTIMENTS))
+    else:
+        raise ValueError(f"Unknown aggregate table {table!r}; expected one of {', '.join(AGGREGATE_TABLES)}")
+    total = counts.sum(axis=1)
+    frame = pd.DataFrame(keys)
+    frame["reviews"] = total
+    for i, sentiment in enumerate(SENTIMENTS):
+        frame[sentiment.lower()] = counts[:, i]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i, sentiment in enumerate(SENTIMENTS):
+            frame[f"{sentiment.lower()}_pct"] = np.where(total > 0, counts[:, i] * 100.0 / total, np.nan)
+    if table == "park_features":
+        frame = frame[frame["reviews"] > 0].reset_index(drop=True)
+    elif seeded:
+        mask = frame[table[:-1]].isin(seeded).to_numpy()
+        for column in ["reviews"] + [sentiment.lower() for sentiment in SENTIMENTS]:
+            frame[column] = pd.array(frame[column].to_numpy(), dtype="Int64")
+            frame.loc[mask, column] = pd.NA
+    return frame
+
+
+def write_aggregates(aggregates, table, path, fmt="csv"):
+    """Write one aggregate table to path as CSV or Parquet; returns the row count"""
+    batch = pa.RecordBatch.from_pandas(aggregate_table(aggregates, table), preserve_index=False)
+    _write_batches([batch], batch.schema, path, fmt)
+    return batch.num_rows
+
+
+def prune_exports(directory, max_age=EXPORT_TTL):
+    """Delete export files in directory older than max_age seconds"""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(directory) if os.path.isdir(directory) else ():
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            continue
+
+
+def main():
+    import analytics
+
+    parser = argparse.ArgumentParser(description="Export reviews or aggregate tables to CSV or Parquet")
+    parser.add_argument("paths", nargs="*", help="review files or directories (default: the bundled sample)")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--park", default=ALL_PARKS)
+    parser.add_argument("--feature", default=ALL_FEATURES)
+    parser.add_argument("--table", choices=AGGREGATE_TABLES, help="export this aggregate table instead of reviews")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    dataset = analytics.load_dataset(os.pathsep.join(args.paths), report=print)
+    started = time.perf_counter()
+    if args.table:
+        n = write_aggregates(dataset.aggregates, args.table, args.output, args.format)
+    else:
+        rows = analytics.filter_rows(dataset, args.park, args.feature)
+        n = write_reviews(dataset.store, rows, args.output, args.format, args.chunk_rows)
+    print(f"Wrote {n:,} rows to {args.output} ({os.path.getsize(args.output) / 2**20:.1f} MB) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
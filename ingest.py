@@ -0,0 +1,231 @@
+"""Streaming ingestion of review corpora from CSV, JSONL and Parquet files.
+
+Files are read in fixed-size chunks through generators, so only one chunk is
+resident at a time while the review store grows column by column. Usage:
+
+    python ingest.py reviews.csv more_reviews.parquet --chunk-size 100000
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+from lazy_imports import lazy_module
+from review_store import SENTIMENTS, ReviewStore, to_datetime
+
+pd = lazy_module("pandas")
+
+REQUIRED_COLUMNS = ["park", "feature", "sentiment", "text"]
+# Read when present: review dates (ISO 8601) feed the trend rollups, reviewer ids the distinct-reviewer sketches
+OPTIONAL_COLUMNS = ["date", "reviewer"]
+# When reviews are scored on ingest, labels are derived from the text
+SCORED_REQUIRED_COLUMNS = ["park", "text"]
+DEFAULT_CHUNK_SIZE = 50_000
+
+_SENTIMENT_NAMES = {s.lower(): s for s in SENTIMENTS}
+
+
+class SchemaError(ValueError):
+    """Raised when an input file is missing columns the dashboard needs"""
+
+
+@dataclass
+class IngestStats:
+    path: str
+    rows: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        dropped = f", {self.duplicates:,} near-duplicates" if self.duplicates else ""
+        return (f"{self.path}: {self.rows:,} rows ({self.rejected:,} rejected{dropped}) in {self.chunks} chunks, "
+                f"{self.seconds:.2f}s, {self.rows_per_sec:,.0f} rows/s")
+
+
+class Tee:
+    """Fan each ingested chunk out to several sinks (e.g. review store and aggregates)"""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def append(self, chunk):
+        for sink in self.sinks:
+            sink.append(chunk)
+
+
+class Map:
+    """Transform each chunk (e.g. annotate it) before it reaches a sink"""
+
+    def __init__(self, fn, sink):
+        self.fn = fn
+        self.sink = sink
+
+    def append(self, chunk):
+        self.sink.append(self.fn(chunk))
+
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".tsv"):
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported review file type: {path}")
+
+
+def _read_csv(path, chunk_size, columns):
+    sep = "\t" if path.lower().endswith(".tsv") else ","
+    yield from pd.read_csv(path, sep=sep, chunksize=chunk_size, usecols=lambda c: c in columns, dtype=str)
+
+
+def _read_jsonl(path, chunk_size, columns):
+    for chunk in pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False):
+        yield chunk[[c for c in chunk.columns if c in columns]]
+
+
+def _read_parquet(path, chunk_size, columns):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    present = [c for c in parquet_file.schema_arrow.names if c in columns]
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=present):
+        yield batch.to_pandas()
+
+
+_READERS = {"csv": _read_csv, "jsonl": _read_jsonl, "parquet": _read_parquet}
+
+
+def _strip(values):
+    """Non-null values as stripped str (JSONL and Parquet columns may hold numbers); null or blank become None"""
+    stripped = values.where(values.isna(), values.astype(str).str.strip())
+    return stripped.where(stripped.notna() & (stripped != ""), None)
+
+
+def validate_chunk(chunk, path="<chunk>", required=REQUIRED_COLUMNS):
+    """Check a chunk against the review schema and drop unusable rows.
+
+    Returns the cleaned chunk and the number of rejected rows. Missing
+    required columns raise SchemaError; rows with empty required fields are
+    dropped. Unknown sentiment labels reject the row when sentiment is
+    required and are blanked (left for the scorer) otherwise. Dates are
+    parsed once here; unparseable ones leave the review undated.
+    """
+    missing = [c for c in required if c not in chunk.columns]
+    if missing:
+        raise SchemaError(f"{path} is missing required columns: {', '.join(missing)}")
+
+    chunk = chunk.dropna(subset=required)
+    valid = pd.Series(True, index=chunk.index)
+    for column in ("park", "feature", "text"):
+        if column in required:
+            valid &= chunk[column].astype(str).str.strip() != ""
+    if "sentiment" in chunk.columns:
+        sentiment = _strip(chunk["sentiment"]).str.lower().map(_SENTIMENT_NAMES)
+        if "sentiment" in required:
+            valid &= sentiment.notna()
+
+    cleaned = chunk.loc[valid].copy()
+    if "sentiment" in cleaned.columns:
+        cleaned["sentiment"] = sentiment[valid]
+    for column in ("park", "feature"):
+        if column in cleaned.columns:
+            # Blank optional labels stay null, so the scorer fills them in
+            cleaned[column] = _strip(cleaned[column])
+    if "date" in cleaned.columns:
+        cleaned["date"] = to_datetime(cleaned["date"]).to_numpy()
+    rejected = len(chunk.index) - len(cleaned.index)
+    return cleaned, rejected
+
+
+def iter_review_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, required=REQUIRED_COLUMNS, stats=None):
+    """Yield validated DataFrame chunks of at most chunk_size reviews from a file"""
+    reader = _READERS[_file_format(path)]
+    wanted = set(REQUIRED_COLUMNS) | set(OPTIONAL_COLUMNS) | set(required)
+    for raw in reader(path, chunk_size, wanted):
+        chunk, rejected = validate_chunk(raw, path, required=list(required))
+        if stats is not None:
+            stats.rows += len(chunk.index)
+            stats.rejected += rejected
+            stats.chunks += 1
+        yield chunk
+
+
+def ingest_file(path, sink, chunk_size=DEFAULT_CHUNK_SIZE, scorer=None, dedup=None):
+    """Stream one file into sink (anything with an append(DataFrame) method).
+
+    With a scorer (see scoring.SentimentScorer) only park and text are
+    required; missing sentiment and feature labels are filled from the text
+    before the chunk reaches the sink. dedup (chunk -> chunk, e.g. a bound
+    dedup.NearDuplicateIndex.filter) drops near-duplicates first, so they
+    are never scored.
+    """
+    stats = IngestStats(path)
+    required = SCORED_REQUIRED_COLUMNS if scorer is not None else REQUIRED_COLUMNS
+    started = time.perf_counter()
+    for chunk in iter_review_chunks(path, chunk_size, required, stats=stats):
+        if dedup is not None:
+            before = len(chunk.index)
+            chunk = dedup(chunk)
+            stats.duplicates += before - len(chunk.index)
+        if scorer is not None:
+            chunk = scorer.score_frame(chunk)
+        sink.append(chunk)
+    # Wall clock covers read + validate (+ dedup + score) + append, i.e. end-to-end throughput
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def expand_paths(paths):
+    """Expand directories into the review files they contain, sorted by name"""
+    out = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full = os.path.join(path, name)
+                if os.path.isfile(full):
+                    try:
+                        _file_format(full)
+                    except ValueError:
+                        continue
+                    out.append(full)
+        else:
+            out.append(path)
+    return out
+
+
+def ingest_files(paths, sink, chunk_size=DEFAULT_CHUNK_SIZE, scorer=None, report=None, dedup=None):
+    """Stream every file (or directory of files) into sink, returning per-file stats"""
+    all_stats = []
+    for path in expand_paths(paths):
+        stats = ingest_file(path, sink, chunk_size, scorer, dedup)
+        all_stats.append(stats)
+        if report is not None:
+            report(stats)
+    return all_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream review files into the review store")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    store = ReviewStore([], [])
+    all_stats = ingest_files(args.paths, store, args.chunk_size, report=print)
+    total_rows = sum(s.rows for s in all_stats)
+    total_seconds = sum(s.seconds for s in all_stats)
+    rate = total_rows / total_seconds if total_seconds else 0.0
+    print(f"total: {total_rows:,} rows in {total_seconds:.2f}s, {rate:,.0f} rows/s, "
+          f"{len(store.parks)} parks, {len(store.features)} features")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Deferred imports for heavy optional-at-startup modules.
+
+``pd = lazy_module("pandas")`` binds a placeholder module; the real import
+happens on the first attribute access (``pd.DataFrame``), after which the
+placeholder carries the real module's attributes. pandas and plotly take
+most of a cold Streamlit worker's import time but are only needed for
+ingest, charts and tables, so the page header and metrics of a dashboard
+opened from a snapshot render before they are loaded. Modules that are
+already imported are returned as they are.
+"""
+import importlib
+import sys
+import threading
+import types
+
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports the named module on first attribute access"""
+
+    def _load(self):
+        with _lock:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_module(name):
+    """The module called name, imported on first use unless it already is"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
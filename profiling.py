@@ -0,0 +1,205 @@
+"""Hot-path timers for dashboard reruns.
+
+Code is timed with ``with PROFILER.section("metrics"):`` or the
+``@PROFILER.timed("name")`` decorator. Streamlit runs each session's script
+on its own thread, so a thread-local RunProfile collects the section timings
+of the rerun in progress; ``with PROFILER.run():`` wraps the whole script.
+Every timing also feeds a process-wide histogram per section, exported as
+Prometheus text (``prometheus_text``, ``serve_metrics``, ``write_textfile``)
+and, per finished rerun, one JSON log line on the "dashboard.profile" logger.
+Sections may nest; each is timed on its own, so nested times overlap.
+``PROFILER.mark(name)`` records the time since the start of the run instead,
+for milestones such as the first meaningful render.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Histogram bucket upper bounds in seconds, as in Prometheus client defaults
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Percentiles in the panel are over this many most recent timings per section
+RECENT = 1000
+RERUN = "rerun"
+
+logger = logging.getLogger("dashboard.profile")
+
+
+class SectionStats:
+    """Cumulative histogram plus a window of recent timings for one section"""
+
+    def __init__(self, buckets=BUCKETS, recent=RECENT):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def percentile(self, q):
+        """q-th percentile of the recent window, in seconds"""
+        return float(np.percentile(np.fromiter(self.recent, dtype=np.float64), q)) if self.recent else 0.0
+
+
+class RunProfile:
+    """Section timings (seconds, summed over repeated sections) of one script run"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.sections = {}
+
+    def add(self, name, seconds):
+        self.sections[name] = self.sections.get(name, 0.0) + seconds
+
+
+class Profiler:
+    """Process-wide section timers with per-rerun breakdowns"""
+
+    def __init__(self, namespace="dashboard", buckets=BUCKETS, recent=RECENT):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.recent = recent
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _observe(self, name, seconds):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = SectionStats(self.buckets, self.recent)
+            stats.observe(seconds)
+
+    @contextmanager
+    def section(self, name):
+        """Time a block under name, in the histograms and the current run"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._observe(name, seconds)
+            current = getattr(self._local, "current", None)
+            if current is not None:
+                current.add(name, seconds)
+
+    def timed(self, name):
+        """Decorator form of section()"""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.section(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def mark(self, name):
+        """Record the time from the start of the current run until now under name (a milestone like first_render)"""
+        current = self.current()
+        if current is None:
+            return
+        seconds = time.perf_counter() - current.started
+        self._observe(name, seconds)
+        current.add(name, seconds)
+
+    @contextmanager
+    def run(self, started=None):
+        """Wrap one script run; its total is recorded as the "rerun" section and logged.
+
+        started (a time.perf_counter() value) backdates the run, e.g. to the
+        top of the script so its module-level imports are included. Runs cut
+        short by an exception (including Streamlit's rerun/stop signals) are
+        not recorded, so they do not skew the latency figures.
+        """
+        run = self._local.current = RunProfile(started)
+        try:
+            yield run
+        finally:
+            self._local.current = None
+        total = time.perf_counter() - run.started
+        self._local.last = run
+        self._observe(RERUN, total)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "event": RERUN, "ts": round(time.time(), 3), "thread": threading.current_thread().name,
+                "total_ms": round(total * 1000, 3),
+                "sections_ms": {name: round(s * 1000, 3) for name, s in run.sections.items()},
+            }))
+
+    def current(self):
+        """RunProfile of the run in progress on this thread (or None)"""
+        return getattr(self._local, "current", None)
+
+    def summary(self):
+        """{section: {count, p50_ms, p95_ms, mean_ms}} over the recent window, sorted by name"""
+        with self._lock:
+            return {
+                name: {"count": s.count, "p50_ms": s.percentile(50) * 1000, "p95_ms": s.percentile(95) * 1000,
+                       "mean_ms": s.total / s.count * 1000 if s.count else 0.0}
+                for name, s in sorted(self._stats.items())
+            }
+
+    def prometheus_text(self):
+        """All section histograms in the Prometheus text exposition format"""
+        metric = f"{self.namespace}_section_seconds"
+        lines = [f"# HELP {metric} Time spent in dashboard sections and whole reruns (section=\"{RERUN}\").",
+                 f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name, s in sorted(self._stats.items()):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                cumulative = 0
+                for bound, n in zip(s.buckets, s.bucket_counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{section="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{section="{label}",le="+Inf"}} {s.count}')
+                lines.append(f'{metric}_sum{{section="{label}"}} {s.total:.6f}')
+                lines.append(f'{metric}_count{{section="{label}"}} {s.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Write prometheus_text() atomically, e.g. for node_exporter's textfile collector"""
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+def serve_metrics(profiler, port, host="0.0.0.0"):
+    """Serve profiler.prometheus_text() at http://host:port/metrics from a daemon thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = profiler.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# The dashboard's profiler; module state survives Streamlit's per-rerun script execution
+PROFILER = Profiler()
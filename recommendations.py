@@ -0,0 +1,131 @@
+"""Park recommendations catalog loaded from per-park JSON files.
+
+Each file in the catalog directory holds one park (see data/recommendations):
+
+    {"park": "Zion", "improvements": [...], "enhancements": [...], "research": "..."}
+
+The directory is read once, validated and indexed by park name, so a lookup
+is a dict get that returns a shared read-only entry. The directory is
+re-scanned (file names, sizes and mtimes only) at most every reload_interval
+seconds and reloaded when something changed; a broken edit keeps the last
+good catalog and is reported through last_error.
+"""
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from review_store import ALL_PARKS, strip_emoji
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recommendations")
+# Returned for parks without an entry of their own
+FALLBACK_PARK = ALL_PARKS
+RELOAD_INTERVAL = 2.0
+
+_LIST_FIELDS = ("improvements", "enhancements")
+
+
+class CatalogError(ValueError):
+    """Raised when a catalog file is malformed or a park appears twice"""
+
+
+def validate_entry(entry, path="<entry>"):
+    """Check one catalog entry and return it as a read-only mapping"""
+    if not isinstance(entry, dict):
+        raise CatalogError(f"{path}: expected a JSON object")
+    park = entry.get("park")
+    if not isinstance(park, str) or not park.strip():
+        raise CatalogError(f"{path}: 'park' must be a non-empty string")
+    for field in _LIST_FIELDS:
+        items = entry.get(field)
+        if not isinstance(items, list) or not all(isinstance(i, str) for i in items):
+            raise CatalogError(f"{path}: '{field}' must be a list of strings")
+    if not isinstance(entry.get("research"), str):
+        raise CatalogError(f"{path}: 'research' must be a string")
+    return MappingProxyType({
+        "park": park.strip(),
+        "improvements": tuple(entry["improvements"]),
+        "enhancements": tuple(entry["enhancements"]),
+        "research": entry["research"],
+    })
+
+
+class RecommendationCatalog:
+    """Recommendations per park, indexed by name and reloaded when the files change"""
+
+    def __init__(self, directory=DEFAULT_DIR, reload_interval=RELOAD_INTERVAL):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.last_error = None
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._checked = time.monotonic()
+        self._signature = self._scan()
+        # Fail loudly on startup; later reload errors keep the last good catalog
+        self._index = self._load()
+
+    def _files(self):
+        return sorted(e.path for e in os.scandir(self.directory) if e.is_file() and e.name.endswith(".json"))
+
+    def _scan(self):
+        signature = []
+        for path in self._files():
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def _load(self):
+        index = {}
+        for path in self._files():
+            with open(path, encoding="utf-8") as f:
+                try:
+                    entry = validate_entry(json.load(f), path)
+                except json.JSONDecodeError as e:
+                    raise CatalogError(f"{path}: {e}") from e
+            key = entry["park"].casefold()
+            if key in index:
+                raise CatalogError(f"{path}: duplicate entry for {entry['park']}")
+            index[key] = entry
+        if FALLBACK_PARK.casefold() not in index:
+            raise CatalogError(f"{self.directory}: missing the '{FALLBACK_PARK}' fallback entry")
+        self.loads += 1
+        return index
+
+    def maybe_reload(self):
+        """Reload if the files changed since the last check (checked at most every reload_interval)"""
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked = now
+            signature = self._scan()
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            try:
+                # Swapped in one assignment, so readers see the old or the new index
+                self._index = self._load()
+                self.last_error = None
+            except (OSError, CatalogError) as e:
+                self.last_error = str(e)
+                return False
+            return True
+        finally:
+            self._lock.release()
+
+    def get(self, park):
+        """Entry for a park name (emoji display names work too), or the fallback entry"""
+        self.maybe_reload()
+        index = self._index
+        entry = index.get(park.casefold())
+        if entry is None:
+            entry = index.get(strip_emoji(park).casefold())
+        return entry if entry is not None else index[FALLBACK_PARK.casefold()]
+
+    def parks(self):
+        """Park names with their own entry"""
+        return [e["park"] for k, e in self._index.items() if k != FALLBACK_PARK.casefold()]
+
+    def __len__(self):
+        return len(self._index)
@@ -0,0 +1,186 @@
+"""Background ingestion of review files dropped into a directory.
+
+A DatasetRefresher owns the Dataset the dashboard reads. A worker thread
+scans the drop directory every interval seconds; review files that are new
+and have finished writing (size and mtime unchanged since the previous scan,
+or older than SETTLE_SECONDS) are ingested, scored and mined into a copy of
+the current Dataset, which is then swapped in with one assignment. A rerun
+reads refresher.dataset once and keeps that version throughout, so it never
+waits on ingestion and never sees a half-applied batch.
+
+    python refresher.py data/incoming --interval 2
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from ingest import expand_paths
+
+DEFAULT_INTERVAL = 5.0
+# Files older than this are assumed complete without waiting for a second scan
+SETTLE_SECONDS = 10.0
+logger = logging.getLogger("dashboard.refresh")
+
+
+class RefreshResult(NamedTuple):
+    files: int
+    reviews: int
+    seconds: float  # ingest + swap time
+    latency: float  # newest file's mtime to the new version being visible
+    finished: float  # time.time() when the new version was swapped in
+    data_version: str
+
+
+class DatasetRefresher:
+    """Watches a drop directory and swaps in a new Dataset version when review files arrive"""
+
+    def __init__(self, dataset, drop_dir, interval=DEFAULT_INTERVAL, scoring_model="", aspect_model="",
+                 score_cache="", report=logger.info):
+        self.dataset = dataset
+        self.drop_dir = drop_dir
+        self.interval = interval
+        self.scoring_model = scoring_model
+        self.aspect_model = aspect_model
+        self.score_cache = score_cache
+        self.report = report
+        self.last_refresh: Optional[RefreshResult] = None
+        self.last_error = None
+        self.refreshes = 0
+        self._seen = {}  # path -> (size, mtime_ns) at the previous scan
+        self._done = {}  # path -> (size, mtime_ns) when it was ingested (or failed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _scan(self):
+        if not self.drop_dir or not os.path.isdir(self.drop_dir):
+            return {}
+        signature = {}
+        for path in expand_paths([self.drop_dir]):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature[path] = (stat.st_size, stat.st_mtime_ns)
+        return signature
+
+    def pending(self):
+        """Files in the drop directory that are complete and not yet ingested, oldest first"""
+        signature = self._scan()
+        now = time.time_ns()
+        ready = []
+        for path, sig in signature.items():
+            done = self._done.get(path)
+            if done == sig:
+                continue
+            if done is not None:
+                # Appending a rewritten file again would count its reviews twice
+                self.report(f"Ignoring {path}: changed after it was ingested; drop a new file instead")
+                self._done[path] = sig
+                continue
+            settled = now - sig[1] > SETTLE_SECONDS * 1e9
+            if settled or self._seen.get(path) == sig:
+                ready.append(path)
+        self._seen = signature
+        return sorted(ready, key=lambda p: signature[p][1])
+
+    def refresh(self):
+        """Ingest pending files into a new Dataset version; returns the RefreshResult or None"""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            paths = self.pending()
+            if not paths:
+                return None
+            return self._ingest(paths)
+        finally:
+            self._lock.release()
+
+    def _ingest(self, paths):
+        from analytics import ingest_into
+
+        started = time.perf_counter()
+        signature = {path: self._seen[path] for path in paths}
+        current = self.dataset
+        fingerprint = f"{current.fingerprint}|" + "|".join(f"{p}:{s[0]}:{s[1]}" for p, s in signature.items())
+        new = current.copy(fingerprint=fingerprint)
+        try:
+            stats = ingest_into(new, paths, self.scoring_model, self.aspect_model, self.report, self.score_cache)
+        except Exception as e:
+            # Bad files are skipped until they change (whatever the error, or they would be retried
+            # on every interval); the current version stays live
+            self.last_error = str(e)
+            self.report(f"Refresh failed, keeping data version {current.data_version}: {e}")
+            self._done.update(signature)
+            return None
+        # Swapped in one assignment, so readers see the old or the new version
+        self.dataset = new
+        self._done.update(signature)
+        self.last_error = None
+        self.refreshes += 1
+        finished = time.time()
+        self.last_refresh = RefreshResult(
+            files=len(paths),
+            reviews=sum(s.rows - s.duplicates for s in stats),
+            seconds=time.perf_counter() - started,
+            latency=finished - max(sig[1] for sig in signature.values()) / 1e9,
+            finished=finished,
+            data_version=new.data_version,
+        )
+        self.report(f"Refreshed to data version {new.data_version}: {self.last_refresh.reviews:,} reviews "
+                    f"from {len(paths)} file(s) in {self.last_refresh.seconds:.2f}s")
+        return self.last_refresh
+
+    # -- background thread ---------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:  # keep watching; the error is shown in the UI
+                self.last_error = str(e)
+                self.report(f"Refresh error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the watcher thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="dataset-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def main():
+    import analytics
+
+    parser = argparse.ArgumentParser(description="Watch a drop directory and ingest new review files")
+    parser.add_argument("drop_dir")
+    parser.add_argument("--data", default="", help="base corpus (default: the bundled sample)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL)
+    parser.add_argument("--scoring-model", default="")
+    parser.add_argument("--aspect-model", default="")
+    args = parser.parse_args()
+
+    refresher = DatasetRefresher(analytics.load_dataset(args.data, report=print), args.drop_dir, args.interval,
+                                 args.scoring_model, args.aspect_model, report=print)
+    print(f"Watching {args.drop_dir} every {args.interval:g}s (Ctrl+C to stop)")
+    refresher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        refresher.stop()
+
+
+if __name__ == "__main__":
+    main()
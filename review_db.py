@@ -0,0 +1,398 @@
+"""SQLite-backed review store for corpora larger than memory.
+
+ReviewDB keeps reviews in one SQLite file: code columns and text in a
+reviews table, with a covering (park, feature, sentiment) index and a
+(feature, sentiment) index. It is a drop-in ReviewStore, so Dataset, the
+ingest sinks, filter_rows/filter_data, search, exports and snapshots work
+unchanged.
+Filters run as indexed queries and only the rows being shown are read, so
+the text and indexes stay on disk and are paged in by SQLite. The code
+columns are read into memory only when a sort needs them.
+
+Each Dataset version sees the reviews with id < its size. The refresher can
+append a new version to the same file while the old version keeps serving.
+Reads go through one connection per thread, shared by every version of a
+database; appends are serialized by a lock. WAL mode lets reads run during
+appends.
+
+The dashboard's headline numbers can also be answered in SQL, so batch jobs
+can query a database file without loading it:
+
+    python review_db.py .cache/reviews.sqlite --park Zion --feature Hiking
+"""
+import argparse
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+import numpy as np
+
+from lazy_imports import lazy_module
+from review_store import (_CELL_STRIDE, _EMPTY_ROWS, _ROW_DTYPE, _TEXT_BLOCK, SENTIMENTS, ReviewStore, _Postings,
+                          _TextColumn, day_to_date)
+
+pd = lazy_module("pandas")
+
+DB_FORMAT = 1
+# SQLite's default limit on bound parameters per statement is 999
+_QUERY_BATCH = 900
+_COLUMN_DTYPES = {"park": np.uint16, "feature": np.uint16, "sentiment": np.int8, "day": np.int32}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY, park INTEGER NOT NULL, feature INTEGER NOT NULL, sentiment INTEGER NOT NULL,
+    day INTEGER NOT NULL, text TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS reviews_cell ON reviews (park, feature, sentiment);
+CREATE INDEX IF NOT EXISTS reviews_feature ON reviews (feature, sentiment);
+CREATE TABLE IF NOT EXISTS categories (kind TEXT, code INTEGER, name TEXT NOT NULL, PRIMARY KEY (kind, code))
+    WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID;
+"""
+
+
+class _Connections:
+    """One connection per thread to a database file, plus the lock appends hold"""
+
+    def __init__(self, path):
+        self.path = path
+        self.write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def get(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+        return db
+
+    @contextmanager
+    def write(self):
+        with self.write_lock:
+            db = self.get()
+            with db:
+                yield db
+
+
+def _npy(array):
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _from_npy(blob):
+    return np.load(io.BytesIO(blob), allow_pickle=False)
+
+
+class ReviewDB(ReviewStore):
+    """Review store in a SQLite file; reads see the first len(self) reviews.
+
+    Opened without a size, it covers the reviews of the last save_state
+    (or every review if the state was never saved).
+    """
+
+    def __init__(self, path, parks=(), features=(), park_emojis=None, feature_emojis=None, size=None,
+                 connections=None):
+        super().__init__(parks, features, park_emojis, feature_emojis)
+        self.path = path
+        self._connections = connections or _Connections(path)
+        self._loaded = {}  # code columns read for sorting, for the current size
+        with self._connections.write() as db:
+            db.executescript(_SCHEMA)
+            # Stored categories keep their codes; names passed in but not stored yet are added after them
+            for kind, names in (("park", self.parks), ("feature", self.features)):
+                stored = [name for (name,) in db.execute(
+                    "SELECT name FROM categories WHERE kind = ? ORDER BY code", (kind,))]
+                known = set(stored)
+                names[:] = stored + [name for name in names if name not in known]
+            self._save_categories(db)
+        self._park_codes = {p: i for i, p in enumerate(self.parks)}
+        self._feature_codes = {f: i for i, f in enumerate(self.features)}
+        if size is None:
+            # Rows appended after the state was saved (e.g. by the refresher) are not published
+            saved = db.execute("SELECT value FROM state WHERE name = 'size'").fetchone()
+            size = json.loads(saved[0]) if saved else db.execute(
+                "SELECT COALESCE(MAX(id) + 1, 0) FROM reviews").fetchone()[0]
+        self._size = size
+
+    @classmethod
+    def create(cls, path, parks=(), features=(), park_emojis=None, feature_emojis=None):
+        """A new, empty database at path, replacing any existing one"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return cls(path, parks, features, park_emojis, feature_emojis, size=0)
+
+    def copy(self):
+        """A version of this store over the same file and connections, to append to independently"""
+        return ReviewDB(self.path, self.parks, self.features, self.park_emojis, self.feature_emojis, self._size,
+                        self._connections)
+
+    def _save_categories(self, db):
+        for kind, names in (("park", self.parks), ("feature", self.features)):
+            db.executemany("INSERT OR IGNORE INTO categories VALUES (?, ?, ?)",
+                           [(kind, code, name) for code, name in enumerate(names)])
+
+    def _db(self):
+        return self._connections.get()
+
+    def arrays(self):
+        """(code columns by name, text UTF-8 buffer, text offsets) read back from the file, e.g. for a snapshot.
+
+        Unlike the in-memory store, this loads the whole corpus into memory.
+        """
+        columns = {name: self.column(name) for name in _COLUMN_DTYPES}
+        text, texts = _TextColumn(), self.texts()
+        for batch in iter(lambda: list(islice(texts, _TEXT_BLOCK)), []):
+            text.append(batch)
+        data, offsets = text._consolidate()
+        return columns, data, offsets
+
+    def postings(self):
+        """{index name: {key: row ids}} for the park, feature and (park, feature) cell indexes, from the code columns"""
+        park, feature = self.column("park").astype(np.int64), self.column("feature").astype(np.int64)
+        rows = np.arange(self._size, dtype=_ROW_DTYPE)
+        out = {}
+        for name, keys in (("park", park), ("feature", feature), ("cell", park * _CELL_STRIDE + feature)):
+            index = _Postings()
+            self._post(index, keys, rows)
+            out[name] = {key: index.get(key) for key in index.keys()}
+        return out
+
+    def append(self, records):
+        """Insert a batch of reviews (list of dicts or DataFrame) in one transaction"""
+        encoded = self._encode_batch(records)
+        if encoded is None:
+            return
+        park, feature, sentiment, day, texts = encoded
+        ids = range(self._size, self._size + len(texts))
+        with self._connections.write() as db:
+            # Rows past this version's end were written by a version that was never
+            # published (a failed refresh or an unsaved restart); they are replaced
+            db.execute("DELETE FROM reviews WHERE id >= ?", (self._size,))
+            self._save_categories(db)
+            db.executemany("INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?)",
+                           zip(ids, park.tolist(), feature.tolist(), sentiment.tolist(), day.tolist(), texts))
+        self._size += len(texts)
+        self._loaded = {}
+
+    def column(self, name):
+        """One code column (park, feature, sentiment or day) as a NumPy array, read from the file once"""
+        column = self._loaded.get(name)
+        if column is None:
+            cursor = self._db().execute(f"SELECT {name} FROM reviews WHERE id < ? ORDER BY id", (self._size,))
+            column = self._loaded[name] = np.fromiter((v for (v,) in cursor), dtype=_COLUMN_DTYPES[name],
+                                                      count=self._size)
+        return column
+
+    def rows(self, park=None, feature=None):
+        """Row ids matching a park and/or feature name, in insertion order, from the indexes"""
+        where, args = [], []
+        for kind, name, codes in (("park", park, self._park_codes), ("feature", feature, self._feature_codes)):
+            if name is not None:
+                if name not in codes:
+                    return _EMPTY_ROWS
+                where.append(f"{kind} = ?")
+                args.append(codes[name])
+        if not where:
+            return np.arange(self._size, dtype=_ROW_DTYPE)
+        cursor = self._db().execute(f"SELECT id FROM reviews WHERE {' AND '.join(where)} AND id < ?",
+                                    args + [self._size])
+        rows = np.fromiter((i for (i,) in cursor), dtype=_ROW_DTYPE)
+        rows.sort()
+        return rows
+
+    def _select(self, columns, rows):
+        """{row id: tuple of columns} for the given row ids"""
+        found = {}
+        ids = np.asarray(rows).tolist()
+        db = self._db()
+        for i in range(0, len(ids), _QUERY_BATCH):
+            batch = ids[i:i + _QUERY_BATCH]
+            marks = ",".join("?" * len(batch))
+            for row in db.execute(f"SELECT id, {columns} FROM reviews WHERE id IN ({marks})", batch):
+                found[row[0]] = row[1:]
+        return [found[i] for i in ids]
+
+    def texts(self, rows=None):
+        """Review texts for the given row ids (an iterator over all texts when rows is None)"""
+        if rows is None:
+            cursor = self._db().execute("SELECT text FROM reviews WHERE id < ? ORDER BY id", (self._size,))
+            return (text for (text,) in cursor)
+        return [text for (text,) in self._select("text", rows)]
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory: only the code columns read for sorting"""
+        return sum(c.nbytes for c in self._loaded.values())
+
+    def records(self, rows):
+        """Materialize review dicts (with emojis) for the given row ids"""
+        out = []
+        for p, f, s, d, t in self._select("park, feature, sentiment, day, text", rows):
+            park_name = self.parks[p]
+            feature_name = self.features[f]
+            out.append({
+                "park": park_name, "feature": feature_name, "sentiment": SENTIMENTS[s], "text": t,
+                "date": day_to_date(d),
+                "park_emoji": self.park_emojis.get(park_name, ""),
+                "feature_emoji": self.feature_emojis.get(feature_name, ""),
+            })
+        return out
+
+    # -- analytics in SQL ----------------------------------------------------
+
+    def cell_counts(self):
+        """Review counts per (park, feature, sentiment), shape (parks, features, 3), from the covering index"""
+        counts = np.zeros((len(self.parks), len(self.features), len(SENTIMENTS)), dtype=np.int64)
+        cursor = self._db().execute("SELECT park, feature, sentiment, COUNT(*) FROM reviews WHERE id < ? "
+                                    "GROUP BY park, feature, sentiment", (self._size,))
+        for park, feature, sentiment, n in cursor:
+            counts[park, feature, sentiment] = n
+        return counts
+
+    def _percentages(self, where="", args=(), group=""):
+        select = ", ".join(f"100.0 * SUM(sentiment = {i}) / COUNT(*)" for i in range(len(SENTIMENTS)))
+        key = f"{group}, " if group else ""
+        sql = f"SELECT {key}{select} FROM reviews WHERE {where + ' AND ' if where else ''}id < ?"
+        if group:
+            sql += f" GROUP BY {group}"
+        return self._db().execute(sql, tuple(args) + (self._size,)).fetchall()
+
+    def park_percentages(self, park):
+        """(positive, negative, neutral) percentages for one park"""
+        row = self._percentages("park = ?", (self._park_codes[park],))[0]
+        return (0.0,) * len(SENTIMENTS) if row[0] is None else tuple(row)
+
+    def feature_percentages(self, feature):
+        """(positive, negative, neutral) percentages for one feature"""
+        row = self._percentages("feature = ?", (self._feature_codes[feature],))[0]
+        return (0.0,) * len(SENTIMENTS) if row[0] is None else tuple(row)
+
+    def park_table(self):
+        """Per-park percentage matrix, shape (parks, 3); parks without reviews are 0"""
+        table = np.zeros((len(self.parks), len(SENTIMENTS)), dtype=np.float64)
+        for park, *pct in self._percentages(group="park"):
+            table[park] = pct
+        return table
+
+    def average_percentages(self):
+        """Mean over parks with reviews of each park's (positive, negative, neutral) percentages"""
+        rows = self._percentages(group="park")
+        return tuple(np.mean([pct for _, *pct in rows], axis=0).tolist()) if rows else (0.0, 0.0, 0.0)
+
+    def park_ranking(self):
+        """Parks with reviews as (name, positive %) from most to least positive, ties in park order"""
+        positive = {park: pct for park, pct, *_ in self._percentages(group="park")}
+        return [(self.parks[i], positive[i]) for i in sorted(positive, key=lambda i: (-positive[i], i))]
+
+    def park_rank(self, park):
+        """1-based rank of a park by positive percentage (parks without reviews come last, in park order)"""
+        ranked = [name for name, _ in self.park_ranking()]
+        reviewed = set(ranked)
+        ranked += [p for p in self.parks if p not in reviewed]
+        return ranked.index(park) + 1
+
+
+def save_state(dataset, key=""):
+    """Record the state that is not derived from the reviews table (trends, aspects, dedup tables, sketches) and the key, last"""
+    store = dataset.store
+    trend_meta, trend_counts = dataset.trends.state()
+    values = {
+        "format": json.dumps(DB_FORMAT), "size": json.dumps(len(store)), "fingerprint": json.dumps(dataset.fingerprint),
+        "trends": json.dumps(trend_meta), "aspects": json.dumps(dataset.aspects.state()),
+        "park_pct_sum": _npy(dataset.aggregates.park_pct_sum),
+    }
+    values.update({f"trend_{name}": _npy(counts) for name, counts in trend_counts.items()})
+    if dataset.duplicates is not None:
+        dedup_meta, dedup_tables = dataset.duplicates.state()
+        values["duplicates"] = json.dumps(dedup_meta)
+        values.update({f"dedup_{name}": _npy(array) for name, array in dedup_tables.items()})
+    if dataset.sketches is not None:
+        sketch_meta, sketch_arrays = dataset.sketches.state()
+        values["sketches"] = json.dumps(sketch_meta)
+        values.update({f"sketch_{name}": _npy(array) for name, array in sketch_arrays.items()})
+    with store._connections.write() as db:
+        db.execute("DELETE FROM state")
+        db.executemany("INSERT INTO state VALUES (?, ?)", values.items())
+        # The key goes in last (same transaction): its presence marks a complete database
+        db.execute("INSERT INTO state VALUES ('key', ?)", (json.dumps(key),))
+
+
+def stored_key(path):
+    """Key of the database saved at path, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as db:
+            row = db.execute("SELECT value FROM state WHERE name = 'key'").fetchone()
+        return None if row is None else json.loads(row[0])
+    except sqlite3.Error:
+        return None
+
+
+def load_database(path, park_emojis=None, feature_emojis=None):
+    """Open a saved database as a Dataset; counts come from SQL, review text stays on disk"""
+    from aggregates import SentimentAggregates
+    from analytics import Dataset
+    from aspects import AspectTable
+    from dedup import NearDuplicateIndex
+    from sketches import SketchTable
+    from trends import SentimentTrends
+
+    store = ReviewDB(path, park_emojis=park_emojis, feature_emojis=feature_emojis)
+    state = dict(store._db().execute("SELECT name, value FROM state"))
+    if json.loads(state.get("format", "null")) != DB_FORMAT:
+        raise ValueError(f"Unsupported review database format in {path}")
+    cells = store.cell_counts()
+    aggregates = SentimentAggregates.from_counts(store.parks, store.features, cells.sum(axis=1), cells.sum(axis=0),
+                                                 cells, park_pct_sum=_from_npy(state["park_pct_sum"]))
+    trends = SentimentTrends.from_state(json.loads(state["trends"]), {
+        name[len("trend_"):]: _from_npy(value) for name, value in state.items() if name.startswith("trend_")})
+    aspects = AspectTable.from_state(json.loads(state["aspects"]))
+    duplicates = None
+    if "duplicates" in state:
+        duplicates = NearDuplicateIndex.from_state(json.loads(state["duplicates"]), {
+            name[len("dedup_"):]: _from_npy(value) for name, value in state.items() if name.startswith("dedup_")})
+    sketches = None
+    if "sketches" in state:
+        sketches = SketchTable.from_state(json.loads(state["sketches"]), {
+            name[len("sketch_"):]: _from_npy(value) for name, value in state.items() if name.startswith("sketch_")})
+    return Dataset(store, aggregates, json.loads(state["fingerprint"]), trends, aspects, duplicates, sketches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a review database with SQL, without loading it")
+    parser.add_argument("path")
+    parser.add_argument("--park")
+    parser.add_argument("--feature")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = ReviewDB(args.path)
+    rows = store.rows(args.park, args.feature)
+    print(f"{len(rows):,} of {len(store):,} reviews match park={args.park or 'all'} feature={args.feature or 'all'}")
+
+    def shares(pct):
+        return ", ".join(f"{name} {value:.1f}%" for name, value in zip(SENTIMENTS, pct))
+
+    if args.park:
+        print(f"{args.park}: {shares(store.park_percentages(args.park))}; "
+              f"rank {store.park_rank(args.park)} of {len(store.park_ranking())}")
+    if args.feature:
+        print(f"{args.feature}: {shares(store.feature_percentages(args.feature))}")
+    print(f"All parks average: {shares(store.average_percentages())}")
+    print(pd.DataFrame(store.park_ranking(), columns=["park", "positive %"]).head(10).to_string(index=False))
+    print(f"Answered in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
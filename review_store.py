@@ -0,0 +1,396 @@
+"""Columnar review store with prebuilt park/feature indexes.
+
+Reviews are kept as NumPy code columns (park, feature, sentiment, day) next
+to the review text, and every appended batch is posted into inverted indexes
+keyed by park, by feature and by the (park, feature) cell. Any filter
+combination is then an index lookup instead of a scan over a list of dicts.
+
+Per review the store holds 2-byte park/feature codes, a 1-byte sentiment, a
+4-byte day, an 8-byte text offset, 4-byte row ids in the three indexes and
+the UTF-8 text itself; names and emojis are stored once per category and
+resolved when a page of reviews is materialized.
+"""
+import numpy as np
+
+from lazy_imports import lazy_module
+
+pd = lazy_module("pandas")
+
+SENTIMENTS = ["Positive", "Negative", "Neutral"]
+SENTIMENT_CODES = {s: i for i, s in enumerate(SENTIMENTS)}
+
+ALL_PARKS = "All Parks"
+ALL_FEATURES = "All Features"
+
+# Row ids are int32, so one store holds at most 2**31 - 1 reviews
+_ROW_DTYPE = np.int32
+_EMPTY_ROWS = np.empty(0, dtype=_ROW_DTYPE)
+# Park and feature codes; a category table holds at most _CELL_STRIDE names
+_CODE_DTYPE = np.uint16
+_TEXT_BLOCK = 100_000
+# Sort rank per sentiment code (Positive, Negative, Neutral) for each display order
+_SENTIMENT_ORDER = {
+    "positive": np.array([0, 2, 1], dtype=np.int8),
+    "negative": np.array([2, 0, 1], dtype=np.int8),
+}
+# (park, feature) cells are keyed as park_code * _CELL_STRIDE + feature_code
+_CELL_STRIDE = 1 << 16
+# Review dates are stored as days since 1970-01-01; undated reviews get this
+MISSING_DAY = np.iinfo(np.int32).min
+
+
+def to_datetime(values):
+    """Parse review dates (ISO 8601 strings or datetimes) to naive UTC; bad or missing become NaT"""
+    parsed = pd.to_datetime(pd.Series(values), errors="coerce", format="ISO8601", utc=True)
+    return parsed.dt.tz_localize(None)
+
+
+def to_days(values):
+    """Review dates as int32 days since 1970-01-01, MISSING_DAY where unknown"""
+    parsed = to_datetime(values)
+    days = parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+    return np.where(parsed.isna().to_numpy(), MISSING_DAY, days).astype(np.int32)
+
+
+def day_to_date(day):
+    """ISO date string for a stored day number ('' when undated)"""
+    return "" if day == MISSING_DAY else str(np.datetime64(int(day), "D"))
+
+
+class _Postings:
+    """Append-only row-id lists, consolidated lazily on first read"""
+
+    def __init__(self):
+        self._parts = {}
+        self._merged = {}
+
+    def add(self, key, rows):
+        self._parts.setdefault(key, []).append(rows)
+        self._merged.pop(key, None)
+
+    def set(self, key, rows):
+        """Install an already merged row-id list (e.g. a memory-mapped one) for a key"""
+        self._parts[key] = [rows]
+        self._merged[key] = rows
+
+    def get(self, key):
+        merged = self._merged.get(key)
+        if merged is None:
+            parts = self._parts.get(key)
+            if not parts:
+                return _EMPTY_ROWS
+            merged = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            self._parts[key] = [merged]
+            self._merged[key] = merged
+        return merged
+
+    def keys(self):
+        return self._parts.keys()
+
+    @property
+    def nbytes(self):
+        return sum(part.nbytes for parts in self._parts.values() for part in parts)
+
+
+def _extend(buffer, valid, parts):
+    """Write parts after valid, a prefix of buffer (or an array owned elsewhere when buffer is None).
+
+    Returns (buffer, new valid prefix). The buffer is reallocated with 50%
+    headroom when it is short, so appending costs amortized O(1) per item
+    instead of a copy of everything so far; bytes in valid are never
+    rewritten, so views handed out earlier stay correct.
+    """
+    used = len(valid)
+    needed = used + sum(len(part) for part in parts)
+    if buffer is None or needed > len(buffer):
+        grown = np.empty(needed + needed // 2, dtype=valid.dtype)
+        grown[:used] = valid
+        buffer = grown
+    for part in parts:
+        buffer[used:used + len(part)] = part
+        used += len(part)
+    return buffer, buffer[:needed]
+
+
+class _TextColumn:
+    """Review texts as one UTF-8 byte buffer plus offsets instead of a str object per review"""
+
+    def __init__(self, data=None, offsets=None):
+        self._parts = []  # (uint8 buffer, int64 byte lengths) per appended batch
+        self._data = np.empty(0, dtype=np.uint8) if data is None else data
+        self._offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        # Growable buffers behind _data and _offsets, once this column has allocated its own
+        # (arrays passed in may be shared or memory-mapped, so they are never written to)
+        self._data_buffer = self._offsets_buffer = None
+
+    def append(self, texts):
+        encoded = [(t if isinstance(t, str) else str(t)).encode("utf-8") for t in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        self._parts.append((np.frombuffer(b"".join(encoded), dtype=np.uint8), lengths))
+
+    def _consolidate(self):
+        if self._parts:
+            ends = np.cumsum(np.concatenate([lengths for _, lengths in self._parts])) + self._offsets[-1]
+            self._data_buffer, self._data = _extend(self._data_buffer, self._data,
+                                                    [data for data, _ in self._parts])
+            self._offsets_buffer, self._offsets = _extend(self._offsets_buffer, self._offsets, [ends])
+            self._parts = []
+        return self._data, self._offsets
+
+    def get(self, rows):
+        """Decoded texts for an array of row ids"""
+        data, offsets = self._consolidate()
+        view = memoryview(data)
+        rows = np.asarray(rows, dtype=np.int64)
+        return [str(view[start:end], "utf-8") for start, end in zip(offsets[rows].tolist(), offsets[rows + 1].tolist())]
+
+    def __len__(self):
+        return len(self._consolidate()[1]) - 1
+
+    def __iter__(self):
+        # Decoded a block at a time, so the whole corpus is never held as str objects
+        n = len(self)
+        for start in range(0, n, _TEXT_BLOCK):
+            yield from self.get(np.arange(start, min(start + _TEXT_BLOCK, n)))
+
+    @property
+    def nbytes(self):
+        data, offsets = self._consolidate()
+        # Headroom for later appends is memory held all the same
+        return sum((array if buffer is None else buffer).nbytes
+                   for array, buffer in ((data, self._data_buffer), (offsets, self._offsets_buffer)))
+
+
+class ReviewStore:
+    """Column store for reviews with inverted indexes on park and feature"""
+
+    def __init__(self, parks, features, park_emojis=None, feature_emojis=None):
+        self.parks = list(parks)
+        self.features = list(features)
+        self.park_emojis = dict(park_emojis or {})
+        self.feature_emojis = dict(feature_emojis or {})
+        self._park_codes = {p: i for i, p in enumerate(self.parks)}
+        self._feature_codes = {f: i for i, f in enumerate(self.features)}
+
+        self._columns = {"park": [], "feature": [], "sentiment": [], "day": []}
+        self._text = _TextColumn()
+        self._consolidated = None
+        self._size = 0
+
+        self._by_park = _Postings()
+        self._by_feature = _Postings()
+        self._by_cell = _Postings()
+
+    @classmethod
+    def from_records(cls, records, parks, features, park_emojis=None, feature_emojis=None):
+        """Build a store from review dicts such as the REVIEWS list"""
+        store = cls(parks, features, park_emojis, feature_emojis)
+        store.append(records)
+        return store
+
+    @classmethod
+    def from_arrays(cls, parks, features, columns, text_data, text_offsets, postings, park_emojis=None,
+                    feature_emojis=None):
+        """Rebuild a store from arrays() and postings() output without copying.
+
+        The arrays may be read-only memory maps: appends never write into
+        existing arrays, they add parts that are concatenated on read.
+        """
+        store = cls(parks, features, park_emojis, feature_emojis)
+        store._columns = {name: [columns[name]] for name in store._columns}
+        store._text = _TextColumn(text_data, text_offsets)
+        store._size = len(text_offsets) - 1
+        for name, index in store._indexes().items():
+            for key, rows in postings[name].items():
+                index.set(key, rows)
+        return store
+
+    def copy(self):
+        """A store sharing this one's arrays that can be appended to independently"""
+        columns, text_data, text_offsets = self.arrays()
+        return ReviewStore.from_arrays(self.parks, self.features, columns, text_data, text_offsets, self.postings(),
+                                       self.park_emojis, self.feature_emojis)
+
+    def __len__(self):
+        return self._size
+
+    def _indexes(self):
+        return {"park": self._by_park, "feature": self._by_feature, "cell": self._by_cell}
+
+    def arrays(self):
+        """(code columns by name, text UTF-8 buffer, text offsets) as consolidated NumPy arrays"""
+        self.column("park")
+        data, offsets = self._text._consolidate()
+        return dict(self._consolidated), data, offsets
+
+    def postings(self):
+        """{index name: {key: row ids}} for the park, feature and (park, feature) cell indexes"""
+        return {name: {key: index.get(key) for key in list(index.keys())} for name, index in self._indexes().items()}
+
+    @staticmethod
+    def _encode(values, codes, names):
+        # Factorize the batch once, then map its few distinct values to codes;
+        # unseen categories are added on the fly so ingest never drops rows
+        inverse, uniques = pd.factorize(values)
+        lookup = np.empty(len(uniques), dtype=_CODE_DTYPE)
+        for i, value in enumerate(uniques):
+            code = codes.get(value)
+            if code is None:
+                if len(names) == _CELL_STRIDE:
+                    raise ValueError(f"more than {_CELL_STRIDE} distinct values in one category")
+                code = codes[value] = len(names)
+                names.append(value)
+            lookup[i] = code
+        return lookup[inverse]
+
+    def _encode_batch(self, records):
+        """(park, feature, sentiment, day) code arrays and the texts of a batch, or None if it is empty"""
+        if isinstance(records, pd.DataFrame):
+            batch = records
+        else:
+            batch = pd.DataFrame.from_records(list(records), columns=["park", "feature", "sentiment", "date", "text"])
+        n = len(batch)
+        if n == 0:
+            return None
+
+        park = self._encode(batch["park"].to_numpy(), self._park_codes, self.parks)
+        feature = self._encode(batch["feature"].to_numpy(), self._feature_codes, self.features)
+        sentiment = batch["sentiment"].map(SENTIMENT_CODES).to_numpy(dtype=np.int8)
+        # The date column is optional; reviews without one are kept but undated
+        day = to_days(batch["date"]) if "date" in batch.columns else np.full(n, MISSING_DAY, dtype=np.int32)
+        return park, feature, sentiment, day, batch["text"].tolist()
+
+    def append(self, records):
+        """Append a batch of reviews (list of dicts or DataFrame) and index it"""
+        encoded = self._encode_batch(records)
+        if encoded is None:
+            return
+        park, feature, sentiment, day, texts = encoded
+        n = len(texts)
+
+        for name, column in (("park", park), ("feature", feature), ("sentiment", sentiment), ("day", day)):
+            self._columns[name].append(column)
+        self._text.append(texts)
+        self._consolidated = None
+
+        rows = np.arange(self._size, self._size + n, dtype=_ROW_DTYPE)
+        self._size += n
+        self._post(self._by_park, park, rows)
+        self._post(self._by_feature, feature, rows)
+        self._post(self._by_cell, park.astype(np.int64) * _CELL_STRIDE + feature, rows)
+
+    @staticmethod
+    def _post(postings, keys, rows):
+        # Group the batch by key with one stable sort, then post each run
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(keys)]))
+        for start, end in zip(starts, ends):
+            postings.add(int(sorted_keys[start]), rows[order[start:end]])
+
+    def column(self, name):
+        """Return one consolidated code column (park, feature, sentiment or day) as a NumPy array"""
+        if self._consolidated is None:
+            self._consolidated = {}
+            for key, parts in self._columns.items():
+                if not parts:
+                    merged = _EMPTY_ROWS
+                else:
+                    merged = parts[0] if len(parts) == 1 else np.concatenate(parts)
+                    self._columns[key] = [merged]
+                self._consolidated[key] = merged
+        return self._consolidated[name]
+
+    def compact(self):
+        """Merge the appended batches into one array per column and one text buffer, as the first read does"""
+        self.column("park")
+        self._text._consolidate()
+
+    def rows(self, park=None, feature=None):
+        """Row ids matching a park and/or feature name, in insertion order"""
+        if park is not None and park not in self._park_codes:
+            return _EMPTY_ROWS
+        if feature is not None and feature not in self._feature_codes:
+            return _EMPTY_ROWS
+        if park is not None and feature is not None:
+            return self._by_cell.get(self._park_codes[park] * _CELL_STRIDE + self._feature_codes[feature])
+        if park is not None:
+            return self._by_park.get(self._park_codes[park])
+        if feature is not None:
+            return self._by_feature.get(self._feature_codes[feature])
+        return np.arange(self._size, dtype=_ROW_DTYPE)
+
+    def sort_rows(self, rows, order="default"):
+        """Reorder matching row ids for display without touching the review text.
+
+        "default" keeps insertion order, "recent" puts the newest reviews first
+        (by date, then latest added; undated reviews last) and
+        "positive"/"negative" group by sentiment (neutral in between), keeping
+        insertion order inside each group.
+        """
+        if order == "recent":
+            rows = rows[::-1]
+            day = self.column("day")[rows].astype(np.int64)
+            return rows[np.argsort(-day, kind="stable")]
+        if order in _SENTIMENT_ORDER:
+            rank = _SENTIMENT_ORDER[order][self.column("sentiment")[rows]]
+            return rows[np.argsort(rank, kind="stable")]
+        return rows
+
+    def texts(self, rows=None):
+        """Review texts for the given row ids (an iterator over all texts when rows is None)"""
+        if rows is None:
+            return iter(self._text)
+        return self._text.get(rows)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns, the text buffer and the indexes"""
+        self.column("park")
+        columns = sum(c.nbytes for c in self._consolidated.values())
+        postings = sum(p.nbytes for p in self._indexes().values())
+        return columns + self._text.nbytes + postings
+
+    def records(self, rows):
+        """Materialize review dicts (with emojis) for the given row ids"""
+        park = self.column("park")[rows]
+        feature = self.column("feature")[rows]
+        sentiment = self.column("sentiment")[rows]
+        day = self.column("day")[rows]
+        text = self.texts(rows)
+        out = []
+        for p, f, s, d, t in zip(park.tolist(), feature.tolist(), sentiment.tolist(), day.tolist(), text):
+            park_name = self.parks[p]
+            feature_name = self.features[f]
+            out.append({
+                "park": park_name, "feature": feature_name, "sentiment": SENTIMENTS[s], "text": t,
+                "date": day_to_date(d),
+                "park_emoji": self.park_emojis.get(park_name, ""),
+                "feature_emoji": self.feature_emojis.get(feature_name, ""),
+            })
+        return out
+
+    def to_frame(self, rows=None):
+        """Return the store (or a subset of rows) as a DataFrame with categorical columns"""
+        if rows is None:
+            rows = slice(None)
+        return pd.DataFrame({
+            "park": pd.Categorical.from_codes(self.column("park")[rows], categories=self.parks),
+            "feature": pd.Categorical.from_codes(self.column("feature")[rows], categories=self.features),
+            "sentiment": pd.Categorical.from_codes(self.column("sentiment")[rows], categories=SENTIMENTS),
+            "date": self._dates(self.column("day")[rows]),
+            "text": np.array(self.texts(np.arange(len(self))[rows]), dtype=object),
+        })
+
+    @staticmethod
+    def _dates(days):
+        dates = days.astype("datetime64[D]").astype("datetime64[ns]")
+        dates[days == MISSING_DAY] = np.datetime64("NaT")
+        return dates
+
+
+def strip_emoji(display_name):
+    """Turn a selectbox display name like '🪨 Zion' back into 'Zion'"""
+    return display_name.split(" ", 1)[1] if " " in display_name else display_name
@@ -0,0 +1,152 @@
+"""Persistent cache of NLP results keyed by review text and model version.
+
+Scoring and aspect mining are pure functions of (text, model, rules), so their
+results are stored in a SQLite file under a 16-byte BLAKE2 hash of the
+namespace (model name, model version, rules version) and the text. Before a
+batch is scored, its hashes are looked up and only the misses are sent to
+spaCy; restarts and re-ingests of an unchanged corpus do no NLP work. When
+the live data grows past max_bytes, the least recently used entries are
+evicted and the freed pages returned to the file system.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+# SQLite's default limit on bound parameters per statement is 999
+_QUERY_BATCH = 900
+# Evict down to this fraction of max_bytes so eviction does not run on every put
+_EVICT_TO = 0.9
+
+
+def model_version(model):
+    """Version string of an installed spaCy model package (spaCy's version for blank:xx)"""
+    from importlib import metadata
+
+    try:
+        return metadata.version(model)
+    except (metadata.PackageNotFoundError, ValueError):
+        import spacy
+
+        return f"spacy-{spacy.__version__}"
+
+
+class ScoreCache:
+    """Content-addressed result cache in a SQLite file, with LRU size-based eviction"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum only takes effect on a new file, before any table exists
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results "
+                         "(key BLOB PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL) WITHOUT ROWID")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._db.commit()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def keys(namespace, texts):
+        """16-byte keys for texts under a namespace such as 'score:en_core_web_sm@3.7.0'"""
+        base = hashlib.blake2b(namespace.encode("utf-8") + b"\0", digest_size=16)
+        keys = []
+        for text in texts:
+            h = base.copy()
+            h.update(text.encode("utf-8"))
+            keys.append(h.digest())
+        return keys
+
+    def get_many(self, keys):
+        """{key: decoded value} for the keys present; marks them as recently used"""
+        found = {}
+        now = time.time_ns()
+        for i in range(0, len(keys), _QUERY_BATCH):
+            batch = keys[i:i + _QUERY_BATCH]
+            marks = ",".join("?" * len(batch))
+            rows = self._db.execute(f"SELECT key, value FROM results WHERE key IN ({marks})", batch).fetchall()
+            for key, value in rows:
+                found[key] = json.loads(value)
+            if rows:
+                self._db.execute(f"UPDATE results SET used = ? WHERE key IN ({marks})", [now, *batch])
+        self._db.commit()
+        return found
+
+    def put_many(self, items):
+        """Store (key, value) pairs; values must be JSON-serializable"""
+        now = time.time_ns()
+        self._db.executemany("INSERT OR REPLACE INTO results (key, value, used) VALUES (?, ?, ?)",
+                             [(key, json.dumps(value), now) for key, value in items])
+        self._db.commit()
+        if self.max_bytes and self.bytes_used() > self.max_bytes:
+            self.evict(int(self.max_bytes * _EVICT_TO))
+
+    def cached(self, namespace, texts, compute):
+        """Results for texts, computing (with compute(list_of_texts)) only the uncached ones"""
+        texts = list(texts)
+        keys = self.keys(namespace, texts)
+        found = self.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        # Each distinct missing text is computed once, even if repeated in the batch
+        todo = {keys[i]: texts[i] for i in missing}
+        if todo:
+            computed = compute(list(todo.values()))
+            new = dict(zip(todo, computed))
+            self.put_many(new.items())
+            found.update(new)
+        return [found[key] for key in keys]
+
+    def bytes_used(self):
+        """Bytes of live data (file pages minus free pages)"""
+        page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        pages = self._db.execute("PRAGMA page_count").fetchone()[0]
+        free = self._db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def bytes_on_disk(self):
+        """Size of the cache file plus its write-ahead log"""
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def evict(self, target_bytes):
+        """Drop least recently used entries until live data fits in target_bytes"""
+        used = self.bytes_used()
+        count = len(self)
+        if used <= target_bytes or not count:
+            return 0
+        # Assume roughly uniform entry sizes, then repeat if that was not enough
+        drop = max(1, int(count * (1 - target_bytes / used)) + 1)
+        self._db.execute("DELETE FROM results WHERE key IN "
+                         "(SELECT key FROM results ORDER BY used LIMIT ?)", (drop,))
+        self._db.commit()
+        self._db.execute("PRAGMA incremental_vacuum")
+        self._db.commit()
+        # Fold the log back into the (now smaller) file so the disk space is released
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.evicted += drop
+        return drop + self.evict(target_bytes)
+
+    def close(self):
+        self._db.close()
+
+    def __str__(self):
+        return (f"{self.path}: {self.hit_rate:.1%} hit rate ({self.hits:,} hits, {self.misses:,} misses), "
+                f"{len(self):,} entries, {self.bytes_on_disk() / 2**20:.1f} MB on disk, {self.evicted:,} evicted")
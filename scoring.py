@@ -0,0 +1,256 @@
+"""Batched spaCy scoring of review text into sentiment labels and features.
+
+Review text is run through ``nlp.pipe`` with the parser and NER disabled (only
+tokens, tags and lemmas are needed). Sentiment comes from a lemma lexicon with
+negation handling and the aspect is mapped onto the eight dashboard features
+by keyword lemmas. For multi-core scoring, texts are split into batches that a
+process pool scores independently; each worker loads the model once and sends
+back only small (sentiment, feature) tuples, so throughput scales with cores
+instead of being capped by pickling Doc objects back to the parent.
+
+    python scoring.py reviews.csv --workers 8 --batch-size 1000
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import lazy_module
+from review_store import SENTIMENTS
+
+pd = lazy_module("pandas")
+
+DEFAULT_MODEL = "en_core_web_sm"
+# Only the lemmatizer (and the tagger/attribute_ruler it relies on) is needed
+DISABLED_COMPONENTS = ["parser", "ner"]
+
+POSITIVE_LEMMAS = {
+    "amazing", "abundant", "awesome", "beautiful", "beautifully", "best", "breathtaking", "clean",
+    "enjoy", "enjoyable", "excellent", "fantastic", "friendly", "gorgeous", "great", "good",
+    "helpful", "impressive", "incredible", "love", "lovely", "magnificent", "memorable", "nice",
+    "peaceful", "perfect", "pleasant", "preserve", "reasonable", "recommend", "spectacular",
+    "stunning", "unique", "variety", "wonderful", "worth",
+}
+NEGATIVE_LEMMAS = {
+    "awful", "bad", "boring", "broken", "closed", "crowd", "crowded", "dangerous", "difficult",
+    "dirty", "disappointing", "expensive", "filthy", "hate", "impossible", "lack", "long", "noisy",
+    "overcrowded", "overpriced", "poor", "poorly", "rude", "smelly", "steep", "terrible", "unsafe",
+    "wait", "worst",
+}
+NEGATIONS = {"not", "no", "never", "n't", "hardly", "without"}
+NEGATION_WINDOW = 3
+# Feature assigned when neither the input nor the text names one
+FALLBACK_FEATURE = "Scenery"
+
+FEATURE_KEYWORDS = {
+    "Hiking": {"hike", "hiking", "trail", "trailhead", "trek", "climb", "summit", "walk", "step"},
+    "Camping": {"camp", "camping", "campground", "campsite", "tent", "rv", "backcountry", "stargazing"},
+    "Scenery": {"view", "scenery", "scenic", "landscape", "vista", "sunset", "sunrise", "overlook",
+                "waterfall", "canyon", "mountain", "building", "monument", "history"},
+    "Wildlife": {"wildlife", "animal", "bear", "wolf", "bird", "elk", "bison", "fish", "alligator",
+                 "turtle", "coral", "deer", "panther", "snorkeling", "snorkel"},
+    "Facilities": {"restroom", "bathroom", "toilet", "facility", "bathhouse", "shower", "lodge",
+                   "maintenance", "supply", "visitor"},
+    "Crowds": {"crowd", "crowded", "overcrowded", "busy", "people", "line", "queue", "weekend"},
+    "Fees": {"fee", "price", "cost", "pass", "ticket", "expensive", "cheap", "entrance", "entry"},
+    "Parking": {"parking", "lot", "traffic", "car", "vehicle", "shuttle"},
+}
+_KEYWORD_FEATURES = {}
+for _feature, _keywords in FEATURE_KEYWORDS.items():
+    for _keyword in _keywords:
+        _KEYWORD_FEATURES.setdefault(_keyword, []).append(_feature)
+
+# Changes whenever the lexicons or keywords do, so cached scores from older rules are not reused
+RULES_VERSION = hashlib.sha1(repr((
+    sorted(POSITIVE_LEMMAS), sorted(NEGATIVE_LEMMAS), sorted(NEGATIONS), NEGATION_WINDOW, FALLBACK_FEATURE,
+    sorted((f, sorted(k)) for f, k in FEATURE_KEYWORDS.items()),
+)).encode()).hexdigest()[:12]
+
+
+def load_model(model=DEFAULT_MODEL):
+    """Load a spaCy pipeline with the components scoring does not need disabled"""
+    import spacy
+
+    return spacy.load(model, exclude=DISABLED_COMPONENTS)
+
+
+def score_doc(doc):
+    """Return (sentiment, feature or None, score) for one processed Doc"""
+    score = 0
+    negate_until = -1
+    feature_hits = {}
+    for i, token in enumerate(doc):
+        lemma = (token.lemma_ or token.lower_).lower()
+        if lemma in NEGATIONS or token.lower_ in NEGATIONS:
+            negate_until = i + NEGATION_WINDOW
+            continue
+        polarity = 1 if lemma in POSITIVE_LEMMAS else -1 if lemma in NEGATIVE_LEMMAS else 0
+        if polarity:
+            score += -polarity if i <= negate_until else polarity
+        for feature in _KEYWORD_FEATURES.get(lemma, ()):
+            feature_hits[feature] = feature_hits.get(feature, 0) + 1
+
+    sentiment = SENTIMENTS[0] if score > 0 else SENTIMENTS[1] if score < 0 else SENTIMENTS[2]
+    feature = max(feature_hits, key=feature_hits.get) if feature_hits else None
+    return sentiment, feature, score
+
+
+def score_texts(nlp, texts, batch_size=1000):
+    """Score an iterable of texts in-process with nlp.pipe"""
+    for doc in nlp.pipe(texts, batch_size=batch_size):
+        sentiment, feature, _ = score_doc(doc)
+        yield sentiment, feature
+
+
+# Per-worker pipeline, loaded once by the pool initializer
+_WORKER_NLP = None
+
+
+def _init_worker(model):
+    global _WORKER_NLP
+    _WORKER_NLP = load_model(model)
+
+
+def _score_batch(args):
+    texts, batch_size = args
+    return list(score_texts(_WORKER_NLP, texts, batch_size))
+
+
+class SentimentScorer:
+    """Score review text into sentiment and feature labels, optionally across processes.
+
+    With a ScoreCache, texts scored before (by the same model version and
+    rules) are answered from the cache and only new texts reach spaCy.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, batch_size=1000, n_process=1, cache=None):
+        self.model = model
+        self.cache = cache
+        self._cache_namespace = None
+        self.batch_size = batch_size
+        self.n_process = max(1, n_process if n_process > 0 else (os.cpu_count() or 1))
+        self.docs = 0
+        self.seconds = 0.0
+        self._nlp = None
+        self._pool = None
+
+    @property
+    def docs_per_sec(self):
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._nlp = load_model(self.model)
+        return self._nlp
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn keeps workers independent of the (threaded) Streamlit server
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_process,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model,),
+            )
+        return self._pool
+
+    @property
+    def cache_namespace(self):
+        if self._cache_namespace is None:
+            from score_cache import model_version
+
+            self._cache_namespace = f"score:{self.model}@{model_version(self.model)}:{RULES_VERSION}"
+        return self._cache_namespace
+
+    def score(self, texts):
+        """Return a list of (sentiment, feature or None) for a sequence of texts"""
+        if self.cache is None:
+            return self._score(texts)
+        return [tuple(r) for r in self.cache.cached(self.cache_namespace, texts, self._score)]
+
+    def _score(self, texts):
+        texts = list(texts)
+        started = time.perf_counter()
+        if self.n_process == 1 or len(texts) < 2 * self.batch_size:
+            results = list(score_texts(self.nlp, texts, self.batch_size))
+        else:
+            # Enough batches per worker to balance uneven text lengths
+            step = max(self.batch_size, len(texts) // (self.n_process * 4) + 1)
+            jobs = [(texts[i:i + step], self.batch_size) for i in range(0, len(texts), step)]
+            results = []
+            for part in self._executor().map(_score_batch, jobs):
+                results.extend(part)
+        self.docs += len(texts)
+        self.seconds += time.perf_counter() - started
+        return results
+
+    def score_frame(self, chunk, overwrite=False):
+        """Fill the sentiment and feature columns of a review chunk from its text.
+
+        Existing labels are kept unless overwrite is set; reviews whose text
+        maps to no feature keep their given feature (or FALLBACK_FEATURE).
+        """
+        results = self.score(chunk["text"].astype(str).tolist())
+        chunk = chunk.copy()
+        scored_sentiment = pd.Series([s for s, _ in results], index=chunk.index, dtype=object)
+        scored_feature = pd.Series([f for _, f in results], index=chunk.index, dtype=object)
+
+        if overwrite or "sentiment" not in chunk.columns:
+            chunk["sentiment"] = scored_sentiment
+        else:
+            chunk["sentiment"] = chunk["sentiment"].fillna(scored_sentiment)
+
+        if "feature" not in chunk.columns:
+            chunk["feature"] = scored_feature
+        elif overwrite:
+            chunk["feature"] = scored_feature.fillna(chunk["feature"])
+        else:
+            chunk["feature"] = chunk["feature"].fillna(scored_feature)
+        chunk["feature"] = chunk["feature"].fillna(FALLBACK_FEATURE)
+        return chunk
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __str__(self):
+        return (f"{self.model}: {self.docs:,} docs in {self.seconds:.2f}s "
+                f"({self.docs_per_sec:,.0f} docs/s, {self.n_process} process(es))")
+
+
+def main():
+    from ingest import ingest_files
+    from review_store import ReviewStore
+
+    parser = argparse.ArgumentParser(description="Score review files with spaCy and load them into the store")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int, default=0, help="scoring processes (0 = all cores)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--cache", help="SQLite score cache; reviews scored before are not re-scored")
+    parser.add_argument("--cache-max-mb", type=float, default=512)
+    args = parser.parse_args()
+
+    cache = None
+    if args.cache:
+        from score_cache import ScoreCache
+
+        cache = ScoreCache(args.cache, int(args.cache_max_mb * 2**20))
+    scorer = SentimentScorer(args.model, args.batch_size, args.workers, cache=cache)
+    store = ReviewStore([], [])
+    try:
+        ingest_files(args.paths, store, scorer=scorer, report=print)
+    finally:
+        scorer.close()
+    print(scorer)
+    if cache is not None:
+        print(f"cache: {cache}")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
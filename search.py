@@ -0,0 +1,292 @@
+"""Full-text search over review text with BM25 ranking and phrase queries.
+
+The index is a positional inverted index stored as flat NumPy arrays in CSR
+form (term -> postings -> positions). Scoring a query is a handful of array
+slices and one ``np.bincount`` over the matching postings, so latency depends
+on how common the query terms are rather than on Python loops over reviews.
+Indexes are written to a directory of ``.npy`` files and memory-mapped on
+first use, so opening one at startup costs almost nothing.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from sketches import STOP_WORDS
+
+INDEX_FORMAT = 1
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+_ARRAYS = ["term_offsets", "doc_ids", "tfs", "pos_offsets", "positions", "doc_lengths"]
+
+
+def tokenize(text):
+    """Lowercase word tokens; the default, dependency-free analyzer"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def spacy_analyzer(nlp, batch_size=1000):
+    """Build a batch analyzer that lemmatizes with a loaded spaCy pipeline"""
+    def analyze(texts):
+        for doc in nlp.pipe(texts, batch_size=batch_size):
+            yield [(t.lemma_ or t.text).lower() for t in doc if not (t.is_punct or t.is_space)]
+    return analyze
+
+
+def parse_query(query, analyze=tokenize):
+    """Split a query into bare terms and "quoted phrases" (as token lists)"""
+    terms, phrases = [], []
+    for phrase, word in _QUERY_RE.findall(query):
+        if phrase:
+            tokens = analyze(phrase)
+            if len(tokens) > 1:
+                phrases.append(tokens)
+            else:
+                terms.extend(tokens)
+        else:
+            terms.extend(analyze(word))
+    return terms, phrases
+
+
+class SearchIndex:
+    """Positional inverted index with BM25 ranking"""
+
+    def __init__(self, vocab, arrays, meta, analyzer=None, k1=1.2, b=0.75):
+        self.vocab = vocab
+        # Queries must be analyzed exactly like the indexed text
+        self.analyzer = analyzer
+        self.meta = meta
+        self.k1 = k1
+        self.b = b
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_docs = len(self.doc_lengths)
+        self.avg_length = float(self.doc_lengths.mean()) if self.n_docs else 0.0
+        self._norm = None
+
+    # -- building ------------------------------------------------------------
+
+    @classmethod
+    def build(cls, texts, analyzer=None, fingerprint="", chunk_size=100_000):
+        """Index an iterable of texts; document ids are their positions (row ids)"""
+        analyze = analyzer or (lambda batch: map(tokenize, batch))
+        vocab = {}
+        term_parts, doc_parts, pos_parts, lengths = [], [], [], []
+        doc_id = 0
+        batch = []
+
+        def flush(batch, first_doc):
+            terms, docs, positions = [], [], []
+            for offset, tokens in enumerate(analyze(batch)):
+                lengths.append(len(tokens))
+                for position, token in enumerate(tokens):
+                    term = vocab.get(token)
+                    if term is None:
+                        term = vocab[token] = len(vocab)
+                    terms.append(term)
+                    docs.append(first_doc + offset)
+                    positions.append(position)
+            term_parts.append(np.asarray(terms, dtype=np.int32))
+            doc_parts.append(np.asarray(docs, dtype=np.int32))
+            pos_parts.append(np.asarray(positions, dtype=np.int32))
+
+        for text in texts:
+            batch.append(text)
+            if len(batch) == chunk_size:
+                flush(batch, doc_id)
+                doc_id += len(batch)
+                batch = []
+        if batch:
+            flush(batch, doc_id)
+
+        terms = np.concatenate(term_parts) if term_parts else np.empty(0, np.int32)
+        docs = np.concatenate(doc_parts) if doc_parts else np.empty(0, np.int32)
+        positions = np.concatenate(pos_parts) if pos_parts else np.empty(0, np.int32)
+
+        # Sort token occurrences by (term, doc, position); each (term, doc) run is one posting
+        order = np.lexsort((positions, docs, terms))
+        terms, docs, positions = terms[order], docs[order], positions[order]
+        new_posting = np.ones(len(terms), dtype=bool)
+        new_posting[1:] = (terms[1:] != terms[:-1]) | (docs[1:] != docs[:-1])
+        posting_starts = np.flatnonzero(new_posting)
+        posting_terms = terms[posting_starts]
+
+        arrays = {
+            "term_offsets": np.searchsorted(posting_terms, np.arange(len(vocab) + 1)).astype(np.int64),
+            "doc_ids": docs[posting_starts],
+            "tfs": np.diff(np.append(posting_starts, len(terms))).astype(np.int32),
+            "pos_offsets": np.append(posting_starts, len(terms)).astype(np.int64),
+            "positions": positions,
+            "doc_lengths": np.asarray(lengths, dtype=np.int32),
+        }
+        meta = {"format": INDEX_FORMAT, "fingerprint": fingerprint, "n_docs": len(lengths)}
+        return cls(vocab, arrays, meta, analyzer)
+
+    # -- persistence ---------------------------------------------------------
+
+    def save(self, path):
+        """Write the index as one .npy per array plus vocab/meta JSON"""
+        os.makedirs(path, exist_ok=True)
+        # Until the new meta.json is written, the directory holds no complete index
+        if os.path.exists(os.path.join(path, "meta.json")):
+            os.remove(os.path.join(path, "meta.json"))
+        # Every file is written aside and renamed: indexes loaded earlier may still map the old
+        # arrays, and truncating a mapped file kills the reading process with SIGBUS
+        for name in _ARRAYS:
+            fd, tmp = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp.npy", dir=path)
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(getattr(self, name)))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        # meta.json last: its presence marks a complete index
+        for name, value in (("vocab", self.vocab), ("meta", self.meta)):
+            fd, tmp = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp.json", dir=path)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp, os.path.join(path, f"{name}.json"))
+
+    @classmethod
+    def load(cls, path, mmap=True, analyzer=None):
+        """Open a saved index; arrays are memory-mapped instead of read"""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported search index format in {path}")
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            vocab = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in _ARRAYS}
+        return cls(vocab, arrays, meta, analyzer)
+
+    @staticmethod
+    def stored_fingerprint(path):
+        """Fingerprint of the index saved at path, or None if there is none"""
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f).get("fingerprint")
+        except (OSError, ValueError):
+            return None
+
+    # -- querying ------------------------------------------------------------
+
+    def _postings(self, token):
+        term = self.vocab.get(token)
+        if term is None:
+            return None
+        return int(self.term_offsets[term]), int(self.term_offsets[term + 1])
+
+    def _doc_norms(self):
+        if self._norm is None:
+            lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+            self._norm = self.k1 * (1 - self.b + self.b * lengths / max(self.avg_length, 1e-9))
+        return self._norm
+
+    def _phrase_docs(self, tokens):
+        # A phrase matches where term i occurs at position p + i. Postings are
+        # sorted by (doc, position), so each term's (doc, p) keys come out
+        # sorted and can be intersected rarest-first with binary search.
+        spans = []
+        for i, token in enumerate(tokens):
+            span = self._postings(token)
+            if span is None:
+                return np.empty(0, dtype=np.int64)
+            spans.append((span[1] - span[0], i, span))
+        keys = None
+        for _, i, (start, end) in sorted(spans):
+            counts = np.asarray(self.tfs[start:end], dtype=np.int64)
+            docs = np.repeat(np.asarray(self.doc_ids[start:end], dtype=np.int64), counts)
+            lo, hi = int(self.pos_offsets[start]), int(self.pos_offsets[end])
+            positions = np.asarray(self.positions[lo:hi], dtype=np.int64)
+            term_keys = (docs << 20) + (positions - i)
+            keys = term_keys if keys is None else _intersect_sorted(keys, term_keys)
+            if not len(keys):
+                break
+        return np.unique(keys >> 20)
+
+    def search(self, query, candidates=None, limit=None):
+        """Rank documents for a query; returns (doc_ids, scores) best first.
+
+        Bare terms are OR-ed and scored with BM25; every "quoted phrase" must
+        occur verbatim and its terms add to the score. Stop words neither match
+        nor score, so a query of only stop words finds nothing. candidates, if
+        given, restricts results to those row ids (e.g. the park/feature filter).
+        """
+        if self.analyzer is None:
+            terms, phrases = parse_query(query)
+        else:
+            terms, phrases = parse_query(query, lambda text: next(iter(self.analyzer([text]))))
+        # Stop words stay in the index, so phrases containing them still match verbatim
+        terms = [t for t in terms if t not in STOP_WORDS]
+        phrases = [phrase for phrase in phrases if any(t not in STOP_WORDS for t in phrase)]
+        all_terms = terms + [t for phrase in phrases for t in phrase if t not in STOP_WORDS]
+        if not all_terms or not self.n_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        norm = self._doc_norms()
+        doc_parts, weight_parts = [], []
+        for token in set(all_terms):
+            span = self._postings(token)
+            if span is None:
+                continue
+            start, end = span
+            docs = np.asarray(self.doc_ids[start:end])
+            tf = np.asarray(self.tfs[start:end], dtype=np.float32)
+            df = end - start
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            doc_parts.append(docs)
+            weight_parts.append(idf * tf * (self.k1 + 1) / (tf + norm[docs]))
+        if not doc_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if len(doc_parts) == 1:
+            # Single term: postings are already unique, sorted doc ids
+            hits = np.asarray(doc_parts[0], dtype=np.int64)
+            scores = np.zeros(self.n_docs, dtype=np.float32)
+            scores[hits] = weight_parts[0]
+        else:
+            # One bincount accumulates every term's BM25 contribution per document
+            scores = np.bincount(np.concatenate(doc_parts), weights=np.concatenate(weight_parts),
+                                 minlength=self.n_docs)
+            hits = np.flatnonzero(scores)
+        for phrase in phrases:
+            hits = _intersect_sorted(hits, self._phrase_docs(phrase))
+        if candidates is not None:
+            hits = _intersect_sorted(hits, np.sort(np.asarray(candidates, dtype=np.int64), kind="stable"))
+
+        hit_scores = scores[hits].astype(np.float32)
+        if limit is not None and len(hits) > limit:
+            top = np.argpartition(-hit_scores, limit - 1)[:limit]
+            hits, hit_scores = hits[top], hit_scores[top]
+        # Best score first; ties keep row order
+        order = np.lexsort((hits, -hit_scores))
+        return hits[order], hit_scores[order]
+
+
+def _intersect_sorted(a, b):
+    """Values of sorted array a that also occur in sorted array b"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a) or not len(b):
+        return a[:0]
+    idx = np.searchsorted(b, a)
+    idx[idx == len(b)] = len(b) - 1
+    return a[b[idx] == a]
+
+
+def open_or_build(path, texts, fingerprint, analyzer=None, report=None):
+    """Load the index at path if it matches fingerprint, otherwise build and save it.
+
+    The fingerprint should cover the analyzer as well as the corpus, since an
+    index is only usable with the analyzer that built it. report, if given,
+    is called with a message when the index had to be built.
+    """
+    if path and SearchIndex.stored_fingerprint(path) == fingerprint:
+        return SearchIndex.load(path, analyzer=analyzer)
+    started = time.perf_counter()
+    index = SearchIndex.build(texts, analyzer=analyzer, fingerprint=fingerprint)
+    if path:
+        index.save(path)
+    if report:
+        report(f"Built search index over {index.n_docs:,} reviews in {time.perf_counter() - started:.2f}s")
+    return index
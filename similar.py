@@ -0,0 +1,390 @@
+"""Similar-review lookup ("more like this") over dense review vectors.
+
+Every review is embedded once into a unit-length float32 vector, and the
+vectors are kept as one contiguous (reviews, dim) matrix in a .npy file that
+is memory-mapped on open, so the dot product of two rows is the cosine
+similarity of their reviews. Two embedders are available:
+
+- hash_embed, the default, needs no model: the words and word pairs of a
+  review (stop words dropped) are feature-hashed with random signs into a
+  fixed number of dimensions, so similarity measures shared wording;
+- spacy_embedder averages the word vectors of a spaCy pipeline that ships
+  them (en_core_web_md or _lg), so related words also count.
+
+A lookup either scans the whole matrix a block at a time with one
+matrix-vector product per block (exact), or, once a corpus has IVF_MIN_ROWS
+reviews, uses an inverted-file index: vectors are grouped by the nearest of
+about sqrt(n) spherical k-means centroids, and a query scans only the lists
+of its nprobe nearest centroids. An indexed matrix is stored list by list,
+so every probed list is one contiguous slice rather than scattered rows.
+
+    python similar.py data/reviews --output .cache/vector_index --query 42
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from itertools import chain
+
+import numpy as np
+
+from lazy_imports import lazy_module
+from search import tokenize
+from sketches import STOP_WORDS
+
+pd = lazy_module("pandas")
+
+INDEX_FORMAT = 1
+DEFAULT_DIM = 256
+# Rows per matrix-vector product in exact scans and list assignment (64 MB of float32 at 256 dims)
+BLOCK_ROWS = 65_536
+# Corpora this large get IVF lists; smaller ones are scanned exactly, which is fast enough
+IVF_MIN_ROWS = 100_000
+DEFAULT_NPROBE = 64
+KMEANS_ITERATIONS = 10
+# k-means is trained on at most this many sampled vectors per centroid
+KMEANS_SAMPLE_PER_LIST = 64
+# list_rows maps matrix positions to store rows and row_positions back
+_IVF_ARRAYS = ["centroids", "list_offsets", "list_rows", "row_positions"]
+# Odd multiplier that combines two word hashes into the hash of the pair
+_PAIR_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def normalize(matrix):
+    """Rows scaled to unit length (all-zero rows stay zero), as float32"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+
+def hash_embed(texts, dim=DEFAULT_DIM):
+    """(len(texts), dim) unit vectors from signed feature hashing of words and word pairs"""
+    tokens = [[t for t in tokenize(text) if t not in STOP_WORDS] for text in texts]
+    n = len(tokens)
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=n)
+    rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    words = pd.util.hash_array(np.fromiter(chain.from_iterable(tokens), dtype=object, count=int(lengths.sum())))
+    # Pairs of consecutive words of the same review keep some word order
+    same = rows[1:] == rows[:-1]
+    pairs = words[:-1][same] * _PAIR_MULTIPLIER + words[1:][same]
+    features = np.concatenate([words, pairs])
+    feature_rows = np.concatenate([rows, rows[1:][same]])
+    # High bits pick the dimension, the lowest bit the sign, so collisions cancel out on average
+    columns = ((features >> np.uint64(32)) % np.uint64(dim)).astype(np.int64)
+    signs = np.where(features & np.uint64(1), 1.0, -1.0)
+    matrix = np.bincount(feature_rows * dim + columns, weights=signs, minlength=n * dim).reshape(n, dim)
+    return normalize(matrix)
+
+
+def has_content_words(text):
+    """Whether text has a word hash_embed keeps; reviews of only stop words embed to a zero vector"""
+    return any(t not in STOP_WORDS for t in tokenize(text))
+
+
+def spacy_embedder(nlp, batch_size=1000):
+    """Build an embedder from a loaded spaCy pipeline with word vectors (mean vector per review)"""
+    if not nlp.vocab.vectors_length:
+        raise ValueError(f"spaCy pipeline {nlp.meta.get('name', '')!r} has no word vectors")
+
+    def embed(texts):
+        return normalize(np.stack([doc.vector for doc in nlp.pipe(texts, batch_size=batch_size)]))
+    return embed
+
+
+def _top(rows, scores, k):
+    # The k best, best first; ties keep row order
+    if len(rows) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+def train_ivf(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """Unit-length centroids of n_lists spherical k-means clusters, trained on a sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(vectors), min(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST), replace=False))
+    data = np.asarray(vectors[sample], dtype=np.float32)
+    centroids = data[rng.choice(len(data), n_lists, replace=False)]
+    for _ in range(iterations):
+        assigned = np.argmax(data @ centroids.T, axis=1)
+        order = np.argsort(assigned, kind="stable")
+        lists, starts = np.unique(assigned[order], return_index=True)
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        # Lists that lost every vector restart from random sample points
+        centroids = data[rng.choice(len(data), n_lists, replace=False)]
+        centroids[lists] = normalize(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids):
+    """Nearest centroid of every vector, a block at a time"""
+    return np.concatenate([np.argmax(np.asarray(vectors[start:start + BLOCK_ROWS]) @ centroids.T, axis=1)
+                           for start in range(0, len(vectors), BLOCK_ROWS)] or [np.empty(0, dtype=np.int64)])
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _temp_npy(path, name):
+    # A fresh name per write: concurrent builds into one directory never share a file
+    fd, tmp = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp.npy", dir=path)
+    os.close(fd)
+    return tmp
+
+
+def _save_array(path, name, array):
+    # Written aside and renamed, so processes mapping the old file keep reading it
+    tmp = _temp_npy(path, name)
+    np.save(tmp, array)
+    os.replace(tmp, os.path.join(path, f"{name}.npy"))
+
+
+class VectorIndex:
+    """Unit-length review vectors with exact and IVF top-k search; rows are review store rows"""
+
+    def __init__(self, vectors, meta, ivf=None):
+        self.vectors = vectors
+        self.meta = meta
+        self.centroids = self.list_offsets = self.list_rows = self.row_positions = None
+        if ivf is not None:
+            for name in _IVF_ARRAYS:
+                setattr(self, name, ivf[name])
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def vector(self, row):
+        """Vector of review row"""
+        return self.vectors[row if self.row_positions is None else int(self.row_positions[row])]
+
+    @property
+    def nbytes(self):
+        """Bytes of the vector matrix and IVF lists (on disk, or in memory if not saved)"""
+        arrays = [self.vectors] + [getattr(self, name) for name in _IVF_ARRAYS if getattr(self, name) is not None]
+        return sum(a.nbytes for a in arrays)
+
+    # -- building ------------------------------------------------------------
+
+    @classmethod
+    def build(cls, texts, count, path="", embed=None, fingerprint="", chunk_size=50_000, ivf_min_rows=IVF_MIN_ROWS):
+        """Embed count texts from an iterable chunk by chunk, into path/vectors.npy when path is set.
+
+        embed maps a list of texts to unit-length rows (hash_embed by
+        default). IVF lists are trained once there are ivf_min_rows vectors,
+        and the matrix is then rewritten in list order.
+        """
+        embed = embed or hash_embed
+        vectors = None
+        tmp = ""
+        if path:
+            os.makedirs(path, exist_ok=True)
+            tmp = _temp_npy(path, "vectors")
+            # Until the new meta.json is written, the directory holds no complete index
+            if os.path.exists(os.path.join(path, "meta.json")):
+                os.remove(os.path.join(path, "meta.json"))
+        start = 0
+        for batch in _batches(texts, chunk_size):
+            rows = embed(batch)
+            if vectors is None:
+                shape = (count, rows.shape[1])
+                vectors = (np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=shape) if path
+                           else np.empty(shape, dtype=np.float32))
+            vectors[start:start + len(rows)] = rows
+            start += len(rows)
+        if vectors is None:
+            vectors = np.empty((0, DEFAULT_DIM), dtype=np.float32)
+            if path:
+                np.save(tmp, vectors)
+        if start != count:
+            raise ValueError(f"expected {count:,} texts, got {start:,}")
+
+        ivf = None
+        if count >= ivf_min_rows:
+            centroids = train_ivf(vectors, max(1, int(np.sqrt(count))))
+            lists = assign_lists(vectors, centroids)
+            order = np.argsort(lists, kind="stable").astype(np.int64)
+            positions = np.empty(count, dtype=np.int64)
+            positions[order] = np.arange(count)
+            ivf = {
+                "centroids": centroids,
+                "list_offsets": np.searchsorted(lists[order], np.arange(len(centroids) + 1)).astype(np.int64),
+                "list_rows": order,
+                "row_positions": positions,
+            }
+            vectors = cls._reorder(vectors, order, tmp)
+        meta = {"format": INDEX_FORMAT, "fingerprint": fingerprint, "n": count, "dim": int(vectors.shape[1]),
+                "lists": 0 if ivf is None else len(ivf["centroids"])}
+        if not path:
+            return cls(vectors, meta, ivf)
+        if isinstance(vectors, np.memmap):
+            vectors.flush()
+        del vectors
+        os.replace(tmp, os.path.join(path, "vectors.npy"))
+        for name in _IVF_ARRAYS:
+            if ivf is not None:
+                _save_array(path, name, ivf[name])
+            elif os.path.exists(os.path.join(path, f"{name}.npy")):
+                os.remove(os.path.join(path, f"{name}.npy"))
+        # meta.json last: its presence marks a complete index
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return cls.load(path)
+
+    @staticmethod
+    def _reorder(vectors, order, tmp):
+        # Copied a block at a time into a second file that then takes the first one's name
+        if not tmp:
+            return vectors[order]
+        ordered_tmp = _temp_npy(os.path.dirname(tmp), "vectors")
+        ordered = np.lib.format.open_memmap(ordered_tmp, mode="w+", dtype=np.float32, shape=vectors.shape)
+        for start in range(0, len(order), BLOCK_ROWS):
+            ordered[start:start + BLOCK_ROWS] = vectors[order[start:start + BLOCK_ROWS]]
+        ordered.flush()
+        os.replace(ordered_tmp, tmp)
+        return ordered
+
+    # -- persistence ---------------------------------------------------------
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index; the vectors (and lists) are memory-mapped instead of read"""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported vector index format in {path}")
+        mode = "r" if mmap else None
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        ivf = None
+        if meta.get("lists"):
+            ivf = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in _IVF_ARRAYS}
+        return cls(vectors, meta, ivf)
+
+    @staticmethod
+    def stored_fingerprint(path):
+        """Fingerprint of the index saved at path, or None if there is none"""
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f).get("fingerprint")
+        except (OSError, ValueError):
+            return None
+
+    # -- querying ------------------------------------------------------------
+
+    def _rows(self, start, stop):
+        # Store rows of the matrix positions start:stop
+        return np.arange(start, stop) if self.list_rows is None else np.asarray(self.list_rows[start:stop])
+
+    def _scan(self, query, k):
+        # Exact: one matrix-vector product per block, keeping each block's k best
+        rows, scores = [], []
+        for start in range(0, len(self.vectors), BLOCK_ROWS):
+            block_scores = np.asarray(self.vectors[start:start + BLOCK_ROWS]) @ query
+            block_rows, block_scores = _top(self._rows(start, start + len(block_scores)), block_scores, k)
+            rows.append(block_rows)
+            scores.append(block_scores)
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(scores)
+
+    def _probe(self, query, nprobe):
+        # IVF: only the lists of the nprobe centroids nearest to the query, each a contiguous slice
+        centroid_scores = np.asarray(self.centroids) @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        nearest = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        slices = [(int(self.list_offsets[c]), int(self.list_offsets[c + 1])) for c in nearest.tolist()]
+        rows = np.concatenate([self._rows(start, stop) for start, stop in slices])
+        scores = np.concatenate([np.asarray(self.vectors[start:stop]) @ query for start, stop in slices])
+        return rows, scores
+
+    def search(self, query, k=10, exclude=None, nprobe=DEFAULT_NPROBE, exact=False):
+        """(rows, cosine similarities) of the k vectors nearest to a unit-length query, best first.
+
+        Uses the IVF lists when the index has them, unless exact is set;
+        exclude is a row to leave out (e.g. the review being matched).
+        Vectors with no positive similarity (zero vectors among them) are
+        never returned, so a zero-vector query finds nothing.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if exact or self.centroids is None:
+            rows, scores = self._scan(query, k + 1)
+        else:
+            rows, scores = self._probe(query, nprobe)
+        keep = scores > 0
+        if exclude is not None:
+            keep &= rows != exclude
+        rows, scores = rows[keep], scores[keep]
+        return _top(rows.astype(np.int64), scores.astype(np.float32), k)
+
+    def similar(self, row, k=10, **options):
+        """The k reviews most similar to review row (itself excluded), as (rows, similarities)"""
+        return self.search(self.vector(row), k, exclude=row, **options)
+
+
+def open_or_build(path, texts, count, fingerprint, embed=None, report=None):
+    """Load the index at path if it matches fingerprint, otherwise build and save it.
+
+    The fingerprint should cover the embedder as well as the corpus, since
+    vectors from different embedders are not comparable. report, if given,
+    is called with a message when the index had to be built.
+    """
+    if path and VectorIndex.stored_fingerprint(path) == fingerprint:
+        return VectorIndex.load(path)
+    started = time.perf_counter()
+    index = VectorIndex.build(texts, count, path, embed, fingerprint)
+    if report:
+        report(f"Built vector index over {len(index):,} reviews in {time.perf_counter() - started:.2f}s")
+    return index
+
+
+def main():
+    from ingest import ingest_files
+    from review_store import ReviewStore
+
+    parser = argparse.ArgumentParser(description="Embed review files and look up similar reviews")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--output", default="", help="directory to save the index in (default: keep in memory)")
+    parser.add_argument("--model", default="", help="spaCy pipeline with word vectors (default: hashed words)")
+    parser.add_argument("--query", type=int, action="append", default=[], help="review row to find neighbours of")
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    args = parser.parse_args()
+
+    store = ReviewStore([], [])
+    ingest_files(args.paths, store, report=print)
+    embed = None
+    if args.model:
+        import spacy
+
+        embed = spacy_embedder(spacy.load(args.model, disable=["parser", "ner"]))
+    started = time.perf_counter()
+    index = VectorIndex.build(store.texts(), len(store), args.output, embed, args.model)
+    seconds = time.perf_counter() - started
+    print(f"{len(index):,} vectors x {index.dim} in {seconds:.2f}s ({len(index) / max(seconds, 1e-9):,.0f} reviews/s), "
+          f"{index.nbytes / 2**20:.1f} MB, {index.meta['lists']} IVF lists")
+    for row in args.query:
+        print(f"\n#{row} {store.texts([row])[0]}")
+        for exact in (True, False) if index.centroids is not None else (True,):
+            started = time.perf_counter()
+            rows, scores = index.similar(row, args.top, exact=exact, nprobe=args.nprobe)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"  {'exact' if exact else f'ivf nprobe={args.nprobe}'} ({elapsed:.1f} ms):")
+            for r, score in zip(rows.tolist(), scores.tolist()):
+                print(f"    {score:.3f} #{r} {store.texts([r])[0][:100]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+"""Mergeable sketches for approximate per-park statistics in constant memory.
+
+Exact per-park counts of every term, aspect and reviewer grow with the
+corpus. The sketches here have a size fixed up front, are updated a chunk at
+a time, and two sketches built on separate streams (e.g. by worker
+processes) merge into the sketch of the combined stream:
+
+- CountMinSketch: frequency of any item. It never underestimates; with
+  width w and depth d an estimate exceeds the true count by more than e/w
+  of the stream's total count with probability at most exp(-d).
+- HyperLogLog: number of distinct items, with a relative standard error of
+  1.04/sqrt(2**precision).
+- SpaceSaving: the heaviest items of a stream. Counts overestimate by at
+  most total/capacity, and every item more frequent than that is kept.
+
+A SketchTable keeps one set per park and one overall, fed from review chunks
+like the aspect table: the distinct terms of each review (top terms), mined
+aspect mentions (highlights and complaints, ranked among the most mentioned
+aspects only) and reviewer ids (distinct reviewers).
+
+    python sketches.py data/reviews --workers 4
+"""
+import argparse
+import heapq
+import math
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import NamedTuple
+
+import numpy as np
+
+from aspects import MIN_MENTIONS, TOP_K, Aspect
+from lazy_imports import lazy_module
+from review_store import SENTIMENT_CODES
+
+pd = lazy_module("pandas")
+
+CMS_WIDTH = 2048
+CMS_DEPTH = 5
+HLL_PRECISION = 12
+TOP_CAPACITY = 256
+# Aspects are only ranked once the Count-Min bound is at most this fraction of their estimated mentions,
+# so a rare aspect's share is not made up of collisions with common terms
+ASPECT_MAX_ERROR = 0.05
+# Terms shorter than this are not counted
+MIN_TERM_LENGTH = 3
+STOP_WORDS = frozenset("""
+about above after again all also am an and any are around as at be been before being below between both but by
+can could did do does doing down during each even ever every few for from get got had has have having he her here
+hers him his how however i if in into is it its itself just like made make many me more most much my no nor not now
+of off on once one only or other our ours out over own really same she should so some such than that the their
+theirs them then there these they this those through to too under until up us very was way we well were what when
+where which while who whom why will with would you your yours
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9']+")
+_POSITIVE = SENTIMENT_CODES["Positive"]
+_NEGATIVE = SENTIMENT_CODES["Negative"]
+_N_SENTIMENTS = len(SENTIMENT_CODES)
+_KINDS = ("terms", "aspects")
+
+_rng = np.random.default_rng(20240607)
+# Multiply-shift column hash per Count-Min row: (a * key mod 2**64) >> (64 - log2(width)), a odd
+_ROW_MULTIPLIERS = _rng.integers(1, 2**63, 32, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+# One salt per (kind, sentiment), so the same word counts separately as a term and an aspect, per sentiment
+_SALTS = _rng.integers(0, 2**63, len(_KINDS) * _N_SENTIMENTS, dtype=np.uint64)
+
+
+def hash_items(items):
+    """Stable 64-bit hashes of strings, equal across processes and runs (unlike hash())"""
+    return pd.util.hash_array(np.asarray(items, dtype=object))
+
+
+def _mix64(keys):
+    # Finalizer of MurmurHash3, so neighbouring keys land in unrelated counters and registers
+    keys = keys ^ (keys >> np.uint64(33))
+    keys = keys * np.uint64(0xFF51AFD7ED558CCD)
+    return keys ^ (keys >> np.uint64(33))
+
+
+def _bit_length32(values):
+    # frexp is exact for 32-bit integers: values = m * 2**e with 0.5 <= m < 1, so e is the bit length
+    return np.frexp(values.astype(np.float64))[1]
+
+
+def _leading_zeros(keys):
+    high = (keys >> np.uint64(32)).astype(np.uint32)
+    low = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    return np.where(high > 0, 32 - _bit_length32(high), 64 - _bit_length32(low))
+
+
+class CountMinSketch:
+    """Approximate frequencies of hashed items in depth rows of width counters"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        if width < 2 or width & (width - 1):
+            raise ValueError(f"Count-Min width must be a power of two >= 2, got {width}")
+        if not 1 <= depth <= len(_ROW_MULTIPLIERS):
+            raise ValueError(f"Count-Min depth must be in [1, {len(_ROW_MULTIPLIERS)}], got {depth}")
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    @property
+    def epsilon(self):
+        """Estimates exceed the true count by at most epsilon * total ..."""
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        """... except with probability delta"""
+        return math.exp(-self.depth)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _columns(self, keys):
+        shift = np.uint64(64 - (self.width.bit_length() - 1))
+        return ((_ROW_MULTIPLIERS[:self.depth, None] * keys[None, :]) >> shift).astype(np.int64)
+
+    def add(self, keys, counts=1):
+        """Count each 64-bit key counts times (a scalar or one count per key)"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        counts = np.broadcast_to(np.asarray(counts, dtype=np.int64), keys.shape)
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(columns[row], weights=counts, minlength=self.width).astype(np.int64)
+        self.total += int(counts.sum())
+
+    def estimate(self, keys):
+        """Estimated count of each key: the smallest of its depth counters"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        return self.table[np.arange(self.depth)[:, None], self._columns(keys)].min(axis=0)
+
+    def merge(self, other):
+        """Add another sketch of the same shape, as if this one had seen its stream too"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min sketches of different shapes cannot be merged")
+        self.table += other.table
+        self.total += other.total
+
+
+class HyperLogLog:
+    """Approximate number of distinct hashed items in 2**precision one-byte registers"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be in [4, 18], got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        """Relative standard error of count()"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes
+
+    def add(self, keys):
+        """Add 64-bit keys (duplicates are free)"""
+        keys = _mix64(np.asarray(keys, dtype=np.uint64))
+        p = self.precision
+        index = (keys >> np.uint64(64 - p)).astype(np.int64)
+        rank = np.minimum(_leading_zeros(keys << np.uint64(p)), 64 - p) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def count(self):
+        """Estimated number of distinct keys added"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.ldexp(1.0, -self.registers.astype(np.int64)).sum())
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    def merge(self, other):
+        """Take the register-wise maximum with another sketch of the same precision"""
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches of different precisions cannot be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+
+class SpaceSaving:
+    """The capacity heaviest items of a weighted stream, with counts and how much each may be overestimated"""
+
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        self.entries = {}  # item -> [count, overestimate]
+        self.total = 0
+
+    @property
+    def error_bound(self):
+        """No count exceeds the item's true count by more than this"""
+        return self.total / self.capacity
+
+    def _floor(self):
+        # An item that is not kept occurred at most as often as the smallest kept count (0 until full)
+        if len(self.entries) < self.capacity:
+            return 0
+        return min(count for count, _ in self.entries.values())
+
+    def _combine(self, items, other_floor=0):
+        # Merge of two summaries: an item missing from one side may have had up to that side's floor
+        floor = self._floor()
+        seen = set()
+        for item, count, error in items:
+            entry = self.entries.get(item)
+            if entry is None:
+                self.entries[item] = [count + floor, error + floor]
+            else:
+                entry[0] += count
+                entry[1] += error
+            seen.add(item)
+        if other_floor:
+            for item, entry in self.entries.items():
+                if item not in seen:
+                    entry[0] += other_floor
+                    entry[1] += other_floor
+        if len(self.entries) > self.capacity:
+            self.entries = dict(heapq.nlargest(self.capacity, self.entries.items(), key=lambda e: e[1][0]))
+
+    def update(self, items, counts):
+        """Count a batch of distinct items, each counts[i] times"""
+        items = np.asarray(items, dtype=object)
+        counts = np.asarray(counts, dtype=np.int64)
+        self.total += int(counts.sum())
+        if len(items) > self.capacity:
+            # New items all start from the same floor, so one outside the batch's top capacity
+            # can never displace those above it; only kept items and that top are merged
+            kept = np.fromiter((item in self.entries for item in items), dtype=bool, count=len(items))
+            new = np.flatnonzero(~kept)
+            if len(new) > self.capacity:
+                new = np.sort(new[np.argsort(-counts[new], kind="stable")[:self.capacity]])
+                kept[new] = True
+                items, counts = items[kept], counts[kept]
+        self._combine(zip(items.tolist(), counts.tolist(), [0] * len(items)))
+
+    def merge(self, other):
+        """Fold in a summary of another stream"""
+        self._combine(((item, c, e) for item, (c, e) in other.entries.items()), other._floor())
+        self.total += other.total
+
+    def top(self, k):
+        """[(item, count, overestimate)] of the k largest counts"""
+        return [(item, count, error) for item, (count, error)
+                in heapq.nlargest(k, self.entries.items(), key=lambda e: e[1][0])]
+
+
+class TermCount(NamedTuple):
+    term: str
+    reviews: int  # estimated number of reviews mentioning the term
+    positive: float  # estimated % of those reviews that are positive
+    error: int  # the estimate exceeds the true count by at most this much (with probability 1 - delta)
+
+
+class _Scope:
+    """The sketches of one park, or of all parks"""
+
+    def __init__(self, width, depth, precision, capacity):
+        # Term and aspect mentions are counted apart, so rare aspects do not collide with common words
+        self.mentions = CountMinSketch(width, depth)
+        self.aspect_mentions = CountMinSketch(width, depth)
+        self.reviewers = HyperLogLog(precision)
+        self.terms = SpaceSaving(capacity)
+        self.positive = SpaceSaving(capacity)
+        self.negative = SpaceSaving(capacity)
+        self.reviews = 0
+        self.has_reviewers = False
+
+    def count(self, kind, items, hashes, counts):
+        """Count mentions of items (hashed by hash_items) given as an (items, sentiments) count matrix"""
+        offset = _KINDS.index(kind) * _N_SENTIMENTS
+        rows, codes = np.nonzero(counts)
+        self._sketch(kind).add(_mix64(hashes[rows] ^ _SALTS[offset + codes]), counts[rows, codes])
+        if kind == "terms":
+            totals = counts.sum(axis=1)
+            present = np.flatnonzero(totals)
+            self.terms.update(items[present], totals[present])
+        else:
+            for code, top in ((_POSITIVE, self.positive), (_NEGATIVE, self.negative)):
+                present = np.flatnonzero(counts[:, code])
+                top.update(items[present], counts[present, code])
+
+    def _sketch(self, kind):
+        return self.mentions if kind == "terms" else self.aspect_mentions
+
+    def estimate(self, kind, items):
+        """(n, sentiments) estimated mention counts of items"""
+        offset = _KINDS.index(kind) * _N_SENTIMENTS
+        hashes = hash_items(items)
+        return np.stack([self._sketch(kind).estimate(_mix64(hashes ^ _SALTS[offset + code]))
+                         for code in range(_N_SENTIMENTS)], axis=1)
+
+    def merge(self, other):
+        self.mentions.merge(other.mentions)
+        self.aspect_mentions.merge(other.aspect_mentions)
+        self.reviewers.merge(other.reviewers)
+        self.terms.merge(other.terms)
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.reviews += other.reviews
+        self.has_reviewers |= other.has_reviewers
+
+
+class SketchTable:
+    """Count-Min, HyperLogLog and SpaceSaving sketches per park (and overall, park None), in constant memory"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, precision=HLL_PRECISION, capacity=TOP_CAPACITY,
+                 top_k=TOP_K, min_mentions=MIN_MENTIONS, emojis=None):
+        self.width = width
+        self.depth = depth
+        self.precision = precision
+        self.capacity = capacity
+        self.top_k = top_k
+        self.min_mentions = min_mentions
+        # Default emoji per aspect label, e.g. the feature emojis
+        self.emojis = dict(emojis or {})
+        self._scopes = {}
+        self._ranked = {}  # scope -> (highlights, complaints), until the next update
+        self.version = 0
+
+    def _settings(self):
+        return {"width": self.width, "depth": self.depth, "precision": self.precision, "capacity": self.capacity,
+                "top_k": self.top_k, "min_mentions": self.min_mentions, "emojis": self.emojis}
+
+    def _scope(self, park):
+        scope = self._scopes.get(park)
+        if scope is None:
+            scope = self._scopes[park] = _Scope(self.width, self.depth, self.precision, self.capacity)
+        return scope
+
+    def state(self):
+        """(JSON-able settings and summaries, {name: array}) describing the table, for snapshots"""
+        scopes = list(self._scopes)
+        summaries = []
+        for park in scopes:
+            scope = self._scopes[park]
+            summaries.append({
+                "park": park, "reviews": scope.reviews, "has_reviewers": scope.has_reviewers,
+                "mentions": scope.mentions.total, "aspect_mentions": scope.aspect_mentions.total,
+                **{name: [getattr(scope, name).total, [[item, *entry] for item, entry
+                                                       in getattr(scope, name).entries.items()]]
+                   for name in ("terms", "positive", "negative")},
+            })
+        meta = {"settings": self._settings(), "scopes": summaries}
+        empty = (0,)
+        arrays = {
+            name: (np.stack([getattr(self._scopes[p], name).table for p in scopes]) if scopes
+                   else np.zeros(empty + (self.depth, self.width), dtype=np.int64))
+            for name in ("mentions", "aspect_mentions")
+        }
+        arrays["reviewers"] = (np.stack([self._scopes[p].reviewers.registers for p in scopes]) if scopes
+                               else np.zeros(empty + (1 << self.precision,), dtype=np.uint8))
+        return meta, arrays
+
+    @classmethod
+    def from_state(cls, meta, arrays):
+        """A table restored from state() output (the arrays are copied: they are small and updated in place)"""
+        table = cls(**meta["settings"])
+        for i, summary in enumerate(meta["scopes"]):
+            scope = table._scope(summary["park"])
+            for name in ("mentions", "aspect_mentions"):
+                getattr(scope, name).table = np.array(arrays[name][i], dtype=np.int64)
+                getattr(scope, name).total = summary[name]
+            scope.reviewers.registers = np.array(arrays["reviewers"][i], dtype=np.uint8)
+            scope.reviews = summary["reviews"]
+            scope.has_reviewers = summary["has_reviewers"]
+            for name in ("terms", "positive", "negative"):
+                summary_total, entries = summary[name]
+                top = getattr(scope, name)
+                top.total = summary_total
+                top.entries = {item: [count, error] for item, count, error in entries}
+        return table
+
+    def copy(self):
+        return SketchTable.from_state(*self.state())
+
+    @property
+    def nbytes(self):
+        # Counter arrays only; the SpaceSaving summaries add at most capacity entries each
+        return sum(s.mentions.nbytes + s.aspect_mentions.nbytes + s.reviewers.nbytes for s in self._scopes.values())
+
+    # -- updates -------------------------------------------------------------
+
+    def append(self, chunk):
+        """Sketch a chunk with park, sentiment and text columns (and reviewer and aspects, when present)"""
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.DataFrame.from_records(list(chunk))
+        if chunk.empty:
+            return
+        n = len(chunk.index)
+        park_codes, parks = pd.factorize(chunk["park"].astype(str).to_numpy())
+        codes = chunk["sentiment"].map(SENTIMENT_CODES).fillna(SENTIMENT_CODES["Neutral"]).to_numpy(dtype=np.int64)
+        scopes = [self._scope(park) for park in parks]
+        for scope, reviews in zip(scopes, np.bincount(park_codes, minlength=len(parks)).tolist()):
+            scope.reviews += reviews
+        self._scope(None).reviews += n
+
+        # One mention per distinct term per review; stop words are dropped once per distinct term
+        tokens = [_TOKEN_RE.findall(text.lower()) for text in chunk["text"].astype(str).tolist()]
+        rows = np.repeat(np.arange(n), np.fromiter(map(len, tokens), dtype=np.int64, count=n))
+        term_codes, terms = pd.factorize(np.fromiter(chain.from_iterable(tokens), dtype=object, count=len(rows)))
+        wanted = np.fromiter((len(t) >= MIN_TERM_LENGTH and t not in STOP_WORDS for t in terms), dtype=bool,
+                             count=len(terms))
+        keep = wanted[term_codes]
+        pairs = pd.unique(rows[keep] * len(terms) + term_codes[keep])
+        self._count("terms", pairs // len(terms), pairs % len(terms), terms, park_codes, codes, scopes)
+        # Mined aspects are distinct per review already
+        if "aspects" in chunk.columns:
+            aspects = chunk["aspects"].reset_index(drop=True).explode().dropna()
+            aspect_codes, labels = pd.factorize(aspects.to_numpy())
+            self._count("aspects", aspects.index.to_numpy(dtype=np.int64), aspect_codes, labels,
+                        park_codes, codes, scopes)
+        if "reviewer" in chunk.columns:
+            present = chunk["reviewer"].notna().to_numpy()
+            if present.any():
+                hashes = hash_items(chunk["reviewer"].astype(str).to_numpy()[present])
+                reviewer_parks = park_codes[present]
+                for p, scope in enumerate(scopes):
+                    scope.reviewers.add(hashes[reviewer_parks == p])
+                    scope.has_reviewers |= bool((reviewer_parks == p).any())
+                overall = self._scope(None)
+                overall.reviewers.add(hashes)
+                overall.has_reviewers = True
+        self._ranked = {}
+        self.version += 1
+
+    def _count(self, kind, rows, item_codes, items, park_codes, codes, scopes):
+        # Mentions (review row, item code) tallied per scope as an (items, sentiments) matrix
+        if not len(rows):
+            return
+        hashes = hash_items(items)
+        cells = item_codes * _N_SENTIMENTS + codes[rows]
+        size = len(items) * _N_SENTIMENTS
+        self._scope(None).count(kind, items, hashes, np.bincount(cells, minlength=size).reshape(-1, _N_SENTIMENTS))
+        mention_parks = park_codes[rows]
+        order = np.argsort(mention_parks, kind="stable")
+        bounds = np.searchsorted(mention_parks[order], np.arange(len(scopes) + 1))
+        for p, scope in enumerate(scopes):
+            part = cells[order[bounds[p]:bounds[p + 1]]]
+            if len(part):
+                scope.count(kind, items, hashes, np.bincount(part, minlength=size).reshape(-1, _N_SENTIMENTS))
+
+    def merge(self, other):
+        """Fold in a table built from another stream (e.g. by another process), as if this one had seen it too"""
+        if other._settings() != self._settings():
+            raise ValueError("Sketch tables with different settings cannot be merged")
+        for park, scope in other._scopes.items():
+            self._scope(park).merge(scope)
+        self._ranked = {}
+        self.version += 1
+
+    # -- reads ---------------------------------------------------------------
+
+    def reviews(self, park=None):
+        """Reviews sketched (exact)"""
+        scope = self._scopes.get(park)
+        return scope.reviews if scope is not None else 0
+
+    def reviewers(self, park=None):
+        """Estimated distinct reviewers, or None if no review had a reviewer id"""
+        scope = self._scopes.get(park)
+        if scope is None or not scope.has_reviewers:
+            return None
+        return scope.reviewers.count()
+
+    @property
+    def reviewer_error(self):
+        """Relative standard error of reviewers()"""
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def term_reviews(self, term, park=None):
+        """Estimated number of reviews mentioning term, per sentiment (overestimates by at most term_error)"""
+        scope = self._scopes.get(park)
+        if scope is None:
+            return np.zeros(_N_SENTIMENTS, dtype=np.int64)
+        return scope.estimate("terms", [term.lower()])[0]
+
+    def term_error(self, park=None):
+        """Count-Min bound: estimates exceed true counts by at most this, except with probability exp(-depth)"""
+        scope = self._scopes.get(park)
+        return 0 if scope is None else math.ceil(scope.mentions.epsilon * scope.mentions.total)
+
+    def top_terms(self, park=None, k=None):
+        """[TermCount] of the most mentioned terms, by estimated reviews"""
+        scope = self._scopes.get(park)
+        if scope is None:
+            return []
+        top = scope.terms.top(self.capacity)
+        if not top:
+            return []
+        estimates = scope.estimate("terms", [term for term, _, _ in top])
+        error = self.term_error(park)
+        ranked = []
+        for (term, count, overestimate), per_sentiment in zip(top, estimates):
+            # Both sketches only overestimate, so the smaller of the two is the better estimate
+            reviews = min(count, int(per_sentiment.sum()))
+            positive = per_sentiment[_POSITIVE] * 100.0 / max(int(per_sentiment.sum()), 1)
+            ranked.append(TermCount(term, reviews, float(positive), min(overestimate, error)))
+        return heapq.nsmallest(k or self.top_k, ranked, key=lambda t: -t.reviews)
+
+    def _rank(self, park):
+        ranked = self._ranked.get(park)
+        if ranked is None:
+            ranked = self._ranked[park] = (self._aspects(park, _POSITIVE), self._aspects(park, _NEGATIVE))
+        return ranked
+
+    def _aspects(self, park, code):
+        scope = self._scopes.get(park)
+        if scope is None:
+            return ()
+        candidates = [item for item, _, _ in (scope.positive if code == _POSITIVE else scope.negative).top(self.capacity)]
+        if not candidates:
+            return ()
+        ranked = []
+        bound = scope.aspect_mentions.epsilon * scope.aspect_mentions.total
+        floor = max(self.min_mentions, bound / ASPECT_MAX_ERROR)
+        for aspect, per_sentiment in zip(candidates, scope.estimate("aspects", candidates)):
+            mentions = int(per_sentiment.sum())
+            if mentions < floor:
+                continue
+            share = per_sentiment[code] * 100.0 / mentions
+            if share > 50:
+                ranked.append(Aspect(aspect, self.emojis.get(aspect, ""), float(share), mentions))
+        return tuple(heapq.nsmallest(self.top_k, ranked, key=lambda a: (-a.share, -a.mentions)))
+
+    def highlights(self, park=None):
+        """Top aspects by estimated positive share of mentions (park None for all parks)"""
+        return self._rank(park)[0]
+
+    def complaints(self, park=None):
+        """Top aspects by estimated negative share of mentions (park None for all parks)"""
+        return self._rank(park)[1]
+
+    def parks(self):
+        """Parks with at least one sketched review"""
+        return [park for park in self._scopes if park is not None]
+
+    def __str__(self):
+        return (f"{self.reviews():,} reviews in {len(self.parks())} park sketches, {self.nbytes / 2**20:.1f} MB "
+                f"(Count-Min {self.width}x{self.depth}: +{math.e / self.width:.2%} of mentions with "
+                f"p >= {1 - math.exp(-self.depth):.3f}; HyperLogLog +/-{self.reviewer_error:.1%}; "
+                f"top {self.capacity})")
+
+
+def sketch_files(paths, **settings):
+    """A SketchTable of review files, read chunk by chunk"""
+    from ingest import ingest_files
+
+    table = SketchTable(**settings)
+    ingest_files(paths, table, report=None)
+    return table
+
+
+def _sketch_file(args):
+    path, settings = args
+    # Tables cross the process boundary as plain state, not pickled objects
+    return sketch_files([path], **settings).state()
+
+
+def sketch_files_parallel(paths, workers=0, **settings):
+    """Sketch each file in its own process and merge the results"""
+    from ingest import expand_paths
+
+    files = expand_paths(paths)
+    table = SketchTable(**settings)
+    if not files:
+        return table
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or None, mp_context=context) as pool:
+        for state in pool.map(_sketch_file, [(path, settings) for path in files]):
+            table.merge(SketchTable.from_state(*state))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Approximate per-park review statistics from mergeable sketches")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--workers", type=int, default=1, help="processes, one file each (0 = all cores)")
+    parser.add_argument("--top", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.workers == 1:
+        table = sketch_files(args.paths, top_k=args.top)
+    else:
+        table = sketch_files_parallel(args.paths, args.workers, top_k=args.top)
+    print(f"{table} in {time.perf_counter() - started:.2f}s")
+    for park in [None] + sorted(table.parks()):
+        reviewers = table.reviewers(park)
+        who = f", ~{reviewers:,.0f} distinct reviewers" if reviewers is not None else ""
+        print(f"\n{park or 'All parks'}: {table.reviews(park):,} reviews{who}")
+        for t in table.top_terms(park):
+            print(f"  {t.term:<20} ~{t.reviews:>9,} reviews (+{t.error:,})  {t.positive:5.1f}% positive")
+
+
+if __name__ == "__main__":
+    main()
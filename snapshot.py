@@ -0,0 +1,215 @@
+"""Memory-mapped snapshots of a loaded Dataset for fast dashboard startup.
+
+A snapshot is a directory of uncompressed Arrow IPC files: reviews.arrow
+holds the code columns and the review text (a large_string column, which is
+the store's own UTF-8 buffer plus offsets), postings.arrow the park, feature
+and cell indexes, and counts.arrow the aggregate and trend rollup arrays
+(plus the near-duplicate tables and per-park sketches, when those are kept).
+meta.json holds the category names, emojis, aspect table and the key of the
+corpus it was built from. Loading memory-maps the files and wraps the Arrow
+buffers as NumPy arrays without parsing or copying them, so a worker process
+starts in milliseconds and every process that maps the same snapshot shares
+its pages through the OS page cache.
+
+    python snapshot.py data/reviews --output .cache/snapshot
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pyarrow as pa
+
+from aggregates import SentimentAggregates
+from aspects import AspectTable
+from dedup import NearDuplicateIndex
+from review_store import ReviewStore
+from sketches import SketchTable
+from trends import SentimentTrends
+
+SNAPSHOT_FORMAT = 1
+_AGGREGATE_COUNTS = ("park_counts", "feature_counts", "cell_counts")
+
+
+def _write_arrow(path, batch):
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+
+def _read_arrow(path):
+    # One record batch per file, read straight out of the memory map. The map is
+    # not closed here: the batch's buffers keep it alive for as long as they are used.
+    return pa.ipc.open_file(pa.memory_map(path, "r")).get_batch(0)
+
+
+def _numpy(array):
+    # Integer columns are viewed straight from their data buffer: Array.to_numpy goes
+    # through pyarrow's pandas shim, which imports pandas (~0.35s) on a worker's cold start
+    if array.null_count or not pa.types.is_integer(array.type):
+        return array.to_numpy(zero_copy_only=True)
+    kind = "i" if pa.types.is_signed_integer(array.type) else "u"
+    dtype = np.dtype(f"{kind}{array.type.bit_width // 8}")
+    return np.frombuffer(array.buffers()[1], dtype=dtype, count=len(array), offset=array.offset * dtype.itemsize)
+
+
+def _review_batch(store):
+    columns, data, offsets = store.arrays()
+    text = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data))
+    names = list(columns) + ["text"]
+    return pa.RecordBatch.from_arrays([pa.array(columns[name]) for name in columns] + [text], names=names)
+
+
+def _postings_batch(store):
+    names, keys, offsets, rows = [], [], [0], []
+    for name, index in store.postings().items():
+        for key in sorted(index):
+            names.append(name)
+            keys.append(key)
+            rows.append(index[key])
+            offsets.append(offsets[-1] + len(index[key]))
+    values = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+    lists = pa.LargeListArray.from_arrays(pa.array(offsets, pa.int64()), pa.array(values))
+    return pa.RecordBatch.from_arrays([pa.array(names, pa.string()), pa.array(keys, pa.int64()), lists],
+                                      names=["index", "key", "rows"])
+
+
+def _counts_batch(arrays):
+    names = list(arrays)
+    return pa.RecordBatch.from_arrays([
+        pa.array(names, pa.string()),
+        pa.array([arrays[n].dtype.str for n in names], pa.string()),
+        pa.array([list(arrays[n].shape) for n in names], pa.list_(pa.int64())),
+        pa.array([np.ascontiguousarray(arrays[n]).tobytes() for n in names], pa.large_binary()),
+    ], names=["name", "dtype", "shape", "data"])
+
+
+def save_snapshot(dataset, path, key=""):
+    """Write a Dataset snapshot to the directory path, replacing any existing one.
+
+    key identifies the corpus and settings the dataset was built from; it is
+    what stored_key returns, so callers can tell whether the snapshot is current.
+    """
+    store, aggregates = dataset.store, dataset.aggregates
+    trend_meta, trend_counts = dataset.trends.state()
+    counts = {name: getattr(aggregates, name) for name in _AGGREGATE_COUNTS}
+    counts["park_pct_sum"] = aggregates.park_pct_sum
+    counts.update({f"trend_{name}": array for name, array in trend_counts.items()})
+    dedup_meta = None
+    if dataset.duplicates is not None:
+        dedup_meta, dedup_tables = dataset.duplicates.state()
+        counts.update({f"dedup_{name}": array for name, array in dedup_tables.items()})
+    sketch_meta = None
+    if dataset.sketches is not None:
+        sketch_meta, sketch_arrays = dataset.sketches.state()
+        counts.update({f"sketch_{name}": array for name, array in sketch_arrays.items()})
+
+    # Built next to the target and swapped in, so readers never see a partial snapshot;
+    # processes still mapping the old files keep their (unlinked) pages
+    tmp = f"{path.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    _write_arrow(os.path.join(tmp, "reviews.arrow"), _review_batch(store))
+    _write_arrow(os.path.join(tmp, "postings.arrow"), _postings_batch(store))
+    _write_arrow(os.path.join(tmp, "counts.arrow"), _counts_batch(counts))
+    meta = {
+        "format": SNAPSHOT_FORMAT, "key": key, "fingerprint": dataset.fingerprint, "reviews": len(store),
+        "store": {"parks": store.parks, "features": store.features, "park_emojis": store.park_emojis,
+                  "feature_emojis": store.feature_emojis},
+        "aggregates": {"parks": aggregates.parks, "features": aggregates.features},
+        "trends": trend_meta,
+        "aspects": dataset.aspects.state(),
+        "duplicates": dedup_meta,
+        "sketches": sketch_meta,
+    }
+    # meta.json last: its presence marks a complete snapshot
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    old = f"{path.rstrip(os.sep)}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_snapshot(path):
+    """Open a snapshot as a Dataset whose large arrays are read-only memory maps"""
+    from analytics import Dataset
+
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format in {path}")
+
+    reviews = _read_arrow(os.path.join(path, "reviews.arrow"))
+    text = reviews.column("text")
+    _, offsets, data = text.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[:len(text) + 1]
+    data = np.empty(0, dtype=np.uint8) if data is None else np.frombuffer(data, dtype=np.uint8)
+    columns = {name: _numpy(reviews.column(name)) for name in reviews.schema.names if name != "text"}
+
+    postings = {"park": {}, "feature": {}, "cell": {}}
+    batch = _read_arrow(os.path.join(path, "postings.arrow"))
+    rows = batch.column("rows")
+    values, bounds = _numpy(rows.values), _numpy(rows.offsets)
+    for i, (name, key) in enumerate(zip(batch.column("index").to_pylist(), batch.column("key").to_pylist())):
+        postings[name][key] = values[bounds[i]:bounds[i + 1]]
+
+    counts = {}
+    batch = _read_arrow(os.path.join(path, "counts.arrow"))
+    blobs = batch.column("data")
+    names, dtypes, shapes = (batch.column(c).to_pylist() for c in ("name", "dtype", "shape"))
+    for i, (name, dtype, shape) in enumerate(zip(names, dtypes, shapes)):
+        counts[name] = np.frombuffer(blobs[i].as_buffer(), dtype=np.dtype(dtype)).reshape(shape)
+
+    info = meta["store"]
+    store = ReviewStore.from_arrays(info["parks"], info["features"], columns, data, offsets, postings,
+                                    info["park_emojis"], info["feature_emojis"])
+    aggregates = SentimentAggregates.from_counts(meta["aggregates"]["parks"], meta["aggregates"]["features"],
+                                                 *(counts[name] for name in _AGGREGATE_COUNTS),
+                                                 park_pct_sum=counts["park_pct_sum"])
+    trends = SentimentTrends.from_state(meta["trends"], {name[len("trend_"):]: array for name, array
+                                                         in counts.items() if name.startswith("trend_")})
+    duplicates = None
+    if meta.get("duplicates") is not None:
+        duplicates = NearDuplicateIndex.from_state(meta["duplicates"], {
+            name[len("dedup_"):]: array for name, array in counts.items() if name.startswith("dedup_")})
+    sketches = None
+    if meta.get("sketches") is not None:
+        sketches = SketchTable.from_state(meta["sketches"], {
+            name[len("sketch_"):]: array for name, array in counts.items() if name.startswith("sketch_")})
+    return Dataset(store, aggregates, meta["fingerprint"], trends, AspectTable.from_state(meta["aspects"]),
+                   duplicates, sketches)
+
+
+def stored_key(path):
+    """Key of the snapshot saved at path, or None if there is none"""
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            return json.load(f).get("key")
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    import analytics
+
+    parser = argparse.ArgumentParser(description="Build a memory-mapped dashboard snapshot from review files")
+    parser.add_argument("paths", nargs="+", help="CSV, JSONL or Parquet files (or directories)")
+    parser.add_argument("--output", default=os.path.join(".cache", "snapshot"))
+    parser.add_argument("--scoring-model", default="")
+    parser.add_argument("--aspect-model", default="")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset = analytics.load_dataset(os.pathsep.join(args.paths), args.scoring_model, args.aspect_model,
+                                     report=print, snapshot=args.output)
+    print(f"{len(dataset.store):,} reviews ready in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    load_snapshot(args.output)
+    print(f"Snapshot {args.output} opens in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Time-bucketed sentiment rollups for trend charts.
+
+Dated reviews are counted into three precomputed rollup tables (day, week
+and month), each a dense array of counts shaped (buckets, parks, features,
+sentiments). Appending a chunk only touches the buckets its dates fall in, so
+new days extend the tables incrementally, and a trend query is a slice plus a
+sum over the park/feature axes: a 5-year monthly trend reads 60 rows no
+matter how many reviews the corpus holds. Since the tables are dense from the
+first to the last date, dates outside a window (TREND_FIRST_DATE to
+tomorrow by default) are counted as undated rather than stretching them.
+"""
+import datetime
+
+import numpy as np
+
+from lazy_imports import lazy_module
+from review_store import MISSING_DAY, SENTIMENT_CODES, SENTIMENTS, to_days
+
+pd = lazy_module("pandas")
+
+_N_SENTIMENTS = len(SENTIMENTS)
+# Earliest date counted into the rollups; one mistyped year (1700-01-01) would
+# otherwise add a bucket for every day up to the rest of the corpus
+TREND_FIRST_DATE = "1990-01-01"
+
+
+def _day_buckets(days):
+    return days
+
+
+def _week_buckets(days):
+    # Weeks start on Monday; day 4 (1970-01-05) was the first Monday
+    return (days + 3) // 7
+
+
+def _month_buckets(days):
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _day_starts(buckets):
+    return buckets.astype("datetime64[D]")
+
+
+def _week_starts(buckets):
+    return (buckets * 7 - 3).astype("datetime64[D]")
+
+
+def _month_starts(buckets):
+    return buckets.astype("datetime64[M]").astype("datetime64[D]")
+
+
+# granularity -> (days to bucket ids, bucket ids to period start dates)
+GRANULARITIES = {
+    "day": (_day_buckets, _day_starts),
+    "week": (_week_buckets, _week_starts),
+    "month": (_month_buckets, _month_starts),
+}
+
+
+class _Rollup:
+    """Counts per (bucket, park, feature, sentiment) for one granularity"""
+
+    def __init__(self, to_bucket, to_start):
+        self.to_bucket = to_bucket
+        self.to_start = to_start
+        self.origin = None  # bucket id of row 0
+        self.length = 0
+        self.counts = np.zeros((0, 0, 0, _N_SENTIMENTS), dtype=np.int32)
+
+    def _reserve(self, lo, hi, n_parks, n_features):
+        # Make buckets lo..hi and every park/feature code addressable. Growth
+        # at the end (new days arriving) reserves headroom so it is amortized.
+        origin = lo if self.origin is None else min(self.origin, lo)
+        end = hi + 1 if self.origin is None else max(self.origin + self.length, hi + 1)
+        shift = 0 if self.origin is None else self.origin - origin
+        length = end - origin
+        _, parks, features, _ = self.counts.shape
+        if shift or length > len(self.counts) or n_parks > parks or n_features > features:
+            capacity = length + length // 2 if shift or length > len(self.counts) else len(self.counts)
+            grown = np.zeros((capacity, max(parks, n_parks), max(features, n_features), _N_SENTIMENTS),
+                             dtype=np.int32)
+            grown[shift:shift + self.length, :parks, :features] = self.counts[:self.length]
+            self.counts = grown
+        self.origin, self.length = origin, length
+
+    def add(self, days, park, feature, sentiment, n_parks, n_features):
+        if not (self.counts.flags.writeable and self.counts.flags.c_contiguous):
+            # Counts restored from a snapshot are a read-only memory map; updates below go through a flat view
+            self.counts = np.ascontiguousarray(self.counts).copy()
+        buckets = self.to_bucket(days)
+        lo, hi = int(buckets.min()), int(buckets.max())
+        self._reserve(lo, hi, n_parks, n_features)
+        # One bincount over the chunk's bucket range instead of a scatter per review
+        _, parks, features, _ = self.counts.shape
+        # Counted per distinct cell, so the scratch space grows with the chunk rather than its date span
+        flat = (((buckets - self.origin) * parks + park) * features + feature) * _N_SENTIMENTS + sentiment
+        cells, counts = np.unique(flat, return_counts=True)
+        self.counts.reshape(-1)[cells] += counts.astype(np.int32)
+
+    def series(self, park=None, feature=None, start_day=None, end_day=None):
+        """(period start dates, counts of shape (periods, 3)) for non-empty buckets"""
+        if self.origin is None:
+            return np.empty(0, dtype="datetime64[D]"), np.zeros((0, _N_SENTIMENTS), dtype=np.int64)
+        lo, hi = 0, self.length
+        if start_day is not None:
+            lo = max(lo, int(self.to_bucket(np.int64(start_day))) - self.origin)
+        if end_day is not None:
+            hi = min(hi, int(self.to_bucket(np.int64(end_day))) - self.origin + 1)
+        counts = self.counts[lo:max(lo, hi)]
+        counts = counts[:, park] if park is not None else counts.sum(axis=1, dtype=np.int64)
+        counts = counts[:, feature] if feature is not None else counts.sum(axis=1, dtype=np.int64)
+        present = np.flatnonzero(counts.sum(axis=1))
+        return self.to_start(present + lo + self.origin), counts[present].astype(np.int64)
+
+
+class SentimentTrends:
+    """Day, week and month sentiment rollups maintained incrementally as reviews arrive.
+
+    Reviews dated before first_date or after last_date (default: tomorrow)
+    are counted in out_of_window and otherwise treated as undated.
+    """
+
+    def __init__(self, parks, features, first_date=TREND_FIRST_DATE, last_date=None):
+        self.first_date = first_date
+        self.last_date = last_date
+        self.parks = list(parks)
+        self.features = list(features)
+        self._park_codes = {p: i for i, p in enumerate(self.parks)}
+        self._feature_codes = {f: i for i, f in enumerate(self.features)}
+        self._rollups = {name: _Rollup(*fns) for name, fns in GRANULARITIES.items()}
+        self.first_day = None
+        self.last_day = None
+        self.dated = 0
+        self.out_of_window = 0
+
+    def _window(self):
+        # (first, last) day numbers a review date must fall in to be counted
+        last_date = self.last_date or datetime.date.today() + datetime.timedelta(days=1)
+        first, last = to_days([self.first_date, last_date])
+        return int(first), int(last)
+
+    def state(self):
+        """(JSON-able metadata, {granularity: counts}) describing the rollups, for snapshots"""
+        meta = {
+            "parks": self.parks, "features": self.features, "first_day": self.first_day,
+            "last_day": self.last_day, "dated": self.dated, "out_of_window": self.out_of_window,
+            "origins": {name: rollup.origin for name, rollup in self._rollups.items()},
+        }
+        return meta, {name: rollup.counts[:rollup.length] for name, rollup in self._rollups.items()}
+
+    @classmethod
+    def from_state(cls, meta, counts):
+        """Rollups restored from state() output; counts may be read-only memory maps"""
+        trends = cls(meta["parks"], meta["features"])
+        trends.first_day, trends.last_day, trends.dated = meta["first_day"], meta["last_day"], meta["dated"]
+        trends.out_of_window = meta.get("out_of_window", 0)
+        for name, rollup in trends._rollups.items():
+            rollup.origin = meta["origins"][name]
+            rollup.counts = counts[name]
+            rollup.length = len(rollup.counts)
+        return trends
+
+    def _code(self, value, codes, names):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def append(self, chunk):
+        """Count the dated reviews of a chunk (DataFrame or list of dicts) into every rollup"""
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = pd.DataFrame.from_records(list(chunk), columns=["park", "feature", "sentiment", "date"])
+        if chunk.empty or "date" not in chunk.columns:
+            return
+        days = to_days(chunk["date"]).astype(np.int64)
+        dated = days != MISSING_DAY
+        window_start, window_end = self._window()
+        in_window = (days >= window_start) & (days <= window_end)
+        self.out_of_window += int((dated & ~in_window).sum())
+        dated &= in_window
+        if not dated.any():
+            return
+        chunk = chunk.loc[dated]
+        days = days[dated]
+        park = self._codes(chunk["park"], self._park_codes, self.parks)
+        feature = self._codes(chunk["feature"], self._feature_codes, self.features)
+        sentiment = chunk["sentiment"].map(SENTIMENT_CODES).to_numpy(dtype=np.int64)
+        for rollup in self._rollups.values():
+            rollup.add(days, park, feature, sentiment, len(self.parks), len(self.features))
+
+        first, last = int(days.min()), int(days.max())
+        self.first_day = first if self.first_day is None else min(self.first_day, first)
+        self.last_day = last if self.last_day is None else max(self.last_day, last)
+        self.dated += len(days)
+
+    def _codes(self, values, codes, names):
+        inverse, uniques = pd.factorize(values.to_numpy())
+        lookup = np.array([self._code(v, codes, names) for v in uniques], dtype=np.int64)
+        return lookup[inverse]
+
+    def date_range(self):
+        """(first, last) review dates as datetime.date, or None without dated reviews"""
+        if self.first_day is None:
+            return None
+        return (np.datetime64(self.first_day, "D").astype(object),
+                np.datetime64(self.last_day, "D").astype(object))
+
+    def trend(self, granularity="month", park=None, feature=None, start=None, end=None):
+        """Sentiment counts and percentages per period, for periods with reviews.
+
+        park/feature narrow the trend to one park and/or feature; start/end
+        (dates or ISO strings, inclusive) limit it to the periods they fall in.
+        """
+        columns = ["period"] + SENTIMENTS + ["total"] + [f"{s} %" for s in SENTIMENTS]
+        if granularity not in self._rollups:
+            raise ValueError(f"Unknown granularity {granularity!r}; expected one of {', '.join(GRANULARITIES)}")
+        if (park is not None and park not in self._park_codes) or \
+                (feature is not None and feature not in self._feature_codes):
+            return pd.DataFrame(columns=columns)
+        start_day = None if start is None else int(to_days([start])[0])
+        end_day = None if end is None else int(to_days([end])[0])
+        periods, counts = self._rollups[granularity].series(
+            None if park is None else self._park_codes[park],
+            None if feature is None else self._feature_codes[feature],
+            None if start_day == MISSING_DAY else start_day,
+            None if end_day == MISSING_DAY else end_day,
+        )
+        total = counts.sum(axis=1)
+        frame = pd.DataFrame({"period": pd.to_datetime(periods)})
+        for i, sentiment in enumerate(SENTIMENTS):
+            frame[sentiment] = counts[:, i]
+        frame["total"] = total
+        for i, sentiment in enumerate(SENTIMENTS):
+            frame[f"{sentiment} %"] = counts[:, i] * 100.0 / np.maximum(total, 1)
+        return frame